@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*- 
 
-from analyzer_fs import FsLogAnalyzer
\ No newline at end of file
+from .analyzer_fs import FsLogAnalyzer
\ No newline at end of file
@@ -3,19 +3,45 @@
 import os
 import sys
 import re
-import copy
 import codecs
 import time
+import mmap
+import heapq
+from array import array
 from glob import glob
 from datetime import datetime
 from platform import system as osys
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
 
 from base.base import PRINT, INPUT, WRITELINES, getColor, getTerminalSize, getPathSeparator
 
+if PY2:
+    from compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+    from timerange import findTimeRange, iterRangeLines, countLines
+    from logtime import LogTimeParser, toDatetime, fromDatetime
+    from ignored import IGNORE_COUNT, IGNORE_SAMPLE, IGNORE_ALL
+else:
+    from analyzer.compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+    from analyzer.timerange import findTimeRange, iterRangeLines, countLines
+    from analyzer.logtime import LogTimeParser, toDatetime, fromDatetime
+    from analyzer.ignored import IGNORE_COUNT, IGNORE_SAMPLE, IGNORE_ALL
+
 class LogAnalyzer(object):
     __type = '' 
     __path = []
     __lines = []
+    __maps = [] # 内存映射或字节方式加载的文件内容，与__path一一对应，其他方式加载的为None
+    __ranges = [] # 按照时间范围加载的字节范围(起始偏移, 结束偏移)，与__path一一对应，加载整个文件的为None
+    __lineBases = {} # 时间范围之前的行数{(文件路径, 起始偏移):行数}，显示时才统计
+    __ingests = [] # 实际使用的加载方式，与__path一一对应
+    __cache = None # 分析结果的磁盘缓存，None表示不使用缓存
+    __decodeErrors = "replace" # 字节解码出错时的处理方式
+    __sortMode = "file" # 日志行的排序方式
+    __ignoreMode = "sample" # 忽略的行的记录方式
+    __diskFiles = {} # 按需读取日志时打开的文件{文件路径:文件对象}
+    __timeWindow = None # 加载的时间范围(开始时间, 结束时间, 提前的秒数)
+    __timeParser = None # 日志时间解析
     __showMode = "horizontal" # 水平horizontal, 垂直vertical
 
     __version = ""
@@ -38,11 +64,54 @@ class LogAnalyzer(object):
     MOD_REST = 'rest'
     MOD_SM = 'statemachine'
 
+    # 加载方式
+    INGEST_MEMORY = "memory" # 一次性读入内存
+    INGEST_STREAM = "stream" # 流式读取，分析时逐行读取文件，不保留原始行
+    INGEST_MMAP = "mmap" # 内存映射，会话只保存日志行的偏移和长度，显示时才读取
+    INGEST_BYTES = "bytes" # 以字节读入内存，会话只保存日志行的偏移和长度，显示时才解码，可加载含有非UTF-8字节的文件
+
+    # 分析完成后会话日志的存放方式
+    # memory: 所有日志常驻内存，查询最快，内存占用最大(约为日志文件大小的2~3倍)
+    # session: 只保存每个会话日志的位置，查询时从磁盘读取，内存占用最小，每次查询多一次磁盘读取
+    # mix: 异常会话和最近的会话常驻内存，其余会话只保存位置，兼顾内存占用和常用查询的速度
+    STORE_MEMORY = "memory"
+    STORE_SESSION = "session"
+    STORE_MIX = "mix"
+    STORE_LIST = [STORE_SESSION, STORE_MEMORY, STORE_MIX]
+
+    # 日志行的排序方式
+    SORT_FILE = "file" # 按照文件的起始时间排序，逐个文件读取
+    SORT_MERGE = "merge" # 多个文件的日志行按照时间交错合并，适用于时间重叠的文件(多个节点、复制和轮转的文件)
+
+    # 忽略的行(没有会话UUID的行)的记录方式
+    IGNORE_COUNT = IGNORE_COUNT # 只按照文件和分类计数
+    IGNORE_SAMPLE = IGNORE_SAMPLE # 计数，并为每个文件保留有限条数的抽样
+    IGNORE_ALL = IGNORE_ALL # 保留全部忽略的行，内存占用较大
+    IGNORE_LIST = [IGNORE_SAMPLE, IGNORE_COUNT, IGNORE_ALL]
+
+    HEAD_PROBE_SIZE = 8 * 1024 # 文件排序时读取的文件头大小
+    TIME_MARGIN = 60 # 按照时间范围加载时，开始时间默认提前的秒数
+    LOG_TIME_RE = "(\\d{4})-(\\d{1,2})-(\\d{1,2}) (\\d{2}):(\\d{2}):(\\d{2}).(\\d{6})"
+
+    # 字节解码出错时的处理方式
+    DECODE_ERRORS_LIST = ["replace", "ignore", "backslashreplace"]
+
     #定义构造方法 
     def __init__(self, t, ver = ""):
         self.__type = t
         self.__path = []
         self.__lines = []
+        self.__maps = []
+        self.__ranges = []
+        self.__lineBases = {}
+        self.__ingests = []
+        self.__cache = None
+        self.__decodeErrors = "replace"
+        self.__sortMode = self.SORT_FILE
+        self.__ignoreMode = self.IGNORE_SAMPLE
+        self.__diskFiles = {}
+        self.__timeWindow = None
+        self.__timeParser = LogTimeParser()
         self.__showMode = "horizontal"
         self.__version = ver
 
@@ -52,6 +121,67 @@ class LogAnalyzer(object):
     def getPath(self):
         return self.__path
 
+    def setCache(self, cache):
+        self.__cache = cache
+
+    def getCache(self):
+        return self.__cache
+
+    def setDecodeErrors(self, errors):
+        self.__decodeErrors = errors
+
+    def getDecodeErrors(self):
+        return self.__decodeErrors
+
+    def setTimeWindow(self, begin=None, end=None, margin=TIME_MARGIN):
+        """设置加载的时间范围，之后加载的文件只读取范围内的日志，行数从范围的开始计算，显示时加上getLineBase
+        参数列表:
+            begin: 开始时间 datetime或time，None表示不限
+            end: 结束时间 datetime或time，None表示不限
+            margin: 开始时间提前的秒数
+        返回值：
+            无
+        异常：
+            无
+        """
+        self.__timeWindow = None if begin is None and end is None else (begin, end, margin)
+
+    def getTimeWindow(self):
+        return self.__timeWindow
+
+    def getRange(self, index):
+        return self.__ranges[index]
+
+    def getLineBase(self, index):
+        """获取按照时间范围加载的文件中范围之前的行数，显示的行数加上它才是文件中的行号
+        只在显示时使用，第一次调用时从文件开头统计并缓存
+        参数列表:
+            index: 日志文件索引
+        返回值：
+            范围之前的行数，加载整个文件的为0
+        异常：
+            IOError 打开文件失败
+        """
+        rng = self.__ranges[index]
+        if not rng or not rng[0]:
+            return 0
+        key = (self.__path[index], rng[0])
+        if key not in self.__lineBases:
+            self.__lineBases[key] = countLines(*key)
+        return self.__lineBases[key]
+
+    def setSortMode(self, mode):
+        self.__sortMode = mode
+
+    def getSortMode(self):
+        return self.__sortMode
+
+    def setIgnoreMode(self, mode):
+        self.__ignoreMode = mode
+
+    def getIgnoreMode(self):
+        return self.__ignoreMode
+
     def getPathEx(self, index):
         """获取日志文件绝对路径
         参数列表:
@@ -78,6 +208,326 @@ class LogAnalyzer(object):
     def getLines(self):
         return self.__lines
 
+    def getFileCount(self):
+        return len(self.__path)
+
+    def iterFileLines(self, index):
+        """逐行迭代日志文件
+        以内存方式加载的文件直接遍历已读取的行，以流式方式加载的文件则重新以字节方式打开文件，逐行按照解码出错时的处理方式解码
+        参数列表:
+            index: 日志文件索引
+        返回值：
+            日志行生成器
+        异常：
+            无
+        """
+        lines = self.__lines[index]
+        if lines is not None:
+            for line in lines:
+                yield line
+        elif self.__maps[index] is not None:
+            for offset, line in self.iterMappedLines(index):
+                yield self.decodeLine(line)
+        elif self.__ranges[index] is not None:
+            for offset, line in iterRangeLines(self.__path[index], self.__ranges[index]):
+                yield self.decodeLine(line)
+        else:
+            with openLogFile(self.__path[index], binary=True) as f:
+                for line in f:
+                    yield self.decodeLine(normalizeNewline(line))
+
+    def iterLines(self, withOffset=False, files=None, raw=False):
+        """按文件顺序逐行迭代所有已加载的日志
+        参数列表:
+            withOffset: 是否同时返回日志行在文件中的位置
+            files: 只迭代指定索引的文件，默认迭代全部文件
+            raw: 内存映射或字节方式加载的文件是否直接返回未解码的字节行，仅在withOffset为True时有效
+        返回值：
+            生成器，每项为元组(文件索引, 行数, 日志)
+            withOffset为True时为(文件索引, 行数, 日志, 偏移, 字节长度)，未映射的文件偏移和长度为-1
+        异常：
+            无
+        """
+        for f in (range(self.getFileCount()) if files is None else files):
+            if withOffset and self.__maps[f] is not None:
+                for i, (offset, line) in enumerate(self.iterMappedLines(f)):
+                    yield f, i, line if raw else self.decodeLine(line), offset, len(line)
+            elif withOffset:
+                for i, line in enumerate(self.iterFileLines(f)):
+                    yield f, i, line, -1, -1
+            else:
+                for i, line in enumerate(self.iterFileLines(f)):
+                    yield f, i, line
+
+    def iterMergedLines(self, withOffset=False, raw=False, reExpr=LOG_TIME_RE):
+        """按照日志时间交错合并所有已加载文件的日志行
+        每个文件的日志行本身按照时间顺序，用堆做多路归并，不生成排序后的副本。
+        没有时间的行(如SIP消息的续行)沿用同一文件中上一行的时间，时间相同时按照文件索引和行数排序
+        参数列表:
+            withOffset: 是否同时返回日志行在文件中的位置
+            raw: 内存映射或字节方式加载的文件是否直接返回未解码的字节行
+            reExpr: 提取日志时间的正则表达式
+        返回值：
+            生成器，每项与iterLines一致
+        异常：
+            无
+        """
+        reTime = re.compile(reExpr)
+        reTimeB = re.compile(reExpr.encode('utf-8')) if PY3 else reTime
+
+        def keyLines(f):
+            key = ()
+            for item in self.iterLines(withOffset=withOffset, files=[f], raw=raw):
+                line = item[2]
+                res = (reTimeB if PY3 and isinstance(line, bytes) else reTime).search(line)
+                if res:
+                    key = tuple(int(x) for x in res.groups())
+                yield (key, ) + item
+
+        for item in heapq.merge(*[keyLines(f) for f in range(self.getFileCount())]):
+            yield item[1:]
+
+    def readHead(self, index, size=HEAD_PROBE_SIZE):
+        """读取日志文件开头的一段内容
+        参数列表:
+            index: 日志文件索引
+            size: 读取的字节数(内存方式加载的文件为字符数)
+        返回值：
+            日志内容 str
+        异常：
+            IOError 打开文件失败
+        """
+        lines = self.__lines[index]
+        if lines is not None:
+            head = []
+            count = 0
+            for line in lines:
+                if count >= size:
+                    break
+                head.append(line)
+                count += len(line)
+            return "".join(head)
+        elif self.__maps[index] is not None:
+            for offset, line in self.iterMappedLines(index):
+                return self.decodeLine(self.readMappedRaw(index, offset, size))
+            return ""
+        elif self.__ranges[index] is not None:
+            head = []
+            count = 0
+            for offset, line in iterRangeLines(self.__path[index], self.__ranges[index]):
+                if count >= size:
+                    break
+                head.append(line)
+                count += len(line)
+            return self.decodeLine(b"".join(head))
+        with openLogFile(self.__path[index], binary=True) as f:
+            return self.decodeLine(f.read(size))
+
+    def addFollowFile(self, path):
+        """登记一个正在跟踪的日志文件，其内容由增量分析逐行加入
+        参数列表:
+            path: 日志文件路径
+        返回值：
+            日志文件索引
+        异常：
+            无
+        """
+        self.__path.append(path)
+        self.__lines.append(None)
+        self.__maps.append(None)
+        self.__ranges.append(None)
+        self.__ingests.append(self.INGEST_STREAM)
+        return len(self.__path) - 1
+
+    def getIngest(self, index):
+        return self.__ingests[index]
+
+    def isMapped(self, index):
+        return self.__maps[index] is not None
+
+    def isLoaded(self, index):
+        # 以内存方式加载，日志行常驻内存
+        return self.__lines[index] is not None
+
+    def readLine(self, index, line):
+        """读取以内存方式加载的一行日志
+        参数列表:
+            index: 日志文件索引
+            line: 行数
+        返回值：
+            日志行 str(包括会话UUID和结尾的换行)
+        异常：
+            TypeError 日志行已经释放
+        """
+        return self.__lines[index][line]
+
+    def iterMappedLines(self, index):
+        """逐行迭代内存映射或字节方式加载的日志文件
+        参数列表:
+            index: 日志文件索引
+        返回值：
+            生成器，每项为元组(偏移, 原始字节行)，偏移为在文件中的偏移；行尾的\\r\\n换成\\n，
+            会话中记录的长度(行的长度减去UUID和换行)不包括\\r
+        异常：
+            无
+        """
+        m = self.__maps[index]
+        base, pos, size = self.__getMapWindow(index)
+        while pos < size:
+            end = m.find(b'\n', pos, size)
+            end = size if end == -1 else end + 1
+            yield base + pos, normalizeNewline(m[pos:end])
+            pos = end
+
+    def __getMapWindow(self, index):
+        """内存映射或字节方式加载的文件中需要分析的范围
+        内存映射的是整个文件，按照时间范围加载时只分析其中一段；字节方式只读取了范围内的内容
+        返回值：
+            (内容起始处在文件中的偏移, 起始位置, 结束位置)
+        """
+        m = self.__maps[index]
+        rng = self.__ranges[index]
+        if rng is None:
+            return 0, 0, len(m)
+        if isinstance(m, mmap.mmap):
+            return 0, rng[0], min(rng[1], len(m))
+        return rng[0], 0, len(m)
+
+    def readMapped(self, index, offset, length):
+        """从内存映射或字节方式加载的日志文件中读取一段日志并解码，其他文件从磁盘读取
+        参数列表:
+            index: 日志文件索引
+            offset: 偏移
+            length: 字节长度
+        返回值：
+            日志内容 str
+        异常：
+            无
+        """
+        return self.decodeLine(self.readMappedRaw(index, offset, length))
+
+    def readMappedRaw(self, index, offset, length):
+        m = self.__maps[index]
+        if m is not None:
+            base = self.__getMapWindow(index)[0]
+            return m[offset - base:offset - base + length]
+        return self.readDisk(index, offset, length)
+
+    def readDisk(self, index, offset, length):
+        """从磁盘读取日志文件的一段内容，打开的文件保留到clear时关闭
+        参数列表:
+            index: 日志文件索引
+            offset: 偏移
+            length: 字节长度
+        返回值：
+            未解码的字节
+        异常：
+            IOError 读取文件失败
+        """
+        path = self.__path[index]
+        f = self.__diskFiles.get(path)
+        if f is None:
+            f = self.__diskFiles[path] = open(path, 'rb')
+        f.seek(offset)
+        return f.read(length)
+
+    def getLineRefs(self, index, lines):
+        """获取日志文件中若干行的会话日志位置，与内存映射方式收集时记录的位置相同
+        参数列表:
+            index: 日志文件索引
+            lines: 行数的集合
+        返回值：
+            {行数:(偏移, 长度)}，位置为去掉UUID和结尾的换行后的日志内容，压缩文件为解压后的偏移；
+            以内存方式加载的文件含有单独的'\\r'时，行数与按照字节读取的不一致，返回None
+        异常：
+            IOError 读取文件失败
+        """
+        refs = {}
+        if not lines:
+            return refs
+        checkCR = self.__ingests[index] == self.INGEST_MEMORY
+        for i, (offset, line) in enumerate(self.__iterRawLines(index)):
+            if checkCR and b'\r' in line:
+                return None
+            if i in lines:
+                pos = line.find(b' ')
+                refs[i] = (offset + pos + 1, len(line) - pos - 2)
+                if len(refs) == len(lines):
+                    break
+        return refs
+
+    def __iterRawLines(self, index):
+        # 逐行迭代未解码的日志(偏移, 字节行)，行尾的\r\n换成\n
+        if self.__maps[index] is not None:
+            for item in self.iterMappedLines(index):
+                yield item
+        elif self.__ranges[index] is not None:
+            for item in iterRangeLines(self.__path[index], self.__ranges[index]):
+                yield item
+        else:
+            pos = 0
+            with openLogFile(self.__path[index], binary=True) as f:
+                for line in f:
+                    yield pos, normalizeNewline(line)
+                    pos += len(line)
+
+    def buildLineIndex(self, index):
+        """建立日志文件的行偏移索引，用于按行数从磁盘读取日志
+        压缩文件无法定位；含有'\\r'的文件，以文本方式读取时'\\r\\n'会转换为'\\n'(单独的'\\r'也会被当作换行)，
+        按照偏移计算的长度和行数与已加载的行不一致，这两种文件不建立索引
+        参数列表:
+            index: 日志文件索引
+        返回值：
+            每行起始偏移的数组，最后多一项为文件大小；无法建立索引时返回None
+        异常：
+            无
+        """
+        path = self.__path[index]
+        rng = self.__ranges[index]
+        try:
+            if getCompression(path) != COMPRESS_NONE:
+                return None
+            offsets = array('L')
+            pos = 0
+            with open(path, 'rb') as f:
+                # 按照时间范围加载的文件，行数从范围的开始计算
+                if rng is not None:
+                    f.seek(rng[0])
+                    pos = rng[0]
+                for line in f:
+                    if rng is not None and pos >= rng[1]:
+                        break
+                    if b'\r' in line:
+                        return None
+                    offsets.append(pos)
+                    pos += len(line)
+            offsets.append(pos)
+            return offsets
+        except (IOError, OSError):
+            return None
+
+    def releaseLines(self):
+        """释放以内存方式加载的日志行，之后需要时从磁盘逐行读取
+        参数列表:
+            无
+        返回值：
+            释放的文件个数
+        异常：
+            无
+        """
+        count = 0
+        for f, lines in enumerate(self.__lines):
+            if lines is not None:
+                self.__lines[f] = None
+                count += 1
+        return count
+
+    def decodeLine(self, line):
+        # python2下不解码，已经解码的行直接返回
+        if PY2 or not isinstance(line, bytes):
+            return line
+        return line.decode('utf-8', self.__decodeErrors)
+
     def getShowMode(self):
         return self.__showMode
 
@@ -93,10 +543,12 @@ class LogAnalyzer(object):
         
     def sortRecode(self, newSort=[]):
 
-        p = copy.deepcopy(self.getPath())
-        self.printProc(1, 2, widgetType = "percent")
-        l = copy.deepcopy(self.getLines())
-        self.printProc(2, 2, widgetType = "percent")
+        # 只调整文件的顺序，浅拷贝即可，不复制日志内容
+        p = list(self.getPath())
+        l = list(self.getLines())
+        m = list(self.__maps)
+        r = list(self.__ranges)
+        g = list(self.__ingests)
 
         if len(newSort) != len(p) or len(newSort) != len(l):
             return False
@@ -104,11 +556,14 @@ class LogAnalyzer(object):
         for i, n in enumerate(newSort):
             self.__path[i] = p[n]
             self.__lines[i] = l[n]
+            self.__maps[i] = m[n]
+            self.__ranges[i] = r[n]
+            self.__ingests[i] = g[n]
 
         return True
 
     # 加载需要分析的文件
-    def load(self, path, rl=False):
+    def load(self, path, rl=False, ingest=INGEST_MEMORY):
         # 路径是否存在
         s = "正在加载日志文件..."
         PRINT(s, end='')
@@ -127,7 +582,7 @@ class LogAnalyzer(object):
         fileListLen = len(fileList)
         process = 0
         f = None
-        time1 = time.clock()
+        time1 = time.time()
         for filePath in fileList:
             process = self.printProc(process, fileListLen, 1)
             # 打开
@@ -136,7 +591,9 @@ class LogAnalyzer(object):
             try:
                 if f:
                     f.close()
-                f = open(filePath, 'r')
+                # 压缩文件按照文件头识别，边读边解压
+                compression = getCompression(filePath)
+                f = openLogFile(filePath)
                 if f is None:
                     failedFileList.append((filePath, "打开文件失败"))
                     continue
@@ -147,34 +604,81 @@ class LogAnalyzer(object):
             # 重新加载文件
             if rl:
                 rl = False
-                self.__path=[filePath]
-                # python3下面，若文件出现乱码0xFF，则会报错。python2无此问题
+                self.clear()
+            # 添加一个文件
+            elif filePath in self.__path:
+                failedFileList.append((filePath, "文件已经加载"))
+                continue
+
+            # 按照时间范围只加载一段内容
+            rng = None
+            if self.__timeWindow is not None:
                 try:
-                    self.__lines=[f.readlines()]
+                    rng = findTimeRange(filePath, *self.__timeWindow)
                 except Exception as err:
-                    failedFileList.append((filePath, "日志文件含有乱码，请转换为UTF-8编码再进行加载。%s" % err))
+                    failedFileList.append((filePath, "查找时间范围失败。%s" % err))
                     continue
-                
-            # 添加一个文件
-            else:
-                if filePath in self.__path:
-                    failedFileList.append((filePath, "文件已经加载"))
+                if rng is not None and rng[0] >= rng[1]:
+                    failedFileList.append((filePath, "指定的时间范围内没有日志"))
                     continue
 
+            # 流式加载时不读取内容，分析时再逐行读取
+            mapped = None
+            if ingest in [self.INGEST_STREAM]:
+                lines = None
+            # 压缩文件无法映射，按照流式处理
+            elif ingest in [self.INGEST_MMAP] and compression != COMPRESS_NONE:
+                lines = None
+            # 字节方式加载，整个文件作为一段字节保存，不做解码；压缩文件保存解压后的内容
+            elif ingest in [self.INGEST_BYTES]:
+                lines = None
+                try:
+                    with openLogFile(filePath, binary=True) as bf:
+                        if rng is None:
+                            mapped = bf.read()
+                        else:
+                            rng[0] and bf.seek(rng[0])
+                            mapped = bf.read(rng[1] - rng[0])
+                except Exception as err:
+                    failedFileList.append((filePath, "读取文件失败。%s" % err))
+                    continue
+            # 内存映射加载，由操作系统的页缓存负责文件内容
+            elif ingest in [self.INGEST_MMAP]:
+                lines = None
+                try:
+                    with open(filePath, 'rb') as mf:
+                        mapped = mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(filePath) else None
+                except Exception as err:
+                    failedFileList.append((filePath, "映射文件失败。%s" % err))
+                    continue
+                # 空文件无法映射，按照内存方式处理
+                if mapped is None:
+                    lines = []
+            else:
                 # python3下面，若文件出现乱码0xFF，则会报错。python2无此问题
                 try:
-                    self.__lines.append(f.readlines())
+                    lines = f.readlines() if rng is None else [self.decodeLine(line) for offset, line in iterRangeLines(filePath, rng)]
+                    # python2下压缩文件以二进制方式读取，换行与文本方式保持一致
+                    if PY2 and compression != COMPRESS_NONE:
+                        lines = [normalizeNewline(line) for line in lines]
                 except Exception as err:
-                    failedFileList.append((filePath, "日志文件含有乱码，请转换为UTF-8编码再进行加载。%s" % err))
-                    ok = False
+                    failedFileList.append((filePath, "日志文件含有乱码，请转换为UTF-8编码或使用字节方式(-ingest bytes)再进行加载。%s" % err))
                     continue
 
-                self.__path.append(filePath)
-                successFileList.append(filePath)
+            self.__path.append(filePath)
+            self.__lines.append(lines)
+            self.__maps.append(mapped)
+            self.__ranges.append(rng)
+            # 压缩文件无法映射时按照流式处理，空文件无法映射时按照内存方式处理
+            if mapped is not None:
+                self.__ingests.append(self.INGEST_MMAP if isinstance(mapped, mmap.mmap) else self.INGEST_BYTES)
+            else:
+                self.__ingests.append(self.INGEST_STREAM if lines is None else self.INGEST_MEMORY)
+            successFileList.append(filePath)
         else:
             if f:
                 f.close()
-            time2 = time.clock()
+            time2 = time.time()
             if successFileList:
                 s = "OK (耗时：%.2f秒)" % (time2 - time1)
                 PRINT(s, color='green')
@@ -186,9 +690,9 @@ class LogAnalyzer(object):
         # 加载完成之后，重新排序
         s = "正在对加载文件进行重排序..."
         PRINT(s, end='')
-        time1 = time.clock()
+        time1 = time.time()
         self.sortLogFile()
-        time2 = time.clock()
+        time2 = time.time()
         s = "OK (耗时：%.2f秒)" % (time2 - time1)
         PRINT(s, color='green')
         return successFileList, failedFileList
@@ -196,15 +700,36 @@ class LogAnalyzer(object):
 
     # clear加载的文件
     def clear(self):
+        for m in self.__maps:
+            isinstance(m, mmap.mmap) and m.close()
+        for f in self.__diskFiles.values():
+            f.close()
+        self.__diskFiles = {}
         self.__path=[]
         self.__lines=[]
+        self.__maps=[]
+        self.__ranges=[]
+        self.__lineBases = {}
+        self.__ingests = []
         return True, ""
         
     # 开始分析文件    
-    def run(self, mode = "normal"):
+    def run(self, mode = "normal", jobs = 1):
         
         return True, ""
 
+    # 增量分析，返回重新分析的会话列表
+    def feedLines(self, f, lineNo, lines):
+        return []
+
+    # 增量加入已转换的事件，返回重新分析的会话列表
+    def feedEvents(self, f, lineNo, records):
+        return []
+
+    # 显示增量分析的结果
+    def showFollowResult(self, sessList):
+        pass
+
     def makeDir(self, path):
         
         if os.path.exists(path):
@@ -252,12 +777,14 @@ class LogAnalyzer(object):
         s = "\n\n%-6s %s\n" % ("原始行","日志")
         WRITELINES(f, s)
 
-        for (k,v) in sorted(logDict.items(), key=lambda logDict:logDict[0]):
-            logList = sorted(v.items(), key=lambda v:v[0])
-            f.writelines("%s\n" % self.getPathEx(k)) 
-            for (line, log) in logList:
-                s = ("%-6d %s" + (log.rfind("\n") and "\n" or "")) % (line + 1, log)
-                WRITELINES(f, s)
+        curFile = -1
+        for (k, line, log) in logDict.iterLines():
+            if k != curFile:
+                curFile = k
+                lineBase = self.getLineBase(k)
+                f.writelines("%s\n" % self.getPathEx(k)) 
+            s = ("%-6d %s" + (log.rfind("\n") and "\n" or "")) % (lineBase + line + 1, log)
+            WRITELINES(f, s)
         
         self.__outputComplete(f)
         return True
@@ -275,20 +802,25 @@ class LogAnalyzer(object):
         return True
 
     # 重新对加载的文件进行排序
-    def sortLogFile(self, reExpr = "(\\d{4})-(\\d{1,2})-(\\d{1,2}) (\\d{2}):(\\d{2}):(\\d{2}).(\\d{6})", expLen = 7):
-        lines = self.getLines()
-        if len(lines) < 2:
+    def sortLogFile(self, reExpr = LOG_TIME_RE, expLen = 7):
+        if self.getFileCount() < 2:
             return True
 
         logTime = {}
-
-        for f, l in enumerate(lines):
-            for i, line in enumerate(l):
-                # 按照时间提取
-                res = self.reMatch(reExpr, line, expLen)
-                if res:
-                    logTime[f] = datetime(int(res[0]), int(res[1]), int(res[2]), int(res[3]), int(res[4]), int(res[5]))
-                    break
+        reTime = re.compile(reExpr)
+
+        for f in range(self.getFileCount()):
+            # 先只读取文件头查找第一个时间，找不到再逐行查找
+            res = reTime.search(self.readHead(f))
+            if not res:
+                for line in self.iterFileLines(f):
+                    res = reTime.search(line)
+                    if res:
+                        break
+            if res and len(res.groups()) >= expLen:
+                # 按照时间提取，精确到微秒
+                res = res.groups()[0:expLen]
+                logTime[f] = datetime(int(res[0]), int(res[1]), int(res[2]), int(res[3]), int(res[4]), int(res[5]), int(res[6]) if expLen > 6 else 0)
         else:
             # 计算出新的顺序，进行排序
             if not logTime:
@@ -435,8 +967,23 @@ class LogAnalyzer(object):
                     return False
         return True
 
+    # 解析日志时间，返回自1970-01-01起的微秒数
+    def parseLogTime(self, log):
+        us = self.__timeParser.parse(log)
+        if us is None:
+            # 微秒不足6位等不规则的时间
+            us = fromDatetime(self.__getLogTimeSlow(self.decodeLine(log)))
+        return us
+
     # 格式化日志时间，统一返回datetime
     def getLogTime(self, log):
+        return toDatetime(self.parseLogTime(log))
+
+    # 微秒数转换为日志时间字符串
+    def formatLogTime(self, us):
+        return "%s" % toDatetime(us)
+
+    def __getLogTimeSlow(self, log):
         logDate = log[:self.MAX_LOGTIME_LEN].strip()
         logDateLen = len(logDate)
         if self.MAX_LOGTIME_LEN > logDateLen:
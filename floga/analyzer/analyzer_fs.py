@@ -2,7 +2,8 @@
 import os
 import time
 import sys
-from datetime import datetime
+from array import array
+from multiprocessing import Pool
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
@@ -10,22 +11,53 @@ from base.base import PRINT, INPUT, getColor
 
 if PY2:
     from analyzer import LogAnalyzer
+    from sesslog import SessLog, MmapSessLog
+    from parallel import splitChunks, splitSessLine, collectChunk, getShard, readRanges
+    from pattern import PatternRegistry
+    from session import Session, KeyInfoIndex, SessIndex
+    from callflow import CallFlowClassifier, loadRuleFile, dumpRuleFile, \
+        RULE_INIT, RULE_FACTS, RULE_CODES, RULE_TRANSITIONS, RULE_WARNING_STATES, RULE_NORMAL_CAUSES
+    from ignored import IgnoredLines, canRestore, CATEGORY_LIST
+    import columnar
+    from logtime import toDatetime
 else:
     from analyzer.analyzer import LogAnalyzer
+    from analyzer.sesslog import SessLog, MmapSessLog
+    from analyzer.parallel import splitChunks, splitSessLine, collectChunk, getShard, readRanges
+    from analyzer.pattern import PatternRegistry
+    from analyzer.session import Session, KeyInfoIndex, SessIndex
+    from analyzer.callflow import CallFlowClassifier, loadRuleFile, dumpRuleFile, \
+        RULE_INIT, RULE_FACTS, RULE_CODES, RULE_TRANSITIONS, RULE_WARNING_STATES, RULE_NORMAL_CAUSES
+    from analyzer.ignored import IgnoredLines, canRestore, CATEGORY_LIST
+    from analyzer import columnar
+    from analyzer.logtime import toDatetime
 
 # FS日志分析器
 class FsLogAnalyzer(LogAnalyzer):
 
     __sessLogInfoDict = {}# 按照会话归类的日志信息
-                          # {会话UUID：{log:{文件索引:{行数:日志}},
-                          #            callNumber:呼叫号码,
-                          #            result:{分析结果},
-                          #            keyInfo:[(文件索引,行数,状态类型,(状态迁移信息))]}
+                          # {会话UUID：Session(log:[(文件索引,行数,日志)](SessLog，只保存位置时为MmapSessLog),
+                          #                    callNumber:呼叫号码, startTime:开始时间, conclusion:结论, note:备注,
+                          #                    关键信息:[(文件索引,行数,状态类型,(状态迁移信息),日志时间)])
                           # }
-    __ignoreLinesDict = {}# 忽略的行{文件索引:{行数:日志}}
+    __ignored = None# 忽略的行(没有会话UUID的行)的计数和抽样(IgnoredLines)
+    __followShownDict = {}# 跟踪模式下已显示的结果{会话UUID:(结论,备注)}
+    __cacheHitDict = {}# 命中缓存的文件{文件索引:缓存数据}
+    __callNumberHitDict = {}# 收集时找到号码的行{会话UUID:[(文件索引,行数,[(号码,是否停止查找)])]}
+    __callNumberStopDict = {}# 需要停止查找号码的行{会话UUID:(文件索引,行数)}
+    __detailKeys = None# 分析详情的key元组，所有会话共用
+    __callFlowStateDict = {}# 跟踪模式下会话的状态机，新的关键信息到达时只需要继续接收{会话UUID:CallFlowState}
+    __classifyMode = "session"# 会话过程的分析方式
+    __shardResultDict = {}# 并行收集时工作进程已经分析的结果，分析会话过程时直接使用{会话UUID:(状态, 备注, 分析详情, {匹配标志:第一条提取结果})}
+    __sessIndex = None# 按照号码、结论和开始时间的二级索引(SessIndex)，显示和输出时不再遍历全部会话
     
     ANALYZER_TYPE_FS = 'fs'
 
+    # 会话过程的分析方式
+    CLASSIFY_SESSION = "session" # 逐个会话交给状态机
+    CLASSIFY_COLUMNAR = "columnar" # 全部会话的关键信息拼接为一张表，用向量运算一起分析(需要numpy)
+    CLASSIFY_LIST = [CLASSIFY_SESSION, CLASSIFY_COLUMNAR]
+
     # 会话类字典key
     SESS_FS_CALLNUMBER_DK = "callNumber"
 
@@ -63,9 +95,125 @@ class FsLogAnalyzer(LogAnalyzer):
     OUTPUT_POSTFIX_RESULT = ".result"
     OUTPUT_POSTFIX_DETAILS = ".details"
 
+    # 关键信息提取的规则 (固定字符串, 正则表达式, 期望返回元祖长度, 需要去掉的位置, 匹配标志)
+    # 按照顺序匹配，第一个匹配的规则生效；固定字符串必须是正则表达式必然匹配的子串
+    __keyInfoRules = PatternRegistry([
+            ("State Change", "State Change (.*) -> (.*)", 2, [], SIGN_FLAG_CS), # 状态转移类的日志
+            ("entering state", "entering state \[(.*)\]\[(.*)\]", 2, [], SIGN_FLAG_CHAN), # 收到消息类的日志
+            ("Callstate Change", "Callstate Change (.*) -> (.*)", 2, [], SIGN_FLAG_CALL), # 呼叫状态类的日志
+            ("receiving invite from", "receiving invite from (.*) version", 1, [], SIGN_FLAG_R_INVITE),
+            ("AUDIO RTP", "AUDIO RTP \[(.*)\] (.*) port (\d+) -> (.*) port (\d+) codec: (\d+) ms: (\d+)", 7, [0], SIGN_FLAG_RTP), # RTP通道信息
+            ("Flipping CID from", "Flipping CID from \"(.*)\" \<(.*)\> to \"(.*)\" \<(.*)\>", 4, [], SIGN_FLAG_CALLNUMBER), # 呼叫号码
+            ("952 Hangup", "952 Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], SIGN_FLAG_R_BYE),
+            ("Hangup", "Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], SIGN_FLAG_HANGUP),
+            ("Sending BYE to", "Sending BYE to(.*)", 1, [0], SIGN_FLAG_S_BYE),
+            ("Sending CANCEL to", "Sending CANCEL to(.*)", 1, [0], SIGN_FLAG_CANCEL),
+        ])
+
+    # 呼叫号码提取的规则，匹配标志表示找到号码后是否停止查找
+    # 默认取"New Channel"中的号码，若有号码变换，需要取变换的号码
+    __callNumberRules = PatternRegistry([
+            ("New Channel sofia/", "New Channel sofia\/(.*)\/(\d*)\@(.*?) \[", 3, [0, 2], False),
+            ("Dialplan: sofia/", "Dialplan: sofia\/(.*)\/(.*) Action transfer\((\d*) XML default\)", 3, [0, 1], True),
+            (" in context", "<(\d*)>->(\d*) in context", 2, [0], True),
+        ])
+
+    # 会话过程的状态
+    FLOW_STATE_INIT = "INIT"
+    FLOW_STATE_CALLING = "CALLING"
+    FLOW_STATE_RINGING = "RINGING"
+    FLOW_STATE_RINGING_183 = "RINGING(183)"
+    FLOW_STATE_TALKING = "TALKING"
+    FLOW_STATE_HANGUP = "HANGUP"
+    FLOW_STATE_NOT_COMPLETE = "NOT COMPLETE"
+
+    # 内置的会话过程规则，详见CallFlowClassifier；可以用规则文件替换其中的部分，详见loadRuleFile
+    __hangupNote = (" -> HANGUP", SIGN_FLAG_S_BYE, "(S)", "(R)")
+    __callFlowRules = {
+        RULE_INIT: FLOW_STATE_INIT,
+        # 事实 (事实, 匹配标志, 第一个结果, 第二个结果, 是否记入分析详情)
+        RULE_FACTS: [
+            ("CS_NEW__CS_INIT", SIGN_FLAG_CS, "CS_NEW", "CS_INIT", True),
+            ("CS_INIT__CS_ROUTING", SIGN_FLAG_CS, "CS_INIT", "CS_ROUTING", True),
+            ("CS_ROUTING__CS_CONSUME_MEDIA", SIGN_FLAG_CS, "CS_ROUTING", "CS_CONSUME_MEDIA", True),
+            ("CS_CONSUME_MEDIA__CS_EXECUTE", SIGN_FLAG_CS, "CS_CONSUME_MEDIA", "CS_EXECUTE", True),
+
+            ("DOWN__RINGING", SIGN_FLAG_CALL, "DOWN", "RINGING", True),
+            ("DOWN__EARLY", SIGN_FLAG_CALL, "DOWN", "EARLY", True),
+            ("DOWN__ACTIVE", SIGN_FLAG_CALL, "DOWN", "ACTIVE", True),
+            ("EARLY__RINGING", SIGN_FLAG_CALL, "EARLY", "RINGING", True),
+            ("EARLY__ACTIVE", SIGN_FLAG_CALL, "EARLY", "ACTIVE", True),
+            ("RINGING__ACTIVE", SIGN_FLAG_CALL, "RINGING", "ACTIVE", True),
+            ("DOWN__HANGUP", SIGN_FLAG_CALL, "DOWN", "HANGUP", True),
+            ("EARLY__HANGUP", SIGN_FLAG_CALL, "EARLY", "HANGUP", True),
+            ("RINGING__HANGUP", SIGN_FLAG_CALL, "RINGING", "HANGUP", True),
+            ("ACTIVE__HANGUP", SIGN_FLAG_CALL, "ACTIVE", "HANGUP", True),
+
+            ("calling_0", SIGN_FLAG_CHAN, "calling", "", True),
+            ("proceeding_180", SIGN_FLAG_CHAN, "", "180", True),
+            ("proceeding_183", SIGN_FLAG_CHAN, "", "183", True),
+            ("completing_200", SIGN_FLAG_CHAN, "completing", "", True),
+            ("completed_200", SIGN_FLAG_CHAN, "completed", "", True),
+            ("ready_200", SIGN_FLAG_CHAN, "ready", "", True),
+
+            (SIGN_FLAG_R_INVITE, SIGN_FLAG_R_INVITE, "", "", False),
+            (SIGN_FLAG_S_BYE, SIGN_FLAG_S_BYE, "", "", False),
+        ],
+        # 错误应答的状态码 (名称, 匹配标志, [模糊状态码])
+        RULE_CODES: [
+            ("terminated_list", SIGN_FLAG_CHAN, ["4xx", "5xx", "6xx"]),
+        ],
+        # 迁移 (当前状态, 下一个状态, [条件], 备注)
+        RULE_TRANSITIONS: [
+            # invite->
+            (FLOW_STATE_INIT, FLOW_STATE_CALLING, [("CS_INIT__CS_ROUTING", "CS_ROUTING__CS_CONSUME_MEDIA", "calling_0"), (SIGN_FLAG_R_INVITE,)], \
+                ("[CALLING", SIGN_FLAG_R_INVITE, "(R)", "(S)")),
+            (FLOW_STATE_INIT, FLOW_STATE_NOT_COMPLETE, [()], "[NOT COMPLETE"),
+            # invite-> 200<-
+            (FLOW_STATE_CALLING, FLOW_STATE_TALKING, [("DOWN__ACTIVE", "completing_200", "ready_200")], " -> TALKING"),
+            # invite-> (bye-> or 错误应答<-)
+            (FLOW_STATE_CALLING, FLOW_STATE_RINGING_183, [("DOWN__HANGUP", "proceeding_183")], " -> RINGING(183)"),
+            (FLOW_STATE_CALLING, FLOW_STATE_HANGUP, [("DOWN__HANGUP",)], __hangupNote),
+            # invite-> (183<- or 180<-)
+            (FLOW_STATE_CALLING, FLOW_STATE_RINGING, [("proceeding_180",), ("proceeding_183",), \
+                ("DOWN__EARLY", "proceeding_183", "EARLY__RINGING", "proceeding_180"), ("DOWN__RINGING",), ("DOWN__EARLY",)], " -> RINGING"),
+            (FLOW_STATE_RINGING_183, FLOW_STATE_HANGUP, [()], __hangupNote),
+            # invite-> (183<- or 180<-) 200<-
+            (FLOW_STATE_RINGING, FLOW_STATE_TALKING, [("RINGING__ACTIVE", "completing_200", "ready_200"), ("RINGING__ACTIVE", "completed_200", "ready_200"), \
+                ("EARLY__ACTIVE", "completing_200", "ready_200"), ("EARLY__ACTIVE", "completed_200", "ready_200")], " -> TALKING"),
+            # invite-> (183<- or 180<-) 错误应答<-
+            (FLOW_STATE_RINGING, FLOW_STATE_HANGUP, [("RINGING__HANGUP",), ("EARLY__HANGUP",)], __hangupNote),
+            # 200<- bye<->
+            (FLOW_STATE_TALKING, FLOW_STATE_HANGUP, [("ACTIVE__HANGUP",)], __hangupNote),
+        ],
+        # 结论为WARNING的状态，其余状态再根据挂断原因和错误应答确定结论
+        RULE_WARNING_STATES: [FLOW_STATE_NOT_COMPLETE],
+        # 不作为错误的挂断原因
+        RULE_NORMAL_CAUSES: ["NORMAL_CLEARING", "MANAGER_REQUEST"],
+    }
+    __rulePath = "" # 会话过程规则文件，为空时使用内置的规则
+    __callFlow = CallFlowClassifier(__callFlowRules[RULE_FACTS], __callFlowRules[RULE_CODES], \
+        __callFlowRules[RULE_TRANSITIONS], __callFlowRules[RULE_INIT]) # 编译好的会话过程状态机
+    __warningStates = __callFlowRules[RULE_WARNING_STATES]
+    __normalCauses = __callFlowRules[RULE_NORMAL_CAUSES]
+
+    MIX_HOT_COUNT = 1000 # mix方式下常驻内存的最近会话个数
+
+    # 缓存数据的key
+    CACHE_SESS_DK = "sess" # [(会话UUID, 开始时间, 行数数组, 偏移数组, 长度数组)]
+    CACHE_IGNORE_DK = "ignore"
+    CACHE_KEYINFO_DK = "keyInfo" # {行数:(匹配标志, 提取的结果, 日志时间)}
+    CACHE_CALLNUMBER_DK = "callNumber"
+
     def __init__(self):
         self.__sessLogInfoDict = {}
-        self.__ignoreLinesDict = {}
+        self.__ignored = IgnoredLines()
+        self.__followShownDict = {}
+        self.__callFlowStateDict = {}
+        self.__cacheHitDict = {}
+        self.__callNumberHitDict = {}
+        self.__callNumberStopDict = {}
+        self.__sessIndex = SessIndex()
         if PY2:
             return LogAnalyzer.__init__(self, self.ANALYZER_TYPE_FS)
         else:
@@ -78,7 +226,7 @@ class FsLogAnalyzer(LogAnalyzer):
         返回值：
             会话信息字典
             例如：
-            {UUID：{log:{文件索引:{行数:日志}}, callNumber:呼叫号码, result:分析结果, keyInfo:(文件索引,行数,状态类型,(状态迁移信息))}}
+            {UUID：Session(log:[(文件索引,行数,日志)], callNumber:呼叫号码, startTime:开始时间, conclusion:结论, note:备注)}
         异常：
             无
         """
@@ -86,7 +234,8 @@ class FsLogAnalyzer(LogAnalyzer):
 
     def getIgnoreLinesDict(self):
         """获取忽略的行字典
-        在解析过程中，有些无法满足正则条件的日志行，无法解析其数据，则会填入此字典中
+        在解析过程中，没有会话UUID的日志行，无法解析其数据，则会记录下来。
+        默认只保留每个文件的抽样，加载时指定保留全部(-ignore all)才是全部忽略的行
         参数列表:
             无
         返回值：
@@ -96,22 +245,40 @@ class FsLogAnalyzer(LogAnalyzer):
         异常：
             无
         """
-        return self.__ignoreLinesDict
+        return self.__ignored.getLinesDict()
 
-    def load(self, path, rl=False):
+    def getIgnoreCounts(self):
+        """获取忽略的行的计数
+        参数列表:
+            无
+        返回值：
+            {文件索引:{分类:行数}}
+        异常：
+            无
+        """
+        return self.__ignored.getCounts()
+
+    def getKeyInfoRules(self):
+        return self.__keyInfoRules
+
+    def getCallNumberRules(self):
+        return self.__callNumberRules
+
+    def load(self, path, rl=False, ingest=LogAnalyzer.INGEST_MEMORY):
         """加载FS的日志
         参数列表:
             path:日志路径
             rl:是否重新加载
+            ingest:加载方式 'memory'一次性读入内存 'stream'流式读取 'mmap'内存映射
         返回值：
             成功标志和错误信息 元组(bool, str)
         异常：
             无
         """
         if PY2:
-            return LogAnalyzer.load(self, path, rl)
+            return LogAnalyzer.load(self, path, rl, ingest)
         else:
-            return super(FsLogAnalyzer, self).load(path, rl)
+            return super(FsLogAnalyzer, self).load(path, rl, ingest)
 
     def clear(self):
         """清理FS的日志
@@ -123,7 +290,13 @@ class FsLogAnalyzer(LogAnalyzer):
             无
         """
         self.__sessLogInfoDict = {}
-        self.__ignoreLinesDict = {}
+        self.__ignored = IgnoredLines(self.getIgnoreMode())
+        self.__followShownDict = {}
+        self.__callFlowStateDict = {}
+        self.__cacheHitDict = {}
+        self.__callNumberHitDict = {}
+        self.__callNumberStopDict = {}
+        self.__sessIndex = SessIndex()
         
         return super(FsLogAnalyzer, self).clear()
         
@@ -140,11 +313,27 @@ class FsLogAnalyzer(LogAnalyzer):
         sessDict = self.getSessLogInfoDict()
         if UUID:
             if sessDict.get(UUID, False):
-                return UUID, sessDict[UUID].get(key, False)
+                return UUID, self.__getSessField(sessDict[UUID], key)
             else:
                 return UUID, None
         else:
-            return [(UUID, sessDict[UUID].get(key, False)) for UUID in sessDict.keys()]
+            return [(UUID, self.__getSessField(sessDict[UUID], key)) for UUID in sessDict.keys()]
+
+    def __getSessField(self, sess, key):
+        # 按照原来会话字典的key获取会话的字段，结果和关键信息每次重新生成
+        if key == self.SESS_LOG_DK:
+            return sess.log
+        elif key == self.SESS_FS_CALLNUMBER_DK:
+            return sess.callNumber
+        elif key == self.SESS_START_TIME_DK:
+            # 内部保存微秒数，对外仍然返回datetime
+            return None if sess.startTime is None else toDatetime(sess.startTime)
+        elif key == self.SESS_KEYINFO_DK:
+            return sess.getKeyInfoList()
+        elif key == self.SESS_RESULT_DK:
+            return {self.SESS_RESULT_CONCLUSION_DK:sess.conclusion, self.SESS_RESULT_DETAILS_DK:sess.getDetails(), \
+                self.SESS_RESULT_NOTE_DK:sess.note}
+        return False
 
     def getLogDict(self, UUID = ""):
         """获取日志字典
@@ -225,66 +414,509 @@ class FsLogAnalyzer(LogAnalyzer):
         FS的日志，左边打印的就是会话UUID信息(36位数字或字母以‘-’连接的字符串，形如4541eb63-e5b0-49f0-8d2c-31e06078013f)
         函数读取日志的每一行，按照UUID进行会话归类，建立本地UUID为key的字典，再以文件索引和行数作为key为字典，value为日志内容。
         最后包含一些关键信息，如呼叫号码、分析结果、关键信息供分析器内部逻辑使用
+        日志行通过生成器逐行获取，流式加载时原始行不会整体驻留内存；每行只读取一次，归类的同时提取关键信息和号码
+        内存映射方式加载的文件，会话中只记录日志的偏移和长度，日志内容在需要时才从文件中读取
         参数列表:
             无
         返回值：
-            成功解析的会话日志字典和无法解析的会话日志字典 dict,dict
+            成功解析的会话日志字典和忽略的行 dict,IgnoredLines
         异常：
             无
         """
-        ignoreLinesDict = {}
+        ignored = IgnoredLines(self.getIgnoreMode())
         sessLogInfoDict = {}
-        fileLen = len(self.getLines()) 
+        for f, i, line, offset, size in self.__iterCollectLines(sessLogInfoDict, ignored):
+            # 例如：4541eb63-e5b0-49f0-8d2c-31e06078013f 2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:40 sofia/external/6010@10.0.7.152:5080 Standard INIT
+            # 找到第一个空格，左边就是会话ID，右边就是日志信息
+            pos, sessUUID = splitSessLine(line)
+            if pos == -1:
+                ignored.add(f, i, line, self.decodeLine)
+                continue
+
+            # 拆分出UUID和日志信息
+            sessLog = line[pos + 1:-1]
+
+            # 内存映射或字节方式加载的文件只记录日志的位置(去掉UUID和结尾的换行)
+            ref = (offset + pos + 1, size - pos - 2) if offset != -1 else None
+
+            # 按照UUID归类存放日志信息
+            self.__addSessLog(sessLogInfoDict, sessUUID, f, i, sessLog, ref)
+
+        self.__sessLogInfoDict = sessLogInfoDict
+        self.__ignored = ignored
+
+        for sessUUID in sessLogInfoDict.keys():
+            if sessLogInfoDict[sessUUID].startTime is None:
+                print(sessUUID, "\nis not get time")
+
+        return sessLogInfoDict, ignored
+
+    def __iterCollectLines(self, sessLogInfoDict, ignored):
+        """迭代需要收集的日志行
+        默认按照文件顺序逐个文件读取，命中缓存的文件直接合并缓存的会话；
+        交错合并方式下按照日志时间合并所有文件的日志行，不使用缓存的会话
+        参数列表:
+            sessLogInfoDict:会话信息字典
+            ignored:忽略的行
+        返回值：
+            生成器，每项为元组(文件索引, 行数, 日志, 偏移, 字节长度)
+            内存映射或字节方式加载的文件返回未解码的字节行，只在需要时解码
+        异常：
+            无
+        """
+        if self.getSortMode() == self.SORT_MERGE:
+            for item in self.iterMergedLines(withOffset=True, raw=True):
+                yield item
+            return
+
+        fileLen = self.getFileCount()
         process = 0
-        for f, lines in enumerate(self.getLines()):
+        for f in range(fileLen):
             process = self.printProc(process, fileLen)
+            if f in self.__cacheHitDict:
+                self.__mergeCache(sessLogInfoDict, ignored, f)
+                continue
+            for item in self.iterLines(withOffset=True, files=[f], raw=True):
+                yield item
+
+    def __addSessLog(self, sessLogInfoDict, sessUUID, f, line, sessLog, ref=None, extract=True):
+        """按照UUID归类存放一行日志，会话不存在则新建，并提取这行日志的关键信息和号码
+        参数列表:
+            sessLogInfoDict:会话信息字典
+            sessUUID:会话UUID
+            f:文件索引
+            line:行数
+            sessLog:日志信息(去掉了UUID)，有位置时可以是未解码的字节
+            ref:日志在内存映射或字节方式加载的文件中的位置(偏移, 长度)，未映射为None
+            extract:是否提取关键信息和号码，为False时由分片的工作进程提取
+        返回值：
+            无
+        异常：
+            无
+        """
+        if sessUUID in sessLogInfoDict:
+            self.__addLogLine(sessLogInfoDict[sessUUID].log, f, line, sessLog, ref)
+            if sessLogInfoDict[sessUUID].startTime is None:
+                sessLogInfoDict[sessUUID].startTime = self.parseLogTime(sessLog)
+        else:
+            logDict = MmapSessLog(self.readMapped, self.readMappedRaw) if ref is not None else SessLog(self.readLine, len(sessUUID) + 1)
+            self.__addLogLine(logDict, f, line, sessLog, ref)
+            sessLogInfoDict[sessUUID] = Session(logDict, self.parseLogTime(sessLog))
+        if extract:
+            self.__extractLine(sessUUID, sessLogInfoDict[sessUUID], f, line, sessLog)
+
+    def __addLogLine(self, logDict, f, line, log, ref):
+        """在会话日志中加入一行
+        内存方式存放的会话，以内存方式加载的文件只记录位置，日志从已加载的行中读取；其他文件需要保存解码后的日志
+        参数列表:
+            logDict:会话日志
+            f:文件索引
+            line:行数
+            log:日志信息(去掉了UUID)，有位置时可以是未解码的字节或None
+            ref:日志在内存映射或字节方式加载的文件中的位置(偏移, 长度)，未映射为None
+        返回值：
+            无
+        异常：
+            无
+        """
+        if isinstance(logDict, SessLog):
+            if ref is None and self.isLoaded(f):
+                log = None
+            elif log is None:
+                log = self.readMapped(f, ref[0], ref[1])
+            else:
+                log = self.decodeLine(log)
+        logDict.add(f, line, log, ref)
+
+    def __addLogLines(self, logDict, f, lines, logs, offsets, lengths):
+        """在会话日志中按顺序加入同一个文件中的多行，结果与逐行调用__addLogLine一致
+        常见的情况(内存映射的文件加入MmapSessLog，其他文件加入SessLog)整批加入，其余逐行加入
+        参数列表:
+            logDict:会话日志
+            f:文件索引
+            lines:行数数组
+            logs:日志信息列表，只记录位置时为None
+            offsets:偏移数组
+            lengths:长度数组
+        返回值：
+            无
+        异常：
+            无
+        """
+        if not lines:
+            return
+        mapped = self.isMapped(f)
+        if mapped and isinstance(logDict, MmapSessLog):
+            logDict.extend(f, lines, offsets, lengths)
+        elif not mapped and isinstance(logDict, SessLog) and (self.isLoaded(f) or logs is not None):
+            logDict.extend(f, lines, None if self.isLoaded(f) else [self.decodeLine(x) for x in logs])
+        else:
             for i, line in enumerate(lines):
-                # 例如：4541eb63-e5b0-49f0-8d2c-31e06078013f 2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:40 sofia/external/6010@10.0.7.152:5080 Standard INIT
-                # 找到第一个空格，左边就是会话ID，右边就是日志信息
-                pos = line.find(' ')
-                line_len = len(line)
-                # 若没有找到空格，则不记录（UUID都是36长度的，若不是，则不记录）
-                if pos is -1 or pos < 36 or line[0:pos].count('-') != 4:
-                    if f not in ignoreLinesDict:
-                        ignoreLinesDict[f] = {}
-                    else:
-                        ignoreLinesDict[f][i] = line
-                    continue
+                self.__addLogLine(logDict, f, line, logs[i] if logs is not None else None, (offsets[i], lengths[i]) if mapped else None)
 
-                # 拆分出UUID和日志信息
-                sessUUID, sessLog = line[0:pos], line[pos + 1:-1]
-
-                # 按照UUID归类存放日志信息
-                if sessUUID in sessLogInfoDict:
-                    if f not in sessLogInfoDict[sessUUID][self.SESS_LOG_DK]:
-                        sessLogInfoDict[sessUUID][self.SESS_LOG_DK][f] = {i:sessLog}
-                        if sessLogInfoDict[sessUUID][self.SESS_START_TIME_DK] is None:
-                            sessLogInfoDict[sessUUID][self.SESS_START_TIME_DK] = self.getLogTime(sessLog)
-                    else:
-                        sessLogInfoDict[sessUUID][self.SESS_LOG_DK][f][i] = sessLog
-                        if sessLogInfoDict[sessUUID][self.SESS_START_TIME_DK] is None:
-                            sessLogInfoDict[sessUUID][self.SESS_START_TIME_DK] = self.getLogTime(sessLog)
+    def __extractLine(self, sessUUID, sess, f, line, log):
+        """提取一行会话日志的关键信息和号码
+        在收集会话日志的同时进行，日志不需要再次读取。关键信息按照到达的顺序追加到会话中，
+        找到号码的行先记录下来，收集完成后由__getCallNumber按照文件索引和行数的顺序确定会话的号码
+        参数列表:
+            sessUUID:会话UUID
+            sess:会话信息
+            f:文件索引
+            line:行数
+            log:日志信息(去掉了UUID)，可以是未解码的字节
+        返回值：
+            无
+        异常：
+            无
+        """
+        # 命中缓存的文件不再进行正则匹配，日志时间也已经保存在缓存中
+        cache = self.__cacheHitDict.get(f)
+        if cache:
+            keyInfo = cache[self.CACHE_KEYINFO_DK].get(line)
+            keyInfo and sess.addKeyInfo(f, line, keyInfo[0], keyInfo[1], keyInfo[2])
+        else:
+            keyInfo = self.__lineKeyInfo(log)
+            keyInfo and sess.addKeyInfo(f, line, keyInfo[0], keyInfo[1], self.parseLogTime(log))
+
+        # 同一文件中需要停止查找的号码之后的行，不会改变号码，不再匹配
+        # 只在文件内判断，缓存中保存的每个文件的号码行不依赖于其他文件
+        stop = self.__callNumberStopDict.get(sessUUID)
+        if stop is not None and stop[0] == f and stop[1] < line:
+            return
+        hits = cache[self.CACHE_CALLNUMBER_DK].get(line) if cache else self.__lineCallNumber(log)
+        if hits:
+            self.__addCallNumberHits(sessUUID, f, line, hits)
+
+    def __addCallNumberHits(self, sessUUID, f, line, hits):
+        """记录一行中找到的号码，由__getCallNumber确定会话的号码
+        参数列表:
+            sessUUID:会话UUID
+            f:文件索引
+            line:行数
+            hits:[(号码, 是否停止查找)]
+        返回值：
+            无
+        异常：
+            无
+        """
+        if sessUUID in self.__callNumberHitDict:
+            self.__callNumberHitDict[sessUUID].append((f, line, hits))
+        else:
+            self.__callNumberHitDict[sessUUID] = [(f, line, hits)]
+        if hits[-1][1]:
+            self.__callNumberStopDict[sessUUID] = (f, line)
+
+    def __sessCollectParallel(self, jobs):
+        """多进程按照UUID收集会话日志
+        每个文件按照行边界切分成若干块，由进程池中的工作进程分别读取和归类，得到每块的会话日志，
+        再按照文件索引和行数的顺序合并。内存映射方式加载的文件，工作进程只返回日志的位置。
+        合并时不提取关键信息和号码，只记录每行日志在文件中的位置；合并完成后按照UUID把会话分片，
+        每个工作进程按照位置读取一个分片的日志并提取，结果再合并回会话，与__sessCollect一致
+        参数列表:
+            jobs:进程数
+        返回值：
+            成功解析的会话日志字典和无法解析的会话日志字典 dict,dict
+        异常：
+            无
+        """
+        tasks = []
+        for f, path in enumerate(self.getPath()):
+            if f in self.__cacheHitDict:
+                continue
+            for start, end in splitChunks(path, rng=self.getRange(f)):
+                # 内存映射或已加载到内存的文件，工作进程不需要返回日志内容
+                tasks.append((f, path, start, end, self.isMapped(f) or self.isLoaded(f), self.getDecodeErrors()))
+
+        ignored = IgnoredLines(self.getIgnoreMode())
+        sessLogInfoDict = {}
+        refDict = {} # 需要提取的行的位置{会话UUID:(文件索引数组, 行数数组, 偏移数组, 长度数组)}
+        lineBase = {} # 每个文件已合并的行数
+        cacheList = sorted(self.__cacheHitDict.keys()) # 命中缓存的文件，按照文件顺序穿插合并
+        taskLen = len(tasks)
+        process = 0
+        # 进程池按照jobs建立，分片提取阶段使用全部进程；文件块少于jobs时，收集阶段只有块数个进程在工作
+        pool = Pool(max(jobs, 1), initShardWorker, (self.getDecodeErrors(), self.__rulePath))
+        try:
+            # imap按照任务顺序返回结果，保证合并的顺序与文件中的顺序一致
+            for f, lineCount, sessList, ignoreList in pool.imap(collectChunk, tasks):
+                process = self.printProc(process, taskLen)
+                while cacheList and cacheList[0] < f:
+                    self.__mergeCache(sessLogInfoDict, ignored, cacheList.pop(0))
+                base = lineBase.get(f, 0)
+                lineBase[f] = base + lineCount
+                mapped = self.isMapped(f)
+
+                for i, line in ignoreList:
+                    ignored.add(f, base + i, line)
+
+                for sessUUID, firstLog, lines, offsets, lengths, logs in sessList:
+                    if base:
+                        lines = array('L', [base + i for i in lines])
+                    k = 0
+                    if sessUUID not in sessLogInfoDict:
+                        self.__addSessLog(sessLogInfoDict, sessUUID, f, lines[0], firstLog, (offsets[0], lengths[0]) if mapped else None, False)
+                        k = 1
+                    self.__addLogLines(sessLogInfoDict[sessUUID].log, f, lines[k:], logs[k:] if logs is not None else None, offsets[k:], lengths[k:])
+
+                    refs = refDict.get(sessUUID)
+                    if refs is None:
+                        refs = refDict[sessUUID] = (array('H'), array('L'), array('L'), array('L'))
+                    refs[0].extend(array('H', [f]) * len(lines))
+                    refs[1].extend(lines)
+                    refs[2].extend(offsets)
+                    refs[3].extend(lengths)
+
+            for f in cacheList:
+                self.__mergeCache(sessLogInfoDict, ignored, f)
+
+            # 按照UUID分片提取关键信息和号码并分析会话过程，工作进程只需要日志的位置
+            shards = [[] for i in range(jobs)]
+            for sessUUID, refs in refDict.items():
+                shards[getShard(sessUUID, jobs)].append((sessUUID,) + refs)
+            classify = self.__classifyMode == self.CLASSIFY_SESSION
+            for result in pool.imap_unordered(analyzeShard, [(self.getPath(), classify, x) for x in shards if x]):
+                self.__mergeShard(sessLogInfoDict, result)
+        finally:
+            pool.close()
+            pool.join()
+
+        self.__sessLogInfoDict = sessLogInfoDict
+        self.__ignored = ignored
+        return sessLogInfoDict, ignored
+
+    def analyzeShard(self, task):
+        """工作进程：提取一个分片中会话日志的关键信息和号码，并分析会话过程
+        需要的行按照文件和偏移的顺序读取，每路会话的关键信息和号码按照文件索引和行数的顺序提取，与收集时逐行提取一致；
+        关键信息提取完成后，工作进程中已经有每路会话的全部关键信息，直接交给状态机分析，不需要再传递一次
+        参数列表:
+            task:([文件路径], 是否分析会话过程, [(UUID, 文件索引数组, 行数数组, 偏移数组, 长度数组)])
+        返回值：
+            (匹配标志列表, 分析详情的key元组, [(UUID, 关键信息的各列, [(文件索引, 行数, [(号码, 是否停止查找)])], 停止查找号码的行, 分析结果)],
+             关键信息提取的统计, 号码提取的统计)
+            关键信息的各列见Session.getKeyInfoColumns；分析结果为(状态, 备注, 分析详情的取值, {匹配标志:第一条提取结果})，不分析时为None
+        异常：
+            IOError 读取文件失败
+        """
+        paths, classify, refList = task
+        self.__keyInfoRules.resetStats()
+        self.__callNumberRules.resetStats()
+        self.__callNumberHitDict = {}
+        self.__callNumberStopDict = {}
+        sessList = [Session(None) for x in refList]
+        fileDict = {} # {文件索引:[(偏移, 长度, 会话位置, 行数)]}
+        for n, (sessUUID, fileArr, lineArr, offsetArr, lengthArr) in enumerate(refList):
+            for f, line, offset, length in zip(fileArr, lineArr, offsetArr, lengthArr):
+                if f in fileDict:
+                    fileDict[f].append((offset, length, n, line))
                 else:
-                    sessLogInfoDict[sessUUID] = {self.SESS_LOG_DK:{f:{i:sessLog}}, self.SESS_FS_CALLNUMBER_DK:"", \
-                        self.SESS_RESULT_DK:{self.SESS_RESULT_CONCLUSION_DK:"", self.SESS_RESULT_DETAILS_DK:{}, self.SESS_RESULT_NOTE_DK:""}, \
-                        self.SESS_KEYINFO_DK:[], self.SESS_START_TIME_DK:self.getLogTime(sessLog)}
+                    fileDict[f] = [(offset, length, n, line)]
+
+        for f in sorted(fileDict.keys()):
+            refs = sorted(fileDict[f])
+            for (offset, length, n, line), log in zip(refs, readRanges(paths[f], [x[:2] for x in refs])):
+                self.__extractLine(refList[n][0], sessList[n], f, line, log)
+
+        flagList = Session.getFlagList()
+        detailKeys = None
+        result = []
+        for n, x in enumerate(refList):
+            sess = sessList[n]
+            flowResult = None
+            if classify:
+                flow = self.__callFlow.newState()
+                kiFile, kiLine, kiFlag, kiInfo, kiTime = sess.getKeyInfoColumns()
+                for i, info in zip(kiFlag, kiInfo):
+                    flow.feed(flagList[i], info)
+                state, note = flow.classify()
+                detailsDict = flow.getDetails()
+                if detailKeys is None:
+                    detailKeys = tuple(detailsDict.keys())
+                firstDict = dict((flag, flow.getFirst(flag)) for flag in [self.SIGN_FLAG_HANGUP, self.SIGN_FLAG_R_BYE])
+                flowResult = (state, note, [detailsDict[k] for k in detailKeys], firstDict)
+            result.append((x[0], sess.getKeyInfoColumns(), self.__callNumberHitDict.get(x[0], []), self.__callNumberStopDict.get(x[0]), flowResult))
+        return flagList, detailKeys, result, self.__keyInfoRules.getStats(), self.__callNumberRules.getStats()
+
+    def __mergeShard(self, sessLogInfoDict, result):
+        """合并一个分片的关键信息、号码和分析结果(analyzeShard的返回值)
+        参数列表:
+            sessLogInfoDict:会话信息字典
+            result:分片的结果
+        返回值：
+            无
+        异常：
+            无
+        """
+        flagList, detailKeys, sessList, keyInfoStats, callNumberStats = result
+        self.__keyInfoRules.addStats(keyInfoStats)
+        self.__callNumberRules.addStats(callNumberStats)
+        for sessUUID, columns, hits, stop, flowResult in sessList:
+            sess = sessLogInfoDict[sessUUID]
+            if sess.getKeyInfoCount() == 0:
+                sess.extendKeyInfo(columns, flagList)
+                if flowResult is not None:
+                    state, note, values, firstDict = flowResult
+                    self.__shardResultDict[sessUUID] = (state, note, dict(zip(detailKeys, values)), firstDict)
             else:
-                self.__sessLogInfoDict = sessLogInfoDict
-                self.__ignoreLinesDict = ignoreLinesDict
+                # 已经有命中缓存的文件中的关键信息，合并后恢复为文件索引和行数的顺序，分析结果不完整，之后重新分析
+                sess.extendKeyInfo(columns, flagList)
+                sess.sortKeyInfo()
+            if hits:
+                self.__callNumberHitDict.setdefault(sessUUID, []).extend(hits)
+            if stop is not None and self.__callNumberStopDict.get(sessUUID, (-1, -1)) < stop:
+                self.__callNumberStopDict[sessUUID] = stop
+
+    # ----------------------------------------------分析结果缓存----------------------------------------------
+
+    def __loadCache(self):
+        """查找已加载文件的缓存
+        参数列表:
+            无
+        返回值：
+            命中缓存的文件个数
+        异常：
+            无
+        """
+        self.__cacheHitDict = {}
+        cache = self.getCache()
+        if cache is None:
+            return 0
+        for f, path in enumerate(self.getPath()):
+            # 按照时间范围加载的文件只有一部分内容，不使用缓存
+            if self.getRange(f) is not None:
+                continue
+            data = cache.load(self.__getCacheKey(f))
+            # 缓存中忽略的行的记录方式不满足当前的记录方式，需要重新收集
+            if data is not None and canRestore(data[self.CACHE_IGNORE_DK], self.getIgnoreMode()):
+                self.__cacheHitDict[f] = data
+        return len(self.__cacheHitDict)
+
+    def __getCacheKey(self, f):
+        # 解码出错时的处理方式影响提取的结果，加载方式影响会话日志的存放，都作为key的一部分
+        cache = self.getCache()
+        return cache.getKey(self.getPath()[f], "%s|%s" % (self.getDecodeErrors(), self.getIngest(f)))
+
+    def __mergeCache(self, sessLogInfoDict, ignored, f):
+        """合并一个命中缓存的文件的会话日志
+        缓存中只有日志的位置：内存映射或字节方式加载的文件直接记录位置，以内存方式加载的文件从已加载的行中读取，
+        流式加载的文件重新读取一遍文件，只保存会话日志的内容
+        参数列表:
+            sessLogInfoDict:会话信息字典
+            ignored:忽略的行
+            f:文件索引
+        返回值：
+            无
+        异常：
+            无
+        """
+        data = self.__cacheHitDict[f]
+        ignored.setFileData(f, data[self.CACHE_IGNORE_DK])
+        mapped = self.isMapped(f)
+        logDict = None
+        if not mapped and not self.isLoaded(f):
+            logDict = self.__readCachedLogs(f, data[self.CACHE_SESS_DK])
+        for sessUUID, startTime, lines, offsets, lengths in data[self.CACHE_SESS_DK]:
+            sess = sessLogInfoDict.get(sessUUID)
+            if sess is None:
+                sess = sessLogInfoDict[sessUUID] = Session(MmapSessLog(self.readMapped, self.readMappedRaw) if mapped \
+                    else SessLog(self.readLine, len(sessUUID) + 1), startTime)
+            elif sess.startTime is None:
+                sess.startTime = startTime
+            self.__addLogLines(sess.log, f, lines, [logDict[x] for x in lines] if logDict is not None else None, offsets, lengths)
+            for line in lines:
+                self.__extractLine(sessUUID, sess, f, line, None)
+
+    def __readCachedLogs(self, f, sessList):
+        """读取命中缓存的流式加载文件中的会话日志
+        参数列表:
+            f:文件索引
+            sessList:缓存中的会话列表
+        返回值：
+            {行数:日志信息(去掉了UUID)}
+        异常：
+            无
+        """
+        lines = set()
+        for x in sessList:
+            lines.update(x[2])
+        logDict = {}
+        for i, line in enumerate(self.iterFileLines(f)):
+            if i in lines:
+                pos, sessUUID = splitSessLine(line)
+                logDict[i] = line[pos + 1:-1]
+                if len(logDict) == len(lines):
+                    break
+        return logDict
 
-        for sessUUID in sessLogInfoDict.keys():
-            if sessLogInfoDict[sessUUID][self.SESS_START_TIME_DK] is None:
-                print(sessUUID, "\nis not get time")
+    def __saveCache(self):
+        """保存未命中缓存的文件的分析结果
+        按照文件拆分会话日志的位置、关键信息和号码提取结果，每个文件保存一份缓存；
+        会话日志只保存位置，无法确定位置的文件不保存
+        参数列表:
+            无
+        返回值：
+            保存的缓存个数
+        异常：
+            无
+        """
+        cache = self.getCache()
+        if cache is None:
+            return 0
+
+        dataDict = {}
+        for f in range(self.getFileCount()):
+            if f not in self.__cacheHitDict and self.getRange(f) is None:
+                dataDict[f] = {self.CACHE_SESS_DK:{}, self.CACHE_IGNORE_DK:self.__ignored.getFileData(f), \
+                    self.CACHE_KEYINFO_DK:{}, self.CACHE_CALLNUMBER_DK:{}}
+        if not dataDict:
+            return 0
+
+        for sessUUID, sess in self.getSessLogInfoDict().items():
+            for f, line, sessLog in sess.log.iterLines(raw=True):
+                data = dataDict.get(f)
+                if data is None:
+                    continue
+                # [开始时间, 行数数组]，开始时间为这个文件中第一个能解析出时间的行
+                item = data[self.CACHE_SESS_DK].get(sessUUID)
+                if item is None:
+                    item = data[self.CACHE_SESS_DK][sessUUID] = [None, array('L')]
+                if item[0] is None:
+                    item[0] = self.parseLogTime(sessLog)
+                item[1].append(line)
+            for f, line, hits in self.__callNumberHitDict.get(sessUUID, []):
+                if f in dataDict:
+                    dataDict[f][self.CACHE_CALLNUMBER_DK][line] = hits
+            for f, line, flag, res, t in sess.getKeyInfoList():
+                if f in dataDict:
+                    dataDict[f][self.CACHE_KEYINFO_DK][line] = (flag, res, t)
 
-        return sessLogInfoDict, ignoreLinesDict
+        count = 0
+        for f, data in dataDict.items():
+            lines = set()
+            for startTime, lineList in data[self.CACHE_SESS_DK].values():
+                lines.update(lineList)
+            try:
+                refs = self.getLineRefs(f, lines)
+            except (IOError, OSError):
+                refs = None
+            if refs is None:
+                continue
+            sessList = []
+            for sessUUID, (startTime, lineList) in data[self.CACHE_SESS_DK].items():
+                sessList.append((sessUUID, startTime, lineList, array('L', [refs[x][0] for x in lineList]), array('L', [refs[x][1] for x in lineList])))
+            # 会话按照在文件中首次出现的顺序排列
+            data[self.CACHE_SESS_DK] = sorted(sessList, key=lambda x:x[2][0])
+            if cache.save(self.__getCacheKey(f), data):
+                count += 1
+        return count
 
     # 获取会话中的呼叫号码
-    def __getCallNumber(self):
+    def __getCallNumber(self, sessUUIDList=None):
         """获取呼叫号码
-        在建立了会话日志字典之后，分析每路会话，以正则的方式匹配提取其中的号码段，最后写入此路会话的字典信息callNumber中。
+        收集会话日志时已经记录了找到号码的行，按照文件索引和行数的顺序确定号码，最后写入此路会话的字典信息callNumber中。
+        交错合并方式下号码行按照日志时间到达，所有文件视为同一份日志，按照到达的顺序确定号码。
         号码的提取样例为(sofia/external/6010@10.0.7.152:5080)，其中的6010为号码
         参数列表:
-            无
+            sessUUIDList:需要提取的会话UUID列表，None为全部会话
         返回值：
             无
         异常：
@@ -294,34 +926,24 @@ class FsLogAnalyzer(LogAnalyzer):
         # 例如 2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:473 (sofia/external/6010@10.0.7.152:5080) Running State Change CS_INIT
         sessLen = len(sessLogInfoDict) 
         process = 0
-        for sessUUID in sessLogInfoDict.keys():
-            process = self.printProc(process, sessLen, widgetType = "percent")
-            for f in sessLogInfoDict[sessUUID][self.SESS_LOG_DK].keys():
-                flag = False
-                for l in sessLogInfoDict[sessUUID][self.SESS_LOG_DK][f].keys():
-                    # 取一行日志
-                    sessLog = sessLogInfoDict[sessUUID][self.SESS_LOG_DK][f][l]
-                    # 进行正则匹配，以"(sofia/external/"作为开头关键字，以")"作为结尾，"@"作为分隔，提取其中的号码
-                    # 默认按照此行日志取号码
-                    res = self.reMatch("New Channel sofia\/(.*)\/(\d*)\@(.*?) \[", sessLog, 3)
-                    if res:
-                        sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] = res[1]
-                        flag = True
-
-                    # 若有号码变换，需要取变换的号码
-                    res = self.reMatch("Dialplan: sofia\/(.*)\/(.*) Action transfer\((\d*) XML default\)", sessLog, 3)
-                    if res:
-                        sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] = res[2]
-                        flag = True
-                        break
-
-                    res = self.reMatch("<(\d*)>->(\d*) in context", sessLog, 2)
-                    if res:
-                        sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] = res[1]
-                        flag = True
-                        break
-
-                if flag:
+        merge = self.getSortMode() == self.SORT_MERGE
+        for sessUUID in (sessLogInfoDict.keys() if sessUUIDList is None else sessUUIDList):
+            if sessUUIDList is None:
+                process = self.printProc(process, sessLen, widgetType = "percent")
+            flag = False
+            stop = False
+            curFile = -1
+            hitList = self.__callNumberHitDict.get(sessUUID, [])
+            for f, l, hits in (hitList if merge else sorted(hitList)):
+                # 在某个文件中已经找到号码，则不再查找后面的文件
+                if flag and f != curFile and not merge:
+                    break
+                curFile = f
+
+                for number, stop in hits:
+                    sessLogInfoDict[sessUUID].callNumber = number
+                    flag = True
+                if stop:
                     break
             # 没有找到号码，可能是日志文件的格式发生了变化
             else:
@@ -330,315 +952,447 @@ class FsLogAnalyzer(LogAnalyzer):
         else:
             pass
 
-
-    # 会话关键信息收集
-    def __sessKeyInfoCollect(self):
-        """会话关键信息收集
-        在建立了会话日志字典之后，分析每路会话，以正则的方式匹配其中的状态转移和收取消息日志。
+    def __lineCallNumber(self, sessLog):
+        """提取一行日志中的呼叫号码
+        参数列表:
+            sessLog:日志信息
+        返回值：
+            [(号码, 是否停止查找)]，按照匹配的先后顺序
+        异常：
+            无
+        """
+        hits = []
+        for stop, res in self.__callNumberRules.iterMatch(sessLog, self.decodeLine):
+            hits.append((res[0], stop))
+            if stop:
+                break
+        return hits
+
+
+    # 会话关键信息提取
+    def __lineKeyInfo(self, log):
+        """提取一行日志中的关键信息
+        以正则的方式匹配其中的状态转移和收取消息日志。
         例如：
         State Change CS_CONSUME_MEDIA -> CS_EXECUTE 为核心层状态机迁移 -- CS类
         Callstate Change ACTIVE -> HANGUP 为呼叫层状态机迁移 -- call类
         entering state [proceeding][180] 为收响应消息的处理 -- channel类
         AUDIO RTP [sofia/external/6797@10.0.7.152:5080] 10.0.7.176 port 24776 -> 192.168.0.178 port 7076 codec: 18 ms: 20 -- RTP信息类
         Hangup sofia/external/1920@10.0.7.152:5080 [CS_CONSUME_MEDIA] [INCOMPATIBLE_DESTINATION] -- 挂断原因类
-        提取这些信息，并保存在会话字典的keyInfo中，其中以元祖的形式存放(文件索引,行号,匹配标志,提取的结果)
+        提取的信息保存在会话字典的keyInfo中，以元祖的形式存放(文件索引,行号,匹配标志,提取的结果,日志时间)
         参数列表:
-            无
+            log:日志信息
         返回值：
-            无
+            (匹配标志, 提取的结果)，没有关键信息返回None
         异常：
             无
         """
-        sessLogInfoDict = self.getSessLogInfoDict()
-        # 需要匹配的正则表达式
-        reExpInfo = [
-                ("State Change (.*) -> (.*)", 2, [], self.SIGN_FLAG_CS), # 状态转移类的日志
-                ("entering state \[(.*)\]\[(.*)\]", 2, [], self.SIGN_FLAG_CHAN), # 收到消息类的日志
-                ("Callstate Change (.*) -> (.*)", 2, [], self.SIGN_FLAG_CALL), # 呼叫状态类的日志
-                ("receiving invite from (.*) version", 1, [], self.SIGN_FLAG_R_INVITE),
-                ("AUDIO RTP \[(.*)\] (.*) port (\d+) -> (.*) port (\d+) codec: (\d+) ms: (\d+)", 7, [0], self.SIGN_FLAG_RTP), # RTP通道信息
-                ("Flipping CID from \"(.*)\" \<(.*)\> to \"(.*)\" \<(.*)\>", 4, [], self.SIGN_FLAG_CALLNUMBER), # 呼叫号码
-                ("952 Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], self.SIGN_FLAG_R_BYE),
-                ("Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], self.SIGN_FLAG_HANGUP),
-                ("Sending BYE to(.*)", 1, [0], self.SIGN_FLAG_S_BYE),
-                ("Sending CANCEL to(.*)", 1, [0], self.SIGN_FLAG_CANCEL),
-            ]
-        sessLen = len(sessLogInfoDict) 
-        process = 0
-        for sessUUID in sessLogInfoDict.keys():
-            process = self.printProc(process, sessLen, widgetType = "percent", begin=0, end=50)
-            keyInfoList = []
-            logFileDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-            fileList = sorted(logFileDict.items(), key=lambda logFileDict:logFileDict[0])
-            for f, logDict in fileList:
-                logList = sorted(logDict.items(), key=lambda logDict:logDict[0])
-                for line, log in logList:
-                    for reExpr, expLen, dropPos, flag in reExpInfo:
-                        res = self.reMatch(reExpr, log, expLen)
-                        if res:
-                            l = list(res)
-                            for dPos in [x for x in sorted(dropPos, reverse=True) if dropPos and x < len(res)]:
-                                try:
-                                    del l[dPos]
-                                except Exception as Err:
-                                    s = str(Err, reExpInfo[i], res)
-                                    PRINT(s)
-                                    raise
-                            res = tuple(l)
-                            keyInfoList.append((f, line, flag, res))
-                            break       
-            else:
-                sessLogInfoDict[sessUUID][self.SESS_KEYINFO_DK] = keyInfoList
-
-    def __match(self, keyInfoList, flag, param1 = "", param2 = "", f = -1, l = -1, mod="normal"):
-        l = [(i, x) for i, x in enumerate(keyInfoList) if x[2] == flag and \
-                ((len(x[3]) >= 1 and param1.strip() == x[3][0].strip()) if param1 != "" else True) and \
-                ((len(x[3]) >= 2 and param2.strip() == x[3][1].strip()) if param2 != "" else True) and \
-                (x[0] >= f if f != -1 else True) and \
-                (x[1] >= l if l != -1 else True)]
+        # 未解码的字节先按照规则的固定字符串过滤，命中才解码
+        return self.__keyInfoRules.match(log, self.decodeLine)
+
+    def __match(self, keyInfoIndex, flag, param1 = "", param2 = "", f = -1, l = -1, mod="normal"):
+        i = keyInfoIndex.find(flag, param1, param2, f, l)
         if mod in [self.MATCH_MOD_NORMAL]:
-            return any(l)
+            return i != -1
+        elif i == -1:
+            return False
         elif mod in [self.MATCH_MOD_EXTEND]:
-            return (l[0][1][0], l[0][1][1], l[0][0]) if any(l) else False
+            x = keyInfoIndex.getKeyInfoList()[i]
+            return (x[0], x[1], i)
         elif mod in [self.MATCH_MOD_DETAILS]:
-            return l[0][1][3] if any(l) else False
+            return keyInfoIndex.getKeyInfoList()[i][3]
         else:
             return False
 
-    def __matchCsStateChange(self, keyInfoList, fromState, toState):
-        """CS状态变迁匹配
+    # 分析会话过程
+    def __sessAnalysis(self, sessUUIDList=None):
+        """会话分析
+        分析每路会话的状态变迁过程。会话的关键信息按照顺序交给状态机，由状态机根据迁移表确定会话过程，再根据挂断原因和错误应答确定结论。
+        跟踪模式下(指定会话UUID列表)保留每路会话的状态机，再次分析时只接收新增的关键信息
         参数列表:
-            keyInfoList:关键信息列表
-            fromState:迁移前的状态
-            toState:迁移到的状态
+            sessUUIDList:需要分析的会话UUID列表，None为全部会话
         返回值：
-            成功或失败 bool
+            无
         异常：
             无
         """
-        return self.__match(keyInfoList, self.SIGN_FLAG_CS, fromState, toState)
+        sessLogInfoDict = self.getSessLogInfoDict()
+        sessLen = len(sessLogInfoDict) 
+        process = 0
+        for sessUUID in (sessLogInfoDict.keys() if sessUUIDList is None else sessUUIDList):
+            if sessUUIDList is None:
+                process = self.printProc(process, sessLen, widgetType = "percent", begin=50, end=100)
+            sess = sessLogInfoDict[sessUUID]
+            # 并行收集时已经在工作进程中分析过(跟踪模式下有新增的关键信息，需要重新分析)
+            if sessUUIDList is None and sessUUID in self.__shardResultDict:
+                state, note, detailsDict, firstDict = self.__shardResultDict[sessUUID]
+                self.__setConclusion(sess, state, note, detailsDict, firstDict.get)
+                continue
+            flow = self.__callFlowStateDict.get(sessUUID) if sessUUIDList is not None else None
+            if flow is None:
+                flow = self.__callFlow.newState()
+                if sessUUIDList is not None:
+                    self.__callFlowStateDict[sessUUID] = flow
+            for i in range(flow.getCount(), sess.getKeyInfoCount()):
+                x = sess.getKeyInfo(i)
+                flow.feed(x[2], x[3])
+
+            state, note = flow.classify()
+            self.__setConclusion(sess, state, note, flow.getDetails(), flow.getFirst)
+        if sessUUIDList is None:
+            self.__shardResultDict = {}
+
+    def __sessAnalysisColumnar(self):
+        """按列分析全部会话
+        所有会话的关键信息拼接为一张表，事实、错误应答和状态迁移对全部会话一起用向量运算计算(需要numpy)，
+        结论与逐个会话分析相同
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            无
+        """
+        sessLogInfoDict = self.getSessLogInfoDict()
+        sessList = list(sessLogInfoDict.values())
+        result = columnar.classifyAll(self.__callFlow, columnar.KeyInfoTable(sessList), Session.getFlagList())
+        sessLen = len(sessList)
+        process = 0
+        for i, sess in enumerate(sessList):
+            process = self.printProc(process, sessLen, widgetType = "percent", begin=50, end=100)
+            state, note = result.classify(i)
+            self.__setConclusion(sess, state, note, result.getDetails(i), lambda flag: result.getFirst(i, flag))
 
-    def __matchCallStateChange(self, keyInfoList, fromState, toState):
-        """call状态变迁匹配
+    def __setConclusion(self, sess, state, note, detailsDict, getFirst):
+        """根据会话过程、挂断原因和错误应答确定结论，保存到会话
         参数列表:
-            keyInfoList:关键信息列表
-            fromState:迁移前的状态
-            toState:迁移到的状态
+            sess:Session
+            state:状态机的状态
+            note:状态机的备注
+            detailsDict:分析详情
+            getFirst:获取某个匹配标志第一条提取结果的函数
         返回值：
-            成功或失败 bool
+            无
         异常：
             无
         """
-        return self.__match(keyInfoList, self.SIGN_FLAG_CALL, fromState, toState)
+        if state in self.__warningStates:
+            conclusion = "WARNING"
+        else:
+            conclusion = "OK"
+            # 判断挂断原因
+            res = getFirst(self.SIGN_FLAG_HANGUP)
+            st, reason = res if res else ("", "")
+            if reason:
+                note += "{[" + st + "]" + reason + "}"
+                if reason not in self.__normalCauses:
+                    conclusion = "ERROR"
+            else:
+                res = getFirst(self.SIGN_FLAG_R_BYE)
+                st, reason = res if res else ("", "")
+                if reason:
+                    note += "{[" + st + "]" + reason + "}"
+                    if reason not in self.__normalCauses:
+                        conclusion = "ERROR"
+
+            # 收到错误应答
+            for name, flag, fuzzyList in self.__callFlow.getCodeRuleList():
+                if detailsDict[name]:
+                    conclusion = "ERROR"
+                    note += "(recv %s)" % detailsDict[name][0][1]
+                    break
+
+        note += "]"
+        if self.__detailKeys is None:
+            self.__detailKeys = tuple(detailsDict.keys())
+        sess.note = note
+        sess.setDetails(self.__detailKeys, [detailsDict[k] for k in self.__detailKeys])
+        sess.conclusion = conclusion
+
+    # 分析会话日志
+    def __analysis(self, sessUUIDList=None):
+        # 跟踪模式只分析有新日志的会话，仍然逐个会话接收
+        if sessUUIDList is None and self.__classifyMode == self.CLASSIFY_COLUMNAR:
+            self.__sessAnalysisColumnar()
+        else:
+            self.__sessAnalysis(sessUUIDList)
 
-    def __fuzzyMatchChannelStateCode(self, keyInfoList, fuzzyCode):
-        """通道状态码模糊匹配
-        模糊码以X代表一个任意数字位，例如4XX，则为匹配4开头应答码
+        # 号码和结论都已确定，全部分析后重新建立索引，增量分析只更新有新日志的会话
+        sessLogInfoDict = self.getSessLogInfoDict()
+        if sessUUIDList is None:
+            self.__sessIndex.build(sessLogInfoDict)
+        else:
+            for sessUUID in sessUUIDList:
+                self.__sessIndex.update(sessUUID, sessLogInfoDict[sessUUID])
+
+    def setClassifyMode(self, mode):
+        """设置会话过程的分析方式
         参数列表:
-            keyInfoList:关键信息列表
-            fuzzyCode:模糊状态码
+            mode:CLASSIFY_SESSION逐个会话分析，CLASSIFY_COLUMNAR全部会话按列分析(需要numpy)
         返回值：
-            匹配到的值
+            成功或失败，错误信息 bool,str
         异常：
             无
         """
-        codeList = []
-        for x in keyInfoList:
-            if x[2] == self.SIGN_FLAG_CHAN:
-                reExpr = "(" + fuzzyCode.replace("X","\\d").replace("x", "\\d") + ")"
-                res = self.reMatch(reExpr, x[3][1], 1)
-                res and codeList.append(x[3])
-        return codeList
+        if mode == self.CLASSIFY_COLUMNAR and not columnar.isAvailable():
+            return False, "缺少numpy模块，无法按列分析"
+        self.__classifyMode = mode
+        return True, ""
+
+    def getClassifyMode(self):
+        return self.__classifyMode
 
-    def __matchChannelStateCode(self, keyInfoList, code):
-        """通道状态码匹配
-        精确匹配状态码
+    def setCallFlowRules(self, path=""):
+        """设置会话过程的规则
+        规则文件在设置时编译为与内置规则相同的状态机，文件中省略的部分使用内置的规则
         参数列表:
-            keyInfoList:关键信息列表
-            code:状态码
+            path:规则文件路径，为空时使用内置的规则
         返回值：
-            成功或失败 bool
+            成功或失败，错误信息 bool,str
         异常：
             无
         """
-        return self.__match(keyInfoList, self.SIGN_FLAG_CHAN, param2 = code)
+        rules = dict(self.__callFlowRules)
+        if path:
+            try:
+                rules.update(loadRuleFile(path))
+                callFlow = CallFlowClassifier(rules[RULE_FACTS], rules[RULE_CODES], rules[RULE_TRANSITIONS], rules[RULE_INIT])
+            except (IOError, OSError, ValueError) as e:
+                return False, str(e)
+        else:
+            callFlow = self.__class__.__callFlow
+        self.__rulePath = path
+        self.__callFlow = callFlow
+        self.__warningStates = rules[RULE_WARNING_STATES]
+        self.__normalCauses = rules[RULE_NORMAL_CAUSES]
+        # 分析详情的key随规则变化，跟踪模式下的状态机和工作进程的分析结果也需要按照新的规则重新建立
+        self.__detailKeys = None
+        self.__callFlowStateDict = {}
+        self.__shardResultDict = {}
+        return True, ""
 
-    def __matchChannelStateDesc(self, keyInfoList, desc):
-        """通道状态描述匹配
-        匹配状态描述
+    def getCallFlowRulePath(self):
+        return self.__rulePath
+
+    def dumpCallFlowRules(self, path):
+        """保存内置的会话过程规则，作为编写规则文件的模板
         参数列表:
-            keyInfoList:关键信息列表
-            desc:描述
+            path:规则文件路径
         返回值：
-            成功或失败 bool
+            成功或失败，错误信息 bool,str
         异常：
             无
         """
-        return self.__match(keyInfoList, self.SIGN_FLAG_CHAN, param1 = desc)
+        try:
+            dumpRuleFile(path, self.__callFlowRules)
+        except (IOError, OSError) as e:
+            return False, str(e)
+        return True, ""
 
-    # 分析会话过程
-    def __sessAnalysis(self):
-        """会话分析
-        分析每路会话的状态变迁过程。首先确定有哪些状态在变迁，然后建立状态迁移标准模板，去匹配其中的过程
+    def reanalyze(self):
+        """使用已经提取的关键信息重新分析全部会话
+        更换规则文件后调用，不需要重新读取和解析日志
         参数列表:
             无
         返回值：
+            重新分析的会话个数
+        异常：
             无
+        """
+        time1 = time.time()
+        s = "正在分析会话过程..."
+        PRINT(s, end='')
+        self.__analysis()
+        time2 = time.time()
+        s = "OK (耗时：%.2f秒)" % (time2 - time1)
+        PRINT(s, color='green')
+        return len(self.getSessLogInfoDict())
+
+    # 增量分析
+    def feedLines(self, f, lineNo, lines):
+        """增量加入日志行并分析
+        用于跟踪正在写入的日志，新的日志行按照UUID归类并提取关键信息后，只对有新日志的会话重新确定号码并重新分析
+        参数列表:
+            f:文件索引
+            lineNo:第一行的行数
+            lines:日志行列表
+        返回值：
+            重新分析的会话UUID列表
         异常：
             无
         """
         sessLogInfoDict = self.getSessLogInfoDict()
-        sessLen = len(sessLogInfoDict) 
-        process = 0
-        for sessUUID in sessLogInfoDict.keys():
-            process = self.printProc(process, sessLen, widgetType = "percent", begin=50, end=100)
-            keyInfoList = sessLogInfoDict[sessUUID][self.SESS_KEYINFO_DK]
-            #if sessUUID == "4befcdab-a4cc-4d6a-979f-bbff65d729b0":
-            #    print("\n")
-            #    for k in keyInfoList:
-            #        print(k)
-            conclusion = ""
-            note = ""
-            detailsDict = {
-                "CS_NEW__CS_INIT": self.__matchCsStateChange(keyInfoList, "CS_NEW", "CS_INIT"),
-                "CS_INIT__CS_ROUTING": self.__matchCsStateChange(keyInfoList, "CS_INIT", "CS_ROUTING"),
-                "CS_ROUTING__CS_CONSUME_MEDIA": self.__matchCsStateChange(keyInfoList, "CS_ROUTING", "CS_CONSUME_MEDIA"),
-                "CS_CONSUME_MEDIA__CS_EXECUTE": self.__matchCsStateChange(keyInfoList, "CS_CONSUME_MEDIA", "CS_EXECUTE"),
-
-                "DOWN__RINGING": self.__matchCallStateChange(keyInfoList, "DOWN", "RINGING"),
-                "DOWN__EARLY": self.__matchCallStateChange(keyInfoList, "DOWN", "EARLY"),
-                "DOWN__ACTIVE": self.__matchCallStateChange(keyInfoList, "DOWN", "ACTIVE"),
-                "EARLY__RINGING": self.__matchCallStateChange(keyInfoList, "EARLY", "RINGING"),
-                "EARLY__ACTIVE": self.__matchCallStateChange(keyInfoList, "EARLY", "ACTIVE"),
-                "RINGING__ACTIVE": self.__matchCallStateChange(keyInfoList, "RINGING", "ACTIVE"),
-                "DOWN__HANGUP": self.__matchCallStateChange(keyInfoList, "DOWN", "HANGUP"),
-                "EARLY__HANGUP": self.__matchCallStateChange(keyInfoList, "EARLY", "HANGUP"),
-                "RINGING__HANGUP": self.__matchCallStateChange(keyInfoList, "RINGING", "HANGUP"),
-                "ACTIVE__HANGUP": self.__matchCallStateChange(keyInfoList, "ACTIVE", "HANGUP"),
-
-                "calling_0": self.__matchChannelStateDesc(keyInfoList, "calling"),
-                "proceeding_180": self.__matchChannelStateCode(keyInfoList, "180"),
-                "proceeding_183": self.__matchChannelStateCode(keyInfoList, "183"),
-                "completing_200": self.__matchChannelStateDesc(keyInfoList, "completing"),
-                "completed_200": self.__matchChannelStateDesc(keyInfoList, "completed"),
-                "ready_200": self.__matchChannelStateDesc(keyInfoList, "ready"),
-                "terminated_list": self.__fuzzyMatchChannelStateCode(keyInfoList, "4xx") + \
-                    self.__fuzzyMatchChannelStateCode(keyInfoList, "5xx") + \
-                    self.__fuzzyMatchChannelStateCode(keyInfoList, "6xx"),
-                }
-
-            # 标志性处理类的状态
-            case_calling_invite = {"CS_INIT__CS_ROUTING":True, "CS_ROUTING__CS_CONSUME_MEDIA":True, "calling_0":True,}
-            case_ringing_180 = {"proceeding_180":True,}
-            case_ringing_183 = {"proceeding_183":True,}
-            case_ringinged_180 = {"DOWN__RINGING":True,}
-            case_ringinged_183 = {"DOWN__EARLY":True,}
-            case_ringing_183_180 = {"DOWN__EARLY":True, "proceeding_183":True, "EARLY__RINGING":True, "proceeding_180":True,}
-            case_answer_invite = {"DOWN__ACTIVE":True, "completing_200":True, "ready_200":True,}
-            case_answerd_invite = {"DOWN__ACTIVE":True, "completed_200":True, "ready_200":True,}
-            case_answer_180 = {"RINGING__ACTIVE":True, "completing_200":True, "ready_200":True,}
-            case_answerd_180 = {"RINGING__ACTIVE":True, "completed_200":True, "ready_200":True,}
-            case_answer_183 = {"EARLY__ACTIVE":True, "completing_200":True, "ready_200":True,}
-            case_answerd_183 = {"EARLY__ACTIVE":True, "completed_200":True, "ready_200":True,}
-            case_hangup_invite = {"DOWN__HANGUP":True,}
-            case_hangup_180 = {"RINGING__HANGUP":True,}
-            case_hangup_183 = {"EARLY__HANGUP":True,}
-            case_hangup_acitve = {"ACTIVE__HANGUP":True,}
-
-            case_r_183 = {"proceeding_183":True,}
-
-            # invite->
-            if self.caseMatch(detailsDict, case_calling_invite) or self.__match(keyInfoList, self.SIGN_FLAG_R_INVITE):
-                conclusion = "OK"
-                note = "[CALLING" + (self.__match(keyInfoList, self.SIGN_FLAG_R_INVITE) and "(R)" or "(S)")
-
-                # invite-> 200<-
-                if self.caseMatch(detailsDict, case_answer_invite):
-                    note += " -> TALKING"
-                    # invite-> 200<- bye<->
-                    if self.caseMatch(detailsDict, case_hangup_acitve):
-                        note += " -> HANGUP" + (self.__match(keyInfoList, self.SIGN_FLAG_S_BYE) and "(S)" or "(R)")
-                # invite-> (bye-> or 错误应答<-)
-                elif self.caseMatch(detailsDict, case_hangup_invite):
-                    if self.caseMatch(detailsDict, case_r_183):
-                        note += " -> RINGING(183)"
-                    note += " -> HANGUP" + (self.__match(keyInfoList, self.SIGN_FLAG_S_BYE) and "(S)" or "(R)")
-                else:
-                    # invite-> (183<- or 180<-)
-                    if self.caseMatch(detailsDict, case_ringing_180) or self.caseMatch(detailsDict, case_ringing_183) or self.caseMatch(detailsDict, case_ringing_183_180) or \
-                        self.caseMatch(detailsDict, case_ringinged_180) or self.caseMatch(detailsDict, case_ringinged_183):
-                        note += " -> RINGING"
-                        # invite-> (183<- or 180<-) 200<-
-                        if self.caseMatch(detailsDict, case_answer_180) or self.caseMatch(detailsDict, case_answerd_180) or \
-                            self.caseMatch(detailsDict, case_answer_183) or self.caseMatch(detailsDict, case_answerd_183):
-                            note += " -> TALKING"
-                            # invite-> (183<- or 180<-) 200<- bye<->
-                            if self.caseMatch(detailsDict, case_hangup_acitve):
-                                note += " -> HANGUP" + (self.__match(keyInfoList, self.SIGN_FLAG_S_BYE) and "(S)" or "(R)")
-                        # invite-> (183<- or 180<-) 错误应答<-
-                        elif self.caseMatch(detailsDict, case_hangup_180) or self.caseMatch(detailsDict, case_hangup_183):
-                            note += " -> HANGUP" + (self.__match(keyInfoList, self.SIGN_FLAG_S_BYE) and "(S)" or "(R)")
-            
-                # 判断挂断原因
-                res = self.__match(keyInfoList, self.SIGN_FLAG_HANGUP, mod = self.MATCH_MOD_DETAILS)
-                st, reason = res if res else ("", "")
-                if reason:
-                    note += "{[" + st + "]" + reason + "}"
-                    if reason not in ["NORMAL_CLEARING", "MANAGER_REQUEST"]:
-                        conclusion = "ERROR"
-                else:
-                    res = self.__match(keyInfoList, self.SIGN_FLAG_R_BYE, mod = self.MATCH_MOD_DETAILS)
-                    st, reason = res if res else ("", "")
-                    if reason:
-                        note += "{[" + st + "]" + reason + "}"
-                        if reason not in ["NORMAL_CLEARING", "MANAGER_REQUEST"]:
-                            conclusion = "ERROR"
-
-                if detailsDict["terminated_list"]:
-                    conclusion = "ERROR"
-                    note += "(recv %s)" % detailsDict["terminated_list"][0][1]
-
-            else:
-                conclusion = "WARNING"
-                note += "[NOT COMPLETE"
-
-            note += "]"
-            sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_NOTE_DK] = note
-            sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_DETAILS_DK] = detailsDict
-            sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_CONCLUSION_DK] = conclusion
-            # print "\n", sessLogInfoDict[sessUUID]["callNumber"], sessLogInfoDict[sessUUID]["result"]["conclusion"], note,#, "\n", keyInfoList, "\n",detailsDict, "\n"
-                
-    # 分析会话日志
-    def __analysis(self):
-        self.__sessKeyInfoCollect()
-        self.__sessAnalysis()
+        sessUUIDList = []
+        sessUUIDSet = set()
+        for i, line in enumerate(lines, lineNo):
+            pos, sessUUID = splitSessLine(line)
+            if pos == -1:
+                self.__ignored.add(f, i, line)
+                continue
+
+            if sessUUID not in sessUUIDSet:
+                sessUUIDSet.add(sessUUID)
+                sessUUIDList.append(sessUUID)
+            self.__addSessLog(sessLogInfoDict, sessUUID, f, i, line[pos + 1:-1])
+
+        if sessUUIDList:
+            self.__getCallNumber(sessUUIDList)
+            self.__analysis(sessUUIDList)
+        return sessUUIDList
+
+    # 增量加入事件
+    def feedEvents(self, f, lineNo, records):
+        """增量加入已经转换为关键信息的事件并分析
+        用于ESL等不经过日志文本的接入方式，关键信息和号码已经由接入方转换好，不再进行正则匹配；
+        事件的日志按照行保存在会话中，显示和输出与日志文件中的行相同
+        参数列表:
+            f:文件索引(addFollowFile登记的接入来源)
+            lineNo:第一条记录的行数
+            records:[(会话UUID, 日志, [(匹配标志, 提取的结果)], [(号码, 是否停止查找)])]，日志以日志时间开头
+        返回值：
+            重新分析的会话UUID列表
+        异常：
+            无
+        """
+        sessLogInfoDict = self.getSessLogInfoDict()
+        sessUUIDList = []
+        sessUUIDSet = set()
+        for i, (sessUUID, log, keyInfoList, hits) in enumerate(records, lineNo):
+            if sessUUID not in sessUUIDSet:
+                sessUUIDSet.add(sessUUID)
+                sessUUIDList.append(sessUUID)
+            self.__addSessLog(sessLogInfoDict, sessUUID, f, i, log, extract=False)
+            sess = sessLogInfoDict[sessUUID]
+            logTime = self.parseLogTime(log)
+            for flag, info in keyInfoList:
+                sess.addKeyInfo(f, i, flag, info, logTime)
+            if hits:
+                self.__addCallNumberHits(sessUUID, f, i, hits)
+
+        if sessUUIDList:
+            self.__getCallNumber(sessUUIDList)
+            self.__analysis(sessUUIDList)
+        return sessUUIDList
 
     # 运行
-    def run(self, mode = "Normal"):
-        time1 = time.clock()
+    def run(self, mode = "memory", jobs = 1):
+        time1 = time.time()
         s = "正在收集会话信息..."
         PRINT(s, end='')
-        self.__sessCollect()
-        time2 = time.clock()
+        self.__keyInfoRules.resetStats()
+        self.__callNumberRules.resetStats()
+        self.__callNumberHitDict = {}
+        self.__callNumberStopDict = {}
+        self.__shardResultDict = {}
+        self.__loadCache()
+        # 交错合并需要按照时间逐行读取所有文件，不进行并行收集
+        if jobs > 1 and self.getSortMode() != self.SORT_MERGE:
+            self.__sessCollectParallel(jobs)
+        else:
+            self.__sessCollect()
+        time2 = time.time()
         s = "OK (耗时：%.2f秒)" % (time2 - time1)
         PRINT(s, color='green')
 
         s = "正在提取号码..."
         PRINT(s, end='')
         self.__getCallNumber()
-        time3 = time.clock()
+        time3 = time.time()
         s = "OK (耗时：%.2f秒)" % (time3 - time2)
         PRINT(s, color='green')
         
         s = "正在分析会话过程..."
         PRINT(s, end='')
         self.__analysis()
-        time4 = time.clock()
+        time4 = time.time()
         s = "OK (耗时：%.2f秒)" % (time4 - time3)
         PRINT(s, color='green')
+
+        if self.getCache() is not None:
+            s = "分析结果缓存：命中%d个文件，新保存%d个文件" % (len(self.__cacheHitDict), self.__saveCache())
+            PRINT(s)
+
+        if mode in [self.STORE_SESSION, self.STORE_MIX]:
+            s = "正在整理会话日志(%s)..." % mode
+            PRINT(s, end='')
+            count = self.__spillSessLog(mode)
+            time5 = time.time()
+            s = "OK (耗时：%.2f秒，%d个会话从磁盘读取)" % (time5 - time4, count)
+            PRINT(s, color='green')
+        elif mode in [self.STORE_MEMORY]:
+            self.__loadSessLog()
         
         return True, ""
 
+    def __loadSessLog(self):
+        """memory方式：只保存位置的会话日志全部读入内存
+        参数列表:
+            无
+        返回值：
+            读入内存的会话个数
+        异常：
+            无
+        """
+        count = 0
+        for sess in self.getSessLogInfoDict().values():
+            logDict = sess.log
+            if isinstance(logDict, SessLog):
+                continue
+            newLogDict = SessLog()
+            for f, line, log in logDict.iterLines():
+                newLogDict.add(f, line, log)
+            sess.log = newLogDict
+            count += 1
+        return count
+
+    def __spillSessLog(self, mode):
+        """session或mix方式：会话日志只保存位置，查询时再从磁盘读取，并释放内存方式加载的日志行
+        mix方式下异常的会话和最近的MIX_HOT_COUNT个会话仍然常驻内存。
+        压缩文件以及无法建立行偏移索引的文件，会话日志仍然常驻内存
+        参数列表:
+            mode:存放方式
+        返回值：
+            改为从磁盘读取的会话个数
+        异常：
+            无
+        """
+        sessLogInfoDict = self.getSessLogInfoDict()
+        hotSet = set()
+        if mode == self.STORE_MIX:
+            for sessUUID, sess in sessLogInfoDict.items():
+                if sess.conclusion.upper() not in ['OK']:
+                    hotSet.add(sessUUID)
+            recentList = sorted(sessLogInfoDict.keys(), key=lambda x:sessLogInfoDict[x].startTime or 0, reverse=True)
+            hotSet.update(recentList[:self.MIX_HOT_COUNT])
+
+        indexDict = {} # 每个文件的行偏移索引{文件索引:偏移数组}
+        count = 0
+        for sessUUID, sess in sessLogInfoDict.items():
+            logDict = sess.log
+            if not isinstance(logDict, SessLog):
+                continue
+            # 常驻内存的会话，在释放已加载的行之前复制日志内容
+            if sessUUID in hotSet:
+                logDict.detach()
+                continue
+
+            # 日志位置不包括UUID和之后的空格，以及结尾的换行
+            pos = len(sessUUID.encode('utf-8')) if PY3 else len(sessUUID)
+            newLogDict = MmapSessLog(self.readMapped, self.readMappedRaw)
+            for f, line, log in logDict.iterLines():
+                if f not in indexDict:
+                    indexDict[f] = None if self.isMapped(f) else self.buildLineIndex(f)
+                offsets = indexDict[f]
+                if offsets is None or line + 1 >= len(offsets):
+                    newLogDict.add(f, line, log)
+                else:
+                    newLogDict.add(f, line, None, (offsets[line] + pos + 1, offsets[line + 1] - offsets[line] - pos - 2))
+            sess.log = newLogDict
+            count += 1
+
+        self.releaseLines()
+        return count
+
     # 获取UUID列表
     def getSessUUIDList(self):
         sessLogInfoDict = self.getSessLogInfoDict()
@@ -647,7 +1401,7 @@ class FsLogAnalyzer(LogAnalyzer):
     # 获取呼叫号码列表
     def getCallNumberList(self):
         sessLogInfoDict = self.getSessLogInfoDict()
-        return [sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] for sessUUID in sessLogInfoDict.keys() if sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK]]
+        return [sessLogInfoDict[sessUUID].callNumber for sessUUID in sessLogInfoDict.keys() if sessLogInfoDict[sessUUID].callNumber]
 
 
     # 显示UUID列表
@@ -666,6 +1420,31 @@ class FsLogAnalyzer(LogAnalyzer):
         dupl = self.findDupl(callNumberList)
         len(dupl) and self.printList(dupl, 8, "重复的号码:", "总数：%d" % len(dupl))
 
+    # 显示提取规则的匹配统计
+    def showRuleStats(self):
+        for name, rules in [("关键信息提取", self.__keyInfoRules), ("号码提取", self.__callNumberRules)]:
+            lineCount, passCount, statList = rules.getStats()
+            s = "\n%s：检查%d行，%d行含有固定字符串(%.2f%%)，其余%d行跳过正则" % \
+                (name, lineCount, passCount, passCount * 100.0 / lineCount if lineCount else 0, lineCount - passCount)
+            PRINT(s)
+            s = "固定字符串" + " " * 14 + "执行正则" + " " * 4 + "匹配成功"
+            PRINT(s)
+            for key, flag, hits, matches in statList:
+                s = "%-24s%-12d%-12d" % (key, hits, matches)
+                PRINT(s)
+
+    # 显示忽略的行的统计
+    def showIgnoreStats(self):
+        countDict = self.getIgnoreCounts()
+        s = "%-10s" * len(CATEGORY_LIST) % tuple(CATEGORY_LIST) + "%-10s%s" % ("合计", "日志文件")
+        PRINT(s)
+        for f in sorted(countDict.keys()):
+            counts = countDict[f]
+            s = "%-10d" * len(CATEGORY_LIST) % tuple(counts.get(c, 0) for c in CATEGORY_LIST) + "%-10d%s" % (sum(counts.values()), self.getPathEx(f))
+            PRINT(s)
+        s = "\n记录方式：%s，保留%d行" % (self.getIgnoreMode(), sum(len(x) for x in self.getIgnoreLinesDict().values()))
+        PRINT(s)
+
     # ----------------------------------------------显示详细分析结果----------------------------------------------
 
     def __showDetailsHeader(self, sessUUID = "", callNumber = "", conclusion = ""):
@@ -676,23 +1455,24 @@ class FsLogAnalyzer(LogAnalyzer):
         if not sessLogInfoDict.get(sessUUID, False):
             return ""
 
-        conclusion = sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_CONCLUSION_DK]
+        conclusion = sessLogInfoDict[sessUUID].conclusion
         if targConclusion.upper() not in conclusion.upper():
             return ""
 
-        logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-        keyInfoList = sessLogInfoDict[sessUUID][self.SESS_KEYINFO_DK]
+        logDict = sessLogInfoDict[sessUUID].log
+        keyInfoList = sessLogInfoDict[sessUUID].getKeyInfoList()
         if not logDict or not keyInfoList:
             return ""
+        keyInfoIndex = KeyInfoIndex(keyInfoList)
 
-        res = self.__match(keyInfoList, self.SIGN_FLAG_CALLNUMBER, mod = self.MATCH_MOD_DETAILS)
+        res = self.__match(keyInfoIndex, self.SIGN_FLAG_CALLNUMBER, mod = self.MATCH_MOD_DETAILS)
         disFrom, numberFrom, disTo, numberTo = res if res else ("","","","")
         
-        callTime = "%s" % self.getLogTime(logDict.get(keyInfoList[0][0], {}).get(keyInfoList[0][1], ""))
+        callTime = self.formatLogTime(keyInfoList[0][4])
         
-        res = self.__match(keyInfoList, self.SIGN_FLAG_RTP, mod = self.MATCH_MOD_DETAILS)
+        res = self.__match(keyInfoIndex, self.SIGN_FLAG_RTP, mod = self.MATCH_MOD_DETAILS)
         locIp, locPort, RmtIp, RmtPort, audioPayLoad, audioPTime = res if res else ("","","","","","")
-        note = sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_NOTE_DK]
+        note = sessLogInfoDict[sessUUID].note
         s = ""
         if mode in ['normal']:
             s += "-" * 160 + "\n"
@@ -701,21 +1481,21 @@ class FsLogAnalyzer(LogAnalyzer):
             s += "%-16s: %-s\n" % ("UUID", sessUUID)
             if numberFrom:
                 s += "%-16s: %-s\n" % ("显示号码", numberFrom)
-            s += "%-16s: %-s\n" % ("呼叫号码", numberTo or sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK])
+            s += "%-16s: %-s\n" % ("呼叫号码", numberTo or sessLogInfoDict[sessUUID].callNumber)
         
         if locIp and RmtIp:
             s += "%-16s: %s:%s:%s -> %s:%s:%s (%s:%s %s:%s)\n" % ("媒体信息", "本端地址", locIp, locPort, "远端地址", RmtIp, RmtPort, "Payload", audioPayLoad, "ptime", audioPTime)
         
-        res = self.__match(keyInfoList, self.SIGN_FLAG_HANGUP, mod = self.MATCH_MOD_DETAILS)
+        res = self.__match(keyInfoIndex, self.SIGN_FLAG_HANGUP, mod = self.MATCH_MOD_DETAILS)
         reason = res[1] if res else ""
         if reason:
-            res = self.__match(keyInfoList, self.SIGN_FLAG_CHAN, param1 = self.SIGN_CHAN_TERMINATED, mod = self.MATCH_MOD_DETAILS)
+            res = self.__match(keyInfoIndex, self.SIGN_FLAG_CHAN, param1 = self.SIGN_CHAN_TERMINATED, mod = self.MATCH_MOD_DETAILS)
             s +=  "%-16s: %s\n" % ("挂断原因", res[1] if res else reason)
         else:
-            res = self.__match(keyInfoList, self.SIGN_FLAG_R_BYE, mod = self.MATCH_MOD_DETAILS)
+            res = self.__match(keyInfoIndex, self.SIGN_FLAG_R_BYE, mod = self.MATCH_MOD_DETAILS)
             reason = res[1] if res else ""
             if reason:
-                res = self.__match(keyInfoList, self.SIGN_FLAG_CHAN, param1 = self.SIGN_CHAN_TERMINATED, mod = self.MATCH_MOD_DETAILS)
+                res = self.__match(keyInfoIndex, self.SIGN_FLAG_CHAN, param1 = self.SIGN_CHAN_TERMINATED, mod = self.MATCH_MOD_DETAILS)
                 s +=  "%-16s: %s\n" % ("挂断原因", res[1] if res else reason)
 
         signTimePrev = None
@@ -729,21 +1509,20 @@ class FsLogAnalyzer(LogAnalyzer):
             l = []
             for i, k in enumerate(keyInfoList):
                 
-                signTime = "%s" % self.getLogTime(logDict.get(k[0], {}).get(k[1], ""))
-                res = self.reMatch("(\\d{4})-(\\d{1,2})-(\\d{1,2}) (\\d{2}):(\\d{2}):(\\d{2}).(\\d{6})", signTime, 7)
-                if res:
-                    signTimePrev = signTimeThis
-                    signTimeThis = datetime(int(res[0]), int(res[1]), int(res[2]), int(res[3]), int(res[4]), int(res[5]))
-                    if signTimePrev and (signTimeThis - signTimePrev).seconds > 4:
-                        s += "{0:^40}".format(" ↑ ") + "\n"
-                        s += "%s \n" % getColor("{0:^40}".format("时差:" + str((signTimeThis - signTimePrev).seconds) + "s", color="red", need=True))
-                        s += "{0:^40}".format(" ↓ ") + "\n"
+                # 关键信息中保存了日志时间，不需要再读取和解析日志，时差按照秒计算
+                signTime = self.formatLogTime(k[4])
+                signTimePrev = signTimeThis
+                signTimeThis = k[4] // 1000000
+                if signTimePrev is not None and (signTimeThis - signTimePrev) % 86400 > 4:
+                    s += "{0:^40}".format(" ↑ ") + "\n"
+                    s += "%s \n" % getColor("{0:^40}".format("时差:" + str((signTimeThis - signTimePrev) % 86400) + "s", color="red", need=True))
+                    s += "{0:^40}".format(" ↓ ") + "\n"
                 
                 if k[0] not in l:
                     s += self.getPathEx(k[0]) + "\n"
                     l.append(k[0])
                 
-                s += "%02d.  %-35s %-16s %-16s %s\n" % (i + 1, signTime, str(k[1]), str(k[2]), str(k[3]))
+                s += "%02d.  %-35s %-16s %-16s %s\n" % (i + 1, signTime, str(k[1] + self.getLineBase(k[0])), str(k[2]), str(k[3]))
             else:
                 s += "\n"
 
@@ -771,17 +1550,15 @@ class FsLogAnalyzer(LogAnalyzer):
         count = 0
         if sessUUID:
             # 若输入了callNumber
-            if (callNumber == sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] if callNumber else True) and \
+            if (callNumber == sessLogInfoDict[sessUUID].callNumber if callNumber else True) and \
                 self.__showDetailsBody(sessUUID, conclusion):
                     count += 1
         else:
-            total = len(sessLogInfoDict)
+            sessList = self.__sessIndex.find(callNumber, conclusion)
+            total = len(sessList)
             flag = False
-            sessList = sorted(sessLogInfoDict.items(), key=lambda sessLogInfoDict:sessLogInfoDict[1][self.SESS_START_TIME_DK])
-            for i, (sessUUID, context) in enumerate(sessList):
-                # 若输入了callNumber
-                if (callNumber == context[self.SESS_FS_CALLNUMBER_DK] if callNumber else True) and \
-                    self.__showDetailsBody(sessUUID, conclusion):
+            for i, sessUUID in enumerate(sessList):
+                if self.__showDetailsBody(sessUUID, conclusion):
                         count += 1
                         continueRet, flag = self.inputContinue(i, count, total, flag, self.__showDetailsHeader)
                         if not continueRet:
@@ -806,14 +1583,13 @@ class FsLogAnalyzer(LogAnalyzer):
         s = ""
         conclusion = ""
         if sessLogInfoDict.get(sessUUID, False):
-            logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-            keyInfoList = sessLogInfoDict[sessUUID][self.SESS_KEYINFO_DK]
-            if not keyInfoList or not logDict:
+            logDict = sessLogInfoDict[sessUUID].log
+            if not sessLogInfoDict[sessUUID].getKeyInfoCount() or not logDict:
                 return s, conclusion
-            callTime = "%s" % self.getLogTime(logDict.get(keyInfoList[0][0]).get(keyInfoList[0][1]))
-            callNumber = sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK]
-            conclusion = sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_CONCLUSION_DK]
-            note = sessLogInfoDict[sessUUID][self.SESS_RESULT_DK][self.SESS_RESULT_NOTE_DK]
+            callTime = self.formatLogTime(sessLogInfoDict[sessUUID].getKeyInfo(0)[4])
+            callNumber = sessLogInfoDict[sessUUID].callNumber
+            conclusion = sessLogInfoDict[sessUUID].conclusion
+            note = sessLogInfoDict[sessUUID].note
             if targConclusion.upper() in conclusion.upper():
                 color = conclusion.upper() in ['ERROR'] and 'red' or \
                     conclusion.upper() in ['WARNING'] and 'yellow' or \
@@ -841,17 +1617,15 @@ class FsLogAnalyzer(LogAnalyzer):
         count = 0
         if sessUUID:
             # 若输入了callNumber则认为需要过滤
-            if (callNumber == sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] if callNumber else True) \
+            if (callNumber == sessLogInfoDict[sessUUID].callNumber if callNumber else True) \
                 and self.__showAnalysisResultBody(sessUUID, conclusion):
                     count += 1
         else:
-            total = len(sessLogInfoDict)
+            sessList = self.__sessIndex.find(callNumber, conclusion)
+            total = len(sessList)
             flag = False
-            sessList = sorted(sessLogInfoDict.items(), key=lambda sessLogInfoDict:sessLogInfoDict[1][self.SESS_START_TIME_DK])
-            for i, (sessUUID, context) in enumerate(sessList):
-                # 若输入了callNumber或UUID则认为需要过滤
-                if (callNumber == context[self.SESS_FS_CALLNUMBER_DK] if callNumber else True) \
-                    and self.__showAnalysisResultBody(sessUUID, conclusion):
+            for i, sessUUID in enumerate(sessList):
+                if self.__showAnalysisResultBody(sessUUID, conclusion):
                         count += 1
                         # 输出分段，提示是否继续显示内容
                         continueRet, flag = self.inputContinue(i, count, total, flag, self.__showAnalysisResultHeader, conclusion)
@@ -863,6 +1637,24 @@ class FsLogAnalyzer(LogAnalyzer):
 
     def showResult(self, sessUUID = "", callNumber = "", conclusion = ""):
         return self.__showResult(sessUUID = sessUUID, callNumber = callNumber, conclusion = conclusion)
+
+    def showFollowResult(self, sessUUIDList):
+        """显示跟踪模式下结果有变化的会话
+        参数列表:
+            sessUUIDList:重新分析过的会话UUID列表
+        返回值：
+            显示的会话个数
+        异常：
+            无
+        """
+        sessLogInfoDict = self.getSessLogInfoDict()
+        count = 0
+        for sessUUID in sessUUIDList:
+            shown = (sessLogInfoDict[sessUUID].conclusion, sessLogInfoDict[sessUUID].note)
+            if self.__followShownDict.get(sessUUID) != shown and self.__showAnalysisResultBody(sessUUID):
+                self.__followShownDict[sessUUID] = shown
+                count += 1
+        return count
     
     # ----------------------------------------------输出简单分析结果到文件----------------------------------------------
 
@@ -887,7 +1679,7 @@ class FsLogAnalyzer(LogAnalyzer):
         warningCount, errorCount, okCount = 0, 0, 0
         # 输出到文件
         if sessUUID:
-            if (callNumber == sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] if callNumber else True):
+            if (callNumber == sessLogInfoDict[sessUUID].callNumber if callNumber else True):
                 s, c = self.__getAnalysisResultBody(sessUUID, conclusion, show=False)
                 context += s
                 if s and c.upper() in ['ERROR']:
@@ -897,16 +1689,15 @@ class FsLogAnalyzer(LogAnalyzer):
                 elif s and c.upper() in ['OK']:
                     okCount += 1
         else:    
-            for sessUUID in sessLogInfoDict.keys():
-                if (callNumber == sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK] if callNumber else True):
-                    s, c = self.__getAnalysisResultBody(sessUUID, conclusion, show=False)
-                    context += s
-                    if s and c.upper() in ['ERROR']:
-                        errorCount += 1
-                    elif s and c.upper() in ['WARNING']:
-                        warningCount += 1
-                    elif s and c.upper() in ['OK']:
-                        okCount += 1
+            for sessUUID in self.__sessIndex.find(callNumber, conclusion):
+                s, c = self.__getAnalysisResultBody(sessUUID, conclusion, show=False)
+                context += s
+                if s and c.upper() in ['ERROR']:
+                    errorCount += 1
+                elif s and c.upper() in ['WARNING']:
+                    warningCount += 1
+                elif s and c.upper() in ['OK']:
+                    okCount += 1
 
         if context:
             context = self.__getOutputResultHeader() + context
@@ -937,9 +1728,9 @@ class FsLogAnalyzer(LogAnalyzer):
         # 如果存在UUID（只输出一个文件）
         if sessUUID:
             if sessLogInfoDict.get(sessUUID, False):
-                logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
+                logDict = sessLogInfoDict[sessUUID].log
                 # 若输入了号码，则需要过滤号码
-                c =  sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK]
+                c =  sessLogInfoDict[sessUUID].callNumber
                 if (callNumber == c if callNumber else True):
                     fileName = name or ((callNumber or c) + "__" + sessUUID + self.OUTPUT_POSTFIX_LOG)
                     if self.output(logDict, newPath, fileName, self.__getOutputHeader(logDict, c, sessUUID)):
@@ -957,14 +1748,12 @@ class FsLogAnalyzer(LogAnalyzer):
 
             # 创建新的目录，若存在则删除
             self.makeDir(newPath)
-            for sessUUID in sessLogInfoDict.keys():
-                logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-                # 若输入了号码，则需要过滤号码
-                c =  sessLogInfoDict[sessUUID][self.SESS_FS_CALLNUMBER_DK]
-                if (callNumber == c if callNumber else True):
-                    fileName = (callNumber or c) + "__" + sessUUID + self.OUTPUT_POSTFIX_LOG
-                    if self.output(logDict, newPath, fileName, self.__getOutputHeader(logDict, c, sessUUID)):
-                        fileNameList.append(fileName)
+            for sessUUID in self.__sessIndex.find(callNumber):
+                logDict = sessLogInfoDict[sessUUID].log
+                c =  sessLogInfoDict[sessUUID].callNumber
+                fileName = (callNumber or c) + "__" + sessUUID + self.OUTPUT_POSTFIX_LOG
+                if self.output(logDict, newPath, fileName, self.__getOutputHeader(logDict, c, sessUUID)):
+                    fileNameList.append(fileName)
         return len(fileNameList), newPath, fileNameList
 
     def outputOriginLog(self, outputPath, sessUUID = "", callNumber = "", name = ""):
@@ -977,13 +1766,13 @@ class FsLogAnalyzer(LogAnalyzer):
         sessLogInfoDict = self.getSessLogInfoDict()
         newPath = outputPath
         if sessUUID:
-            sessDict = sessLogInfoDict.get(sessUUID, False)
-            if not sessDict:
+            sess = sessLogInfoDict.get(sessUUID, False)
+            if not sess:
                 return len(fileNameList), newPath, fileNameList
 
-            if sessDict[self.SESS_FS_CALLNUMBER_DK] == callNumber if callNumber else True:
-                logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-                newFileName = fileName or (sessDict[self.SESS_FS_CALLNUMBER_DK] + "__" + sessUUID + "__" + targConclusion + self.OUTPUT_POSTFIX_DETAILS)
+            if sess.callNumber == callNumber if callNumber else True:
+                logDict = sessLogInfoDict[sessUUID].log
+                newFileName = fileName or (sess.callNumber + "__" + sessUUID + "__" + targConclusion + self.OUTPUT_POSTFIX_DETAILS)
                 if self.outputEx(newPath, newFileName, self.getDetails(sessUUID, targConclusion)):
                     fileNameList.append(newFileName)
         else:
@@ -1000,15 +1789,35 @@ class FsLogAnalyzer(LogAnalyzer):
                 if not self.makeDir(newPath):
                     return len(fileNameList), newPath, fileNameList
 
-            for sessUUID in sessLogInfoDict.keys():
-                sessDict = sessLogInfoDict[sessUUID]
-                if sessDict[self.SESS_FS_CALLNUMBER_DK] == callNumber if callNumber else True:
-                    logDict = sessLogInfoDict[sessUUID][self.SESS_LOG_DK]
-                    newFileName = sessDict[self.SESS_FS_CALLNUMBER_DK] + "__" + sessUUID + "__" + targConclusion + self.OUTPUT_POSTFIX_DETAILS
-                    if self.outputEx(newPath, newFileName, self.getDetails(sessUUID, targConclusion)):
-                        fileNameList.append(newFileName)
+            for sessUUID in self.__sessIndex.find(callNumber, targConclusion):
+                sess = sessLogInfoDict[sessUUID]
+                newFileName = sess.callNumber + "__" + sessUUID + "__" + targConclusion + self.OUTPUT_POSTFIX_DETAILS
+                if self.outputEx(newPath, newFileName, self.getDetails(sessUUID, targConclusion)):
+                    fileNameList.append(newFileName)
 
         return len(fileNameList), newPath, fileNameList
 
     def outputDetails(self, outputPath, fileName = "", sessUUID = "", callNumber = "", conclusion = ""):
         return self.__outputDetails(outputPath, fileName = fileName, sessUUID = sessUUID, callNumber = callNumber, targConclusion = conclusion)
+
+# ----------------------------------------------分片的工作进程----------------------------------------------
+
+_shardAnalyzer = None # 工作进程中的分析器，只使用规则，不加载日志
+
+def initShardWorker(errors, rulePath):
+    """工作进程初始化，建立与主进程规则一致的分析器
+    参数列表:
+        errors:字节解码出错时的处理方式
+        rulePath:会话过程规则文件，为空时使用内置的规则
+    返回值：
+        无
+    异常：
+        无
+    """
+    global _shardAnalyzer
+    _shardAnalyzer = FsLogAnalyzer()
+    _shardAnalyzer.setDecodeErrors(errors)
+    _shardAnalyzer.setCallFlowRules(rulePath)
+
+def analyzeShard(task):
+    return _shardAnalyzer.analyzeShard(task)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import gzip
+import hashlib
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+if PY2:
+    import cPickle as pickle
+else:
+    import pickle
+
+class AnalysisCache(object):
+    """日志分析结果的磁盘缓存
+    以单个日志文件为单位，保存会话归类、号码提取和关键信息提取的结果，会话日志只保存位置(行数, 偏移, 长度)，不保存内容。
+    缓存的key由文件路径、大小、修改时间、文件头尾内容的摘要以及影响结果的加载选项组成，已轮转的日志文件内容不再变化，可以反复命中。
+    缓存总大小超过上限时，按照最近使用时间淘汰
+    """
+    CACHE_VERSION = 3 # 提取规则或缓存格式变化时需要增加
+    CACHE_POSTFIX = ".cache"
+    PROBE_SIZE = 64 * 1024 # 参与摘要计算的文件头尾大小
+    DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+    def __init__(self, cacheDir, maxSize=DEFAULT_MAX_SIZE):
+        self.__cacheDir = cacheDir
+        self.__maxSize = maxSize
+
+    def getCacheDir(self):
+        return self.__cacheDir
+
+    def getKey(self, path, options=""):
+        """计算日志文件的缓存key
+        参数列表:
+            path:日志文件路径
+            options:影响分析结果的加载选项(如解码出错时的处理方式和加载方式)，不同的选项使用不同的缓存
+        返回值：
+            缓存key str，文件无法访问时返回''
+        异常：
+            无
+        """
+        try:
+            st = os.stat(path)
+            h = hashlib.sha1()
+            h.update(("%d|%s|%d|%d|%s|" % (self.CACHE_VERSION, os.path.abspath(path), st.st_size, int(st.st_mtime), options)).encode('utf-8'))
+            with open(path, 'rb') as f:
+                h.update(f.read(self.PROBE_SIZE))
+                if st.st_size > self.PROBE_SIZE:
+                    f.seek(max(st.st_size - self.PROBE_SIZE, self.PROBE_SIZE))
+                    h.update(f.read(self.PROBE_SIZE))
+            return h.hexdigest()
+        except (IOError, OSError):
+            return ""
+
+    def __getCachePath(self, key):
+        return os.path.join(self.__cacheDir, key + self.CACHE_POSTFIX)
+
+    def load(self, key):
+        """读取缓存
+        参数列表:
+            key:缓存key
+        返回值：
+            缓存的数据，未命中返回None
+        异常：
+            无
+        """
+        if not key:
+            return None
+        cachePath = self.__getCachePath(key)
+        try:
+            f = gzip.open(cachePath, 'rb')
+            try:
+                data = pickle.load(f)
+            finally:
+                f.close()
+            # 更新使用时间，供淘汰时参考
+            os.utime(cachePath, None)
+            return data
+        except Exception:
+            return None
+
+    def save(self, key, data):
+        """写入缓存，并淘汰超出上限的旧缓存
+        参数列表:
+            key:缓存key
+            data:缓存的数据
+        返回值：
+            成功或失败 bool
+        异常：
+            无
+        """
+        if not key:
+            return False
+        try:
+            if not os.path.isdir(self.__cacheDir):
+                os.makedirs(self.__cacheDir)
+            cachePath = self.__getCachePath(key)
+            tmpPath = cachePath + ".tmp"
+            f = gzip.open(tmpPath, 'wb')
+            try:
+                pickle.dump(data, f, 2)
+            finally:
+                f.close()
+            os.rename(tmpPath, cachePath)
+        except Exception:
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """按照最近使用时间淘汰缓存，使总大小不超过上限
+        参数列表:
+            无
+        返回值：
+            淘汰的缓存个数
+        异常：
+            无
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.__cacheDir):
+            if not name.endswith(self.CACHE_POSTFIX):
+                continue
+            p = os.path.join(self.__cacheDir, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        count = 0
+        for mtime, size, p in sorted(entries):
+            if total <= self.__maxSize:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            total -= size
+            count += 1
+        return count
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+import json
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# 规则文件中的各部分
+RULE_INIT = "init"
+RULE_FACTS = "facts"
+RULE_CODES = "codes"
+RULE_TRANSITIONS = "transitions"
+RULE_WARNING_STATES = "warningStates"
+RULE_NORMAL_CAUSES = "normalCauses"
+
+def _native(data):
+    # PY2下json和yaml读出的字符串为unicode，转换为与日志一致的str
+    if PY2 and isinstance(data, unicode):
+        return data.encode('utf-8')
+    if isinstance(data, list):
+        return [_native(x) for x in data]
+    if isinstance(data, dict):
+        return dict((_native(k), _native(v)) for k, v in data.items())
+    return data
+
+def loadRuleFile(path):
+    """读取会话过程的规则文件
+    默认为JSON格式，扩展名为.yaml或.yml时按照YAML读取(需要安装PyYAML)。各部分都可以省略，省略的部分使用内置的规则
+    {
+        "init": 初始状态,
+        "facts": [{"name":事实, "flag":匹配标志, "param1":第一个结果, "param2":第二个结果, "detail":是否记入分析详情}],
+        "codes": [{"name":名称, "flag":匹配标志, "codes":[模糊状态码]}],
+        "transitions": [{"from":当前状态, "to":下一个状态, "when":[[事实]], "note":备注, "noteIf":[事实, 成立时追加, 不成立时追加]}],
+        "warningStates": [结论为WARNING的状态],
+        "normalCauses": [不作为错误的挂断原因]
+    }
+    param1、param2省略时不限，detail省略时为true，when省略时总是满足
+    参数列表:
+        path:规则文件路径
+    返回值：
+        {部分:CallFlowClassifier使用的格式}，只包含文件中有的部分
+    异常：
+        IOError 读取文件失败
+        ValueError 文件格式错误
+    """
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+    if path.lower().endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise ValueError("读取YAML格式的规则文件需要安装PyYAML")
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError("规则文件格式错误：%s" % e)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError("规则文件格式错误：%s" % e)
+    if not isinstance(data, dict):
+        raise ValueError("规则文件格式错误：最外层应为字典")
+    data = _native(data)
+
+    rules = {}
+    try:
+        if RULE_INIT in data:
+            rules[RULE_INIT] = data[RULE_INIT]
+        if RULE_FACTS in data:
+            rules[RULE_FACTS] = [(x["name"], x["flag"], x.get("param1", ""), x.get("param2", ""), x.get("detail", True)) \
+                for x in data[RULE_FACTS]]
+        if RULE_CODES in data:
+            rules[RULE_CODES] = [(x["name"], x["flag"], list(x["codes"])) for x in data[RULE_CODES]]
+        if RULE_TRANSITIONS in data:
+            rules[RULE_TRANSITIONS] = [(x["from"], x["to"], [tuple(guard) for guard in x.get("when", [[]])], \
+                (x.get("note", ""),) + tuple(x["noteIf"]) if "noteIf" in x else x.get("note", "")) for x in data[RULE_TRANSITIONS]]
+        for key in [RULE_WARNING_STATES, RULE_NORMAL_CAUSES]:
+            if key in data:
+                rules[key] = list(data[key])
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError("规则文件格式错误：缺少或错误的字段%s" % e)
+    return rules
+
+def dumpRuleFile(path, rules):
+    """按照loadRuleFile的格式保存规则，可作为编写规则文件的模板
+    参数列表:
+        path:规则文件路径
+        rules:{部分:CallFlowClassifier使用的格式}
+    返回值：
+        无
+    异常：
+        IOError 写入文件失败
+    """
+    data = {
+        RULE_INIT: rules[RULE_INIT],
+        RULE_FACTS: [dict(name=name, flag=flag, param1=param1, param2=param2, detail=detail) for name, flag, param1, param2, detail in rules[RULE_FACTS]],
+        RULE_CODES: [dict(name=name, flag=flag, codes=codes) for name, flag, codes in rules[RULE_CODES]],
+        RULE_TRANSITIONS: [],
+        RULE_WARNING_STATES: rules[RULE_WARNING_STATES],
+        RULE_NORMAL_CAUSES: rules[RULE_NORMAL_CAUSES],
+    }
+    for fromState, toState, guardList, note in rules[RULE_TRANSITIONS]:
+        x = {"from":fromState, "to":toState, "when":[list(guard) for guard in guardList]}
+        if isinstance(note, tuple):
+            x["note"], x["noteIf"] = note[0], list(note[1:])
+        else:
+            x["note"] = note
+        data[RULE_TRANSITIONS].append(x)
+    text = json.dumps(data, indent=4, sort_keys=True, separators=(',', ': '))
+    with open(path, 'wb') as f:
+        f.write(text.encode('utf-8') if not isinstance(text, bytes) else text)
+
+class CallFlowState(object):
+    """一路会话的状态机实例
+    按照顺序接收关键信息，随时可以得到当前的状态和备注；只有事实发生变化时才重新迁移状态
+    """
+    __slots__ = ('__classifier', '__facts', '__codes', '__firstDict', '__count', '__result')
+
+    def __init__(self, classifier):
+        self.__classifier = classifier
+        self.__facts = set() # 成立的事实
+        self.__codes = [[[] for code in rule[2]] for rule in classifier.getCodeRuleList()] # 每条状态码规则的每个模糊状态码匹配到的提取结果
+        self.__firstDict = {} # 每个匹配标志的第一条提取结果{匹配标志:提取的结果}
+        self.__count = 0 # 已接收的关键信息条数
+        self.__result = None # 缓存的(状态, 备注)，事实变化时清空
+
+    def feed(self, flag, info):
+        """接收一条关键信息
+        参数列表:
+            flag:匹配标志
+            info:提取的结果
+        返回值：
+            事实是否发生变化 bool
+        异常：
+            无
+        """
+        self.__count += 1
+        if flag not in self.__firstDict:
+            self.__firstDict[flag] = info
+        rule = self.__classifier.getFlagRule(flag)
+        if rule is None:
+            return False
+        anyList, param1Dict, param2Dict, bothDict, codeRuleList = rule
+        names = anyList
+        if param1Dict and len(info) >= 1:
+            names = names + param1Dict.get(info[0].strip(), [])
+        if (param2Dict or bothDict) and len(info) >= 2:
+            p2 = info[1].strip()
+            names = names + param2Dict.get(p2, []) + bothDict.get((info[0].strip(), p2), [])
+
+        changed = False
+        facts = self.__facts
+        for name in names:
+            if name not in facts:
+                facts.add(name)
+                changed = True
+        # 只有一个结果的关键信息没有状态码，不匹配状态码规则(与按列分析一致)
+        if len(info) >= 2:
+            for i, j, regex in codeRuleList:
+                if regex.search(info[1]):
+                    self.__codes[i][j].append(info)
+                    changed = True
+        if changed:
+            self.__result = None
+        return changed
+
+    def getCount(self):
+        return self.__count
+
+    def getFirst(self, flag):
+        """获取某个匹配标志的第一条提取结果
+        参数列表:
+            flag:匹配标志
+        返回值：
+            提取的结果，没有返回False
+        异常：
+            无
+        """
+        return self.__firstDict.get(flag, False)
+
+    def getDetails(self):
+        """获取分析详情
+        参数列表:
+            无
+        返回值：
+            {事实:是否成立}，状态码规则为{名称:[提取的结果]}(按照模糊状态码的顺序)
+        异常：
+            无
+        """
+        detailsDict = dict((name, name in self.__facts) for name in self.__classifier.getDetailFactList())
+        for i, (name, flag, fuzzyList) in enumerate(self.__classifier.getCodeRuleList()):
+            detailsDict[name] = [info for codeList in self.__codes[i] for info in codeList]
+        return detailsDict
+
+    def classify(self):
+        """按照迁移表确定当前的状态
+        参数列表:
+            无
+        返回值：
+            (状态, 备注)
+        异常：
+            无
+        """
+        if self.__result is None:
+            self.__result = self.__classifier.walk(self.__facts)
+        return self.__result
+
+class CallFlowClassifier(object):
+    """会话过程的状态机分类器
+    会话过程用声明式的表描述，只在创建时编译一次：
+    事实表 [(事实, 匹配标志, 第一个结果, 第二个结果, 是否记入分析详情)]，结果为空字符串表示不限，
+    去掉首尾空白后与关键信息的提取结果比较，有一条关键信息满足即成立；
+    状态码规则 [(名称, 匹配标志, [模糊状态码])]，模糊状态码以X代表一个任意数字位，匹配提取的第二个结果(没有第二个结果时不匹配)；
+    迁移表 [(当前状态, 下一个状态, [条件], 备注)]，条件为事实的元组，任意一个元组中的事实全部成立即满足(空元组总是满足)，
+    同一个状态的迁移按照表中的顺序检查，第一个满足条件的迁移生效并追加备注，没有满足的迁移时停止。
+    备注可以是字符串，或者(字符串, 事实, 成立时追加, 不成立时追加)
+    """
+
+    def __init__(self, factList, codeRuleList, transitionList, initState):
+        """
+        参数列表:
+            factList:事实表
+            codeRuleList:状态码规则
+            transitionList:迁移表
+            initState:初始状态
+        异常：
+            ValueError 迁移中使用了未定义的事实、备注或模糊状态码格式错误
+        """
+        self.__initState = initState
+        self.__factList = factList
+        # 按照匹配标志编译事实和状态码规则，与事实无关的关键信息只需要查一次字典
+        # {匹配标志:([不限结果的事实], {第一个结果:[事实]}, {第二个结果:[事实]}, {(第一个结果, 第二个结果):[事实]}, [(状态码规则的位置, 模糊状态码的位置, 正则)])}
+        self.__flagRuleDict = {}
+        self.__detailFactList = []
+        for name, flag, param1, param2, detail in factList:
+            rule = self.__getFlagRule(flag)
+            if param1 != "" and param2 != "":
+                rule[3].setdefault((param1.strip(), param2.strip()), []).append(name)
+            elif param1 != "":
+                rule[1].setdefault(param1.strip(), []).append(name)
+            elif param2 != "":
+                rule[2].setdefault(param2.strip(), []).append(name)
+            else:
+                rule[0].append(name)
+            detail and self.__detailFactList.append(name)
+
+        self.__codeRuleList = codeRuleList
+        for i, (name, flag, fuzzyList) in enumerate(codeRuleList):
+            for j, fuzzyCode in enumerate(fuzzyList):
+                try:
+                    regex = re.compile("(" + fuzzyCode.replace("X","\\d").replace("x", "\\d") + ")")
+                except re.error as e:
+                    raise ValueError("模糊状态码'%s'错误：%s" % (fuzzyCode, e))
+                self.__getFlagRule(flag)[4].append((i, j, regex))
+
+        factSet = set(x[0] for x in factList)
+        self.__transitionDict = {} # {当前状态:[(下一个状态, [条件], 备注)]}
+        for fromState, toState, guardList, note in transitionList:
+            for name in [name for guard in guardList for name in guard] + ([note[1]] if isinstance(note, tuple) else []):
+                if name not in factSet:
+                    raise ValueError("迁移%s -> %s使用了未定义的事实'%s'" % (fromState, toState, name))
+            if isinstance(note, tuple) and len(note) != 4:
+                raise ValueError("迁移%s -> %s的备注格式错误" % (fromState, toState))
+            self.__transitionDict.setdefault(fromState, []).append((toState, [tuple(x) for x in guardList], note))
+        self.__maxSteps = len(transitionList)
+
+    def __getFlagRule(self, flag):
+        if flag not in self.__flagRuleDict:
+            self.__flagRuleDict[flag] = ([], {}, {}, {}, [])
+        return self.__flagRuleDict[flag]
+
+    def getInitState(self):
+        return self.__initState
+
+    def getFactList(self):
+        return self.__factList
+
+    def getTransitionDict(self):
+        """获取按照当前状态分组的迁移表
+        参数列表:
+            无
+        返回值：
+            {当前状态:[(下一个状态, [条件], 备注)]}，同一个状态的迁移保持表中的顺序
+        异常：
+            无
+        """
+        return self.__transitionDict
+
+    def getDetailFactList(self):
+        return self.__detailFactList
+
+    def getCodeRuleList(self):
+        return self.__codeRuleList
+
+    def getFlagRule(self, flag):
+        """获取一个匹配标志编译好的规则
+        参数列表:
+            flag:匹配标志
+        返回值：
+            ([不限结果的事实], {第一个结果:[事实]}, {第二个结果:[事实]}, {(第一个结果, 第二个结果):[事实]}, [(状态码规则的位置, 模糊状态码的位置, 正则)])，
+            没有相关的事实和状态码规则返回None
+        异常：
+            无
+        """
+        return self.__flagRuleDict.get(flag)
+
+    def newState(self):
+        return CallFlowState(self)
+
+    def walk(self, facts):
+        """从初始状态开始按照迁移表迁移
+        参数列表:
+            facts:成立的事实(集合)
+        返回值：
+            (状态, 备注)
+        异常：
+            无
+        """
+        state = self.__initState
+        note = ""
+        # 迁移表没有环，步数不会超过迁移的个数
+        for step in range(self.__maxSteps):
+            for toState, guardList, text in self.__transitionDict.get(state, []):
+                if any(all(name in facts for name in guard) for guard in guardList):
+                    if isinstance(text, tuple):
+                        text = text[0] + (text[2] if text[1] in facts else text[3])
+                    note += text
+                    state = toState
+                    break
+            else:
+                break
+        return state, note
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def isAvailable():
+    return numpy is not None
+
+def _column(data, dtype):
+    # 紧凑数组直接作为numpy数组的缓冲区，不逐个转换
+    return numpy.frombuffer(data, dtype=dtype) if len(data) else numpy.zeros(0, dtype=dtype)
+
+class KeyInfoTable(object):
+    """全部会话的关键信息表
+    把所有会话按列存放的关键信息拼接为一张表，每条关键信息一行，列为：
+    会话序号、文件索引、行数、匹配标志位置、第一个结果、第二个结果、状态码、日志时间。
+    第一个结果和第二个结果去掉首尾空白，与状态码(第二个结果原文)一起转换为字符串表中的序号，
+    没有这个结果时为-1；相同的提取结果只转换一次
+    """
+
+    def __init__(self, sessList):
+        """
+        参数列表:
+            sessList:[Session]
+        异常：
+            IOError 缺少numpy模块
+        """
+        if numpy is None:
+            raise IOError("缺少numpy模块，无法按列分析")
+        kiFile, kiLine, kiFlag, kiTime = array('H'), array('L'), array('B'), array('d')
+        infoList = []
+        counts = array('l')
+        for sess in sessList:
+            f, l, flag, info, t = sess.getKeyInfoColumns()
+            kiFile.extend(f)
+            kiLine.extend(l)
+            kiFlag.extend(flag)
+            infoList.extend(info)
+            kiTime.extend(t)
+            counts.append(len(info))
+
+        # 先为不同的提取结果编号，再只对不同的提取结果取第一个、第二个结果
+        infoIndex = {}
+        infoId = array('l', [infoIndex.setdefault(info, len(infoIndex)) for info in infoList])
+        uniqueInfoList = [None] * len(infoIndex)
+        for info, i in infoIndex.items():
+            uniqueInfoList[i] = info
+        self.__stringList = []
+        self.__stringIndex = {}
+        param1 = numpy.array([self.__intern(info[0].strip()) if len(info) >= 1 else -1 for info in uniqueInfoList], dtype=numpy.int32)
+        param2 = numpy.array([self.__intern(info[1].strip()) if len(info) >= 2 else -1 for info in uniqueInfoList], dtype=numpy.int32)
+        code = numpy.array([self.__intern(info[1]) if len(info) >= 2 else -1 for info in uniqueInfoList], dtype=numpy.int32)
+        infoId = _column(infoId, 'i%d' % infoId.itemsize)
+
+        self.__sessCount = len(sessList)
+        self.__sess = numpy.repeat(numpy.arange(len(sessList), dtype=numpy.int32), _column(counts, 'i%d' % counts.itemsize))
+        self.__file = _column(kiFile, 'u%d' % kiFile.itemsize)
+        self.__line = _column(kiLine, 'u%d' % kiLine.itemsize)
+        self.__flag = _column(kiFlag, 'u1')
+        self.__param1 = param1[infoId] if len(infoId) else numpy.zeros(0, dtype=numpy.int32)
+        self.__param2 = param2[infoId] if len(infoId) else numpy.zeros(0, dtype=numpy.int32)
+        self.__code = code[infoId] if len(infoId) else numpy.zeros(0, dtype=numpy.int32)
+        self.__time = _column(kiTime, 'f8')
+        self.__infoList = infoList
+
+    def __intern(self, s):
+        i = self.__stringIndex.get(s)
+        if i is None:
+            i = self.__stringIndex[s] = len(self.__stringList)
+            self.__stringList.append(s)
+        return i
+
+    def getSessCount(self):
+        return self.__sessCount
+
+    def getRowCount(self):
+        return len(self.__infoList)
+
+    def getStringId(self, s):
+        """获取字符串在字符串表中的序号
+        参数列表:
+            s:字符串
+        返回值：
+            序号 int，不在表中返回-2(不会与任何提取结果相等，没有这个结果的为-1)
+        异常：
+            无
+        """
+        return self.__stringIndex.get(s, -2)
+
+    def getStringList(self):
+        return self.__stringList
+
+    def getInfo(self, row):
+        return self.__infoList[row]
+
+    def getColumns(self):
+        """获取各列
+        参数列表:
+            无
+        返回值：
+            {列名:numpy数组}，列名为sess、file、line、flag、param1、param2、code、time
+        异常：
+            无
+        """
+        return {"sess":self.__sess, "file":self.__file, "line":self.__line, "flag":self.__flag, \
+            "param1":self.__param1, "param2":self.__param2, "code":self.__code, "time":self.__time}
+
+class ColumnarResult(object):
+    """按列分析的结果，按照会话序号获取，与CallFlowState的结果一致"""
+
+    def __init__(self, table, flagList, stateList, stateId, noteList, noteId, factMatrix, detailFactList, codeLists, codeNames):
+        self.__table = table
+        self.__flagList = flagList
+        self.__stateList = stateList
+        self.__stateId = stateId
+        self.__noteList = noteList
+        self.__noteId = noteId
+        self.__factMatrix = factMatrix
+        self.__detailFactList = detailFactList
+        self.__codeLists = codeLists
+        self.__codeNames = codeNames
+        self.__firstDict = {} # {匹配标志:每个会话第一条关键信息的行，没有为-1}，按需计算
+
+    def classify(self, i):
+        """
+        参数列表:
+            i:会话序号
+        返回值：
+            (状态, 备注)
+        异常：
+            无
+        """
+        return self.__stateList[self.__stateId[i]], self.__noteList[self.__noteId[i]]
+
+    def getDetails(self, i):
+        """
+        参数列表:
+            i:会话序号
+        返回值：
+            {事实:是否成立}，状态码规则为{名称:[提取的结果]}
+        异常：
+            无
+        """
+        row = self.__factMatrix[i].tolist()
+        detailsDict = dict(zip(self.__detailFactList, row))
+        for name, codeList in zip(self.__codeNames, self.__codeLists):
+            detailsDict[name] = codeList.get(i, [])
+        return detailsDict
+
+    def getFirst(self, i, flag):
+        """获取某路会话某个匹配标志的第一条提取结果
+        参数列表:
+            i:会话序号
+            flag:匹配标志
+        返回值：
+            提取的结果，没有返回False
+        异常：
+            无
+        """
+        first = self.__firstDict.get(flag)
+        if first is None:
+            columns = self.__table.getColumns()
+            first = numpy.full(self.__table.getSessCount(), -1, dtype=numpy.int64)
+            if flag in self.__flagList:
+                rows = numpy.nonzero(columns["flag"] == self.__flagList.index(flag))[0]
+                # 表中的行按照会话序号排列，每路会话第一次出现的行就是它的第一条关键信息
+                sessIds, pos = numpy.unique(columns["sess"][rows], return_index=True)
+                first[sessIds] = rows[pos]
+            self.__firstDict[flag] = first
+        row = first[i]
+        return self.__table.getInfo(row) if row >= 0 else False
+
+def classifyAll(classifier, table, flagList):
+    """用向量运算对表中的全部会话做状态机分类
+    每个事实先对全部关键信息计算一次是否满足，再按会话序号汇总为会话×事实的布尔矩阵；
+    状态码的正则只对不同的状态码各匹配一次；迁移时所有会话同时按照迁移表迁移
+    参数列表:
+        classifier:CallFlowClassifier
+        table:KeyInfoTable
+        flagList:匹配标志列表(Session.getFlagList)
+    返回值：
+        ColumnarResult
+    异常：
+        无
+    """
+    columns = table.getColumns()
+    sess, flag = columns["sess"], columns["flag"]
+    n = table.getSessCount()
+    flagIndex = dict((x, i) for i, x in enumerate(flagList))
+    rowCount = table.getRowCount()
+
+    def sessAny(rowMask):
+        return numpy.bincount(sess[rowMask], minlength=n) > 0 if n else numpy.zeros(0, dtype=bool)
+
+    # 事实，同名的事实任意一条满足即成立
+    factColumns = {}
+    for name, f, param1, param2, detail in classifier.getFactList():
+        if f not in flagIndex:
+            rowMask = numpy.zeros(rowCount, dtype=bool)
+        else:
+            rowMask = flag == flagIndex[f]
+            if param1 != "":
+                rowMask &= columns["param1"] == table.getStringId(param1.strip())
+            if param2 != "":
+                rowMask &= columns["param2"] == table.getStringId(param2.strip())
+        if name in factColumns:
+            factColumns[name] |= sessAny(rowMask)
+        else:
+            factColumns[name] = sessAny(rowMask)
+    detailFactList = classifier.getDetailFactList()
+    if detailFactList:
+        factMatrix = numpy.column_stack([factColumns[name] for name in detailFactList])
+    else:
+        factMatrix = numpy.zeros((n, 0), dtype=bool)
+
+    # 状态码规则，每个模糊状态码匹配到的提取结果按照会话序号收集
+    stringList = table.getStringList()
+    codeNames = []
+    codeLists = []
+    for name, f, fuzzyList in classifier.getCodeRuleList():
+        codeNames.append(name)
+        codeLists.append({})
+    matchCache = {}
+    for f in set(x[1] for x in classifier.getCodeRuleList()):
+        if f not in flagIndex:
+            continue
+        flagRows = numpy.nonzero((flag == flagIndex[f]) & (columns["code"] >= 0))[0]
+        codes = columns["code"][flagRows]
+        for i, j, regex in classifier.getFlagRule(f)[4]:
+            match = matchCache.get(regex.pattern)
+            if match is None:
+                match = matchCache[regex.pattern] = numpy.array([regex.search(s) is not None for s in stringList], dtype=bool)
+            # 先按模糊状态码再按关键信息的顺序追加，与逐条接收时的顺序一致
+            codeDict = codeLists[i]
+            for row in flagRows[match[codes]].tolist():
+                codeDict.setdefault(int(sess[row]), []).append(table.getInfo(row))
+
+    # 迁移，状态和每一步的迁移都用编号表示
+    transitionDict = classifier.getTransitionDict()
+    stateList = [classifier.getInitState()]
+    stateIndex = {classifier.getInitState():0}
+    for fromState, transitionList in transitionDict.items():
+        for toState, guardList, note in transitionList:
+            for x in (fromState, toState):
+                if x not in stateIndex:
+                    stateIndex[x] = len(stateList)
+                    stateList.append(x)
+    transitions = [] # [(当前状态, 下一个状态, 条件是否满足, 备注事实是否成立, 备注)]
+    for fromState, transitionList in transitionDict.items():
+        for toState, guardList, note in transitionList:
+            guard = numpy.zeros(n, dtype=bool)
+            for names in guardList:
+                x = numpy.ones(n, dtype=bool)
+                for name in names:
+                    x &= factColumns[name]
+                guard |= x
+            noteFact = factColumns[note[1]] if isinstance(note, tuple) else None
+            transitions.append((stateIndex[fromState], stateIndex[toState], guard, noteFact, note))
+
+    maxSteps = sum(len(x) for x in transitionDict.values())
+    state = numpy.zeros(n, dtype=numpy.int32)
+    stepMatrix = numpy.full((max(maxSteps, 1), n), -1, dtype=numpy.int32) # 每一步生效的迁移编号×2+备注事实是否成立
+    active = numpy.ones(n, dtype=bool)
+    for step in range(maxSteps):
+        nextState = state.copy()
+        moved = numpy.zeros(n, dtype=bool)
+        for t, (fromState, toState, guard, noteFact, note) in enumerate(transitions):
+            take = active & ~moved & (state == fromState) & guard
+            nextState[take] = toState
+            stepMatrix[step, take] = t * 2 + (noteFact[take] if noteFact is not None else 0)
+            moved |= take
+        state = nextState
+        active = moved
+        if not active.any():
+            break
+
+    # 备注按照不同的迁移路径生成
+    if n:
+        pathList, noteId = numpy.unique(stepMatrix.T, axis=0, return_inverse=True)
+        noteId = noteId.reshape(-1)
+    else:
+        pathList, noteId = [], numpy.zeros(0, dtype=numpy.int64)
+    noteList = []
+    for path in pathList:
+        note = ""
+        for x in path.tolist():
+            if x < 0:
+                break
+            text = transitions[x // 2][4]
+            if isinstance(text, tuple):
+                text = text[0] + (text[2] if x % 2 else text[3])
+            note += text
+        noteList.append(note)
+    return ColumnarResult(table, flagList, stateList, state, noteList, noteId, factMatrix, detailFactList, codeLists, codeNames)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+import gzip
+import bz2
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_NONE = ''
+COMPRESS_GZIP = 'gzip'
+COMPRESS_BZ2 = 'bz2'
+COMPRESS_XZ = 'xz'
+COMPRESS_ZSTD = 'zstd'
+
+# 按照文件头的魔数识别压缩格式，不依赖扩展名
+MAGIC_LIST = [
+    (b'\x1f\x8b', COMPRESS_GZIP),
+    (b'BZh', COMPRESS_BZ2),
+    (b'\xfd7zXZ\x00', COMPRESS_XZ),
+    (b'\x28\xb5\x2f\xfd', COMPRESS_ZSTD),
+]
+MAGIC_MAX_LEN = 6
+
+def getCompression(path):
+    """识别文件的压缩格式
+    参数列表:
+        path:文件路径
+    返回值：
+        压缩格式 str，未压缩返回''
+    异常：
+        IOError 打开文件失败
+    """
+    with open(path, 'rb') as f:
+        head = f.read(MAGIC_MAX_LEN)
+    for magic, compression in MAGIC_LIST:
+        if head.startswith(magic):
+            return compression
+    return COMPRESS_NONE
+
+def openCompressed(path, compression):
+    """以流的方式打开压缩文件，边读边解压，不产生临时文件
+    gzip的多个成员拼接(如logrotate的copytruncate后追加压缩)会连续解压
+    参数列表:
+        path:文件路径
+        compression:压缩格式
+    返回值：
+        二进制文件对象
+    异常：
+        IOError 打开文件失败或缺少解压模块
+    """
+    if compression == COMPRESS_GZIP:
+        return gzip.GzipFile(path, 'rb')
+    elif compression == COMPRESS_BZ2:
+        # python2的BZ2File不支持多个压缩流拼接
+        return bz2.BZ2File(path, 'rb')
+    elif compression == COMPRESS_XZ:
+        if lzma is None:
+            raise IOError("缺少lzma模块，无法解压xz文件")
+        return lzma.LZMAFile(path, 'rb')
+    elif compression == COMPRESS_ZSTD:
+        if zstandard is None:
+            raise IOError("缺少zstandard模块，无法解压zst文件")
+        # read_across_frames: 多个压缩帧拼接时连续解压
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True))
+    return open(path, 'rb')
+
+def normalizeNewline(line):
+    """把行尾的\\r\\n换成\\n，与python3以文本方式读取的结果一致
+    参数列表:
+        line:日志行(字节或字符串)
+    返回值：
+        日志行，类型不变
+    异常：
+        无
+    """
+    if line.endswith(b'\r\n' if isinstance(line, bytes) else u'\r\n'):
+        return line[:-2] + line[-1:]
+    return line
+
+def openLogFile(path, binary=False):
+    """打开日志文件，压缩文件透明解压
+    参数列表:
+        path:文件路径
+        binary:是否以二进制方式打开
+    返回值：
+        文件对象
+    异常：
+        IOError 打开文件失败或缺少解压模块
+    """
+    compression = getCompression(path)
+    if compression == COMPRESS_NONE:
+        # python2以通用换行方式读取，\r\n与python3一样读取为\n
+        return open(path, 'rb' if binary else ('rU' if PY2 else 'r'))
+
+    f = openCompressed(path, compression)
+    if binary or PY2:
+        return f
+    return io.TextIOWrapper(f)
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+# FS的Event Socket(ESL)事件接入，只支持python3(asyncio)
+
+import re
+import asyncio
+from datetime import datetime
+from urllib.parse import unquote
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8021
+DEFAULT_PASSWORD = "ClueCon"
+
+QUEUE_SIZE = 10000 # 等待分析的事件个数上限
+BATCH_SIZE = 500 # 每次交给分析器的事件个数上限
+
+# 订阅的事件
+EVENT_LIST = [
+    "CHANNEL_CREATE",
+    "CHANNEL_STATE",
+    "CHANNEL_CALLSTATE",
+    "CHANNEL_PROGRESS",
+    "CHANNEL_PROGRESS_MEDIA",
+    "CHANNEL_ANSWER",
+    "CHANNEL_EXECUTE",
+    "CHANNEL_HANGUP",
+    "CHANNEL_HANGUP_COMPLETE",
+    "CHANNEL_DESTROY",
+]
+
+def parseHeaders(data):
+    """解析ESL消息的头部
+    参数列表:
+        data:头部(字符串)，每行为"名称: 取值"
+    返回值：
+        {名称:取值}，取值已做URL解码
+    异常：
+        无
+    """
+    headers = {}
+    for line in data.split("\n"):
+        pos = line.find(": ")
+        if pos > 0:
+            headers[line[:pos]] = unquote(line[pos + 2:])
+    return headers
+
+def parseAddress(address):
+    """解析ESL服务端地址
+    参数列表:
+        address:'主机:端口'、'主机'或''
+    返回值：
+        (主机, 端口)
+    异常：
+        ValueError 端口错误
+    """
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        return address or DEFAULT_HOST, DEFAULT_PORT
+    return host or DEFAULT_HOST, int(port)
+
+class EslEventMapper(object):
+    """ESL事件转换为与日志提取结果一致的关键信息
+    每个事件转换为一条记录(会话UUID, 日志, [(匹配标志, 提取的结果)], [(号码, 是否停止查找)])，
+    日志以日志时间开头，显示和解析时间与日志文件中的行相同。
+    事件中没有核心状态的变迁前状态，按照会话记录上一次的核心状态，CHANNEL_DESTROY时删除
+    """
+    __reChannelName = re.compile("^sofia/[^/]*/([^@]*)@")
+
+    def __init__(self):
+        self.__stateDict = {} # {会话UUID:上一次的核心状态}
+        self.__hangupSet = set() # 已经转换过挂断的会话UUID
+
+    def getSessCount(self):
+        # 正在记录状态的会话个数
+        return len(self.__stateDict)
+
+    def __logTime(self, event):
+        # 事件的本地时间只有秒，微秒取自事件的时间戳
+        local = event.get("Event-Date-Local")
+        timestamp = event.get("Event-Date-Timestamp", "")
+        if local and timestamp.isdigit():
+            return "%s.%06d" % (local, int(timestamp) % 1000000)
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    def map(self, event):
+        """转换一个事件
+        参数列表:
+            event:事件的头部{名称:取值}
+        返回值：
+            (会话UUID, 日志, [(匹配标志, 提取的结果)], [(号码, 是否停止查找)])，与会话无关或不需要记录的事件返回None
+        异常：
+            无
+        """
+        name = event.get("Event-Name", "")
+        sessUUID = event.get("Unique-ID")
+        if not sessUUID:
+            return None
+
+        if name == "CHANNEL_DESTROY":
+            self.__stateDict.pop(sessUUID, None)
+            self.__hangupSet.discard(sessUUID)
+            return None
+
+        outbound = event.get("Call-Direction") == "outbound"
+        channel = event.get("Channel-Name", "")
+        keyInfoList = []
+        hits = []
+        text = ""
+        if name in ["CHANNEL_CREATE", "CHANNEL_STATE"]:
+            state = event.get("Channel-State", "")
+            prev = self.__stateDict.get(sessUUID, "CS_NEW")
+            self.__stateDict[sessUUID] = state
+            if state and state != prev:
+                keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CS, (prev, state)))
+            text = "%s -> %s" % (prev, state)
+            if name == "CHANNEL_CREATE":
+                res = self.__reChannelName.match(channel)
+                number = res.group(1) if res else event.get("Caller-Caller-ID-Number", "")
+                number and hits.append((number, False))
+                if outbound:
+                    keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("calling", "0")))
+                else:
+                    addr = event.get("variable_sip_network_ip")
+                    addr = "%s:%s" % (addr, event.get("variable_sip_network_port")) if addr else event.get("Caller-Network-Addr", "")
+                    keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_R_INVITE, (addr,)))
+        elif name == "CHANNEL_CALLSTATE":
+            prev, state = event.get("Original-Channel-Call-State", ""), event.get("Channel-Call-State", "")
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CALL, (prev, state)))
+            text = "%s -> %s" % (prev, state)
+        elif name == "CHANNEL_PROGRESS":
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("proceeding", "180")))
+        elif name == "CHANNEL_PROGRESS_MEDIA":
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("proceeding", "183")))
+        elif name == "CHANNEL_ANSWER":
+            # 呼出时收到200，呼入时发送200
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("completing" if outbound else "completed", "200")))
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("ready", "200")))
+        elif name == "CHANNEL_EXECUTE":
+            # 只关心转接，与日志中的"Dialplan: ... Action transfer"相同，找到后停止查找号码
+            if event.get("Application") != "transfer":
+                return None
+            data = event.get("Application-Data", "")
+            text = "transfer(%s)" % data
+            number = data.split(" ")[0]
+            number.isdigit() and hits.append((number, True))
+        elif name in ["CHANNEL_HANGUP", "CHANNEL_HANGUP_COMPLETE"]:
+            # 两个事件只转换先到达的一个
+            if sessUUID in self.__hangupSet:
+                return None
+            self.__hangupSet.add(sessUUID)
+            state = self.__stateDict.get(sessUUID, event.get("Channel-State", ""))
+            cause = event.get("Hangup-Cause", "")
+            disposition = event.get("variable_sip_hangup_disposition", "")
+            status = event.get("variable_sip_term_status", "")
+            if outbound and status.isdigit() and int(status) >= 300:
+                keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CHAN, ("terminated", status)))
+            if disposition == "send_bye":
+                keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_S_BYE, ()))
+            elif disposition == "send_cancel":
+                keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_CANCEL, ()))
+            keyInfoList.append((FsLogAnalyzer.SIGN_FLAG_R_BYE if disposition == "recv_bye" else FsLogAnalyzer.SIGN_FLAG_HANGUP, (state, cause)))
+            text = "[%s] [%s] %s" % (state, cause, disposition)
+
+        log = "%s [ESL] %s (%s) %s" % (self.__logTime(event), name, channel, text)
+        return sessUUID, log.rstrip(), keyInfoList, hits
+
+class EslClient(object):
+    """ESL客户端(inbound方式：连接FS的mod_event_socket并订阅事件)"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, password=DEFAULT_PASSWORD, eventList=EVENT_LIST):
+        self.__host = host
+        self.__port = port
+        self.__password = password
+        self.__eventList = eventList
+        self.__reader = None
+        self.__writer = None
+
+    def getAddress(self):
+        return "%s:%d" % (self.__host, self.__port)
+
+    async def __readMessage(self):
+        """读取一条消息
+        返回值：
+            (头部, 内容)，连接已断开返回(None, None)
+        """
+        try:
+            data = await self.__reader.readuntil(b"\n\n")
+        except asyncio.IncompleteReadError:
+            return None, None
+        headers = parseHeaders(data.decode('utf-8', 'replace'))
+        length = int(headers.get("Content-Length", 0))
+        body = b""
+        if length:
+            try:
+                body = await self.__reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                return None, None
+        return headers, body.decode('utf-8', 'replace')
+
+    async def __command(self, cmd):
+        # 发送命令并等待应答，期间到达的事件丢弃(订阅之前不会有事件)
+        self.__writer.write((cmd + "\n\n").encode('utf-8'))
+        await self.__writer.drain()
+        while True:
+            headers, body = await self.__readMessage()
+            if headers is None:
+                raise IOError("连接已断开")
+            if headers.get("Content-Type") == "command/reply":
+                reply = headers.get("Reply-Text", "")
+                if not reply.startswith("+OK"):
+                    raise IOError(reply)
+                return reply
+
+    async def connect(self):
+        """连接、认证并订阅事件
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            IOError 连接或认证失败
+        """
+        self.__reader, self.__writer = await asyncio.open_connection(self.__host, self.__port)
+        headers, body = await self.__readMessage()
+        if headers is None or headers.get("Content-Type") != "auth/request":
+            raise IOError("不是ESL服务")
+        await self.__command("auth %s" % self.__password)
+        await self.__command("event plain %s" % " ".join(self.__eventList))
+
+    async def readEvent(self):
+        """读取下一个事件
+        参数列表:
+            无
+        返回值：
+            事件的头部{名称:取值}，连接已断开返回None
+        异常：
+            无
+        """
+        while True:
+            headers, body = await self.__readMessage()
+            if headers is None or headers.get("Content-Type") == "text/disconnect-notice":
+                return None
+            if headers.get("Content-Type") == "text/event-plain":
+                # 事件的头部之后可能还有内容(如后台任务的结果)，只取头部
+                return parseHeaders(body.split("\n\n", 1)[0])
+
+    def close(self):
+        if self.__writer:
+            self.__writer.close()
+            self.__writer = None
+
+class EslIngest(object):
+    """ESL事件接入
+    读取协程接收事件并转换为记录，放入有上限的队列；分析协程每次取出一批交给分析器。
+    分析跟不上时队列满，读取协程在放入时等待，不再从连接读取，积压留在TCP缓冲区和FS一侧，
+    本进程的内存占用以队列长度为上限，事件突发时不会无限增长
+    """
+
+    def __init__(self, client, mapper, consumer, queueSize=QUEUE_SIZE, batchSize=BATCH_SIZE):
+        """
+        参数列表:
+            client:EslClient
+            mapper:EslEventMapper
+            consumer:分析函数 consumer([记录])，记录见EslEventMapper.map
+            queueSize:队列长度上限
+            batchSize:每批的记录个数上限
+        """
+        self.__client = client
+        self.__mapper = mapper
+        self.__consumer = consumer
+        self.__queueSize = queueSize
+        self.__batchSize = batchSize
+        self.__eventCount = 0
+        self.__recordCount = 0
+        self.__batchCount = 0
+        self.__maxQueued = 0
+
+    def getStats(self):
+        """获取接入的统计
+        参数列表:
+            无
+        返回值：
+            {"events":接收的事件数, "records":分析的记录数, "batches":批数, "maxQueued":队列中最多的记录数}
+        异常：
+            无
+        """
+        return {"events":self.__eventCount, "records":self.__recordCount, \
+            "batches":self.__batchCount, "maxQueued":self.__maxQueued}
+
+    async def __read(self, queue):
+        try:
+            while True:
+                event = await self.__client.readEvent()
+                if event is None:
+                    break
+                self.__eventCount += 1
+                record = self.__mapper.map(event)
+                if record is not None:
+                    await queue.put(record)
+                    self.__maxQueued = max(self.__maxQueued, queue.qsize())
+        finally:
+            # 结束标记，队列满时也需要等待放入
+            await queue.put(None)
+
+    async def run(self):
+        """连接ESL服务端并持续分析，直到连接断开
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            IOError 连接或认证失败
+        """
+        await self.__client.connect()
+        queue = asyncio.Queue(self.__queueSize)
+        reader = asyncio.ensure_future(self.__read(queue))
+        try:
+            done = False
+            while not done:
+                batch = [await queue.get()]
+                while len(batch) < self.__batchSize and not queue.empty():
+                    batch.append(queue.get_nowait())
+                if batch[-1] is None:
+                    batch.pop()
+                    done = True
+                if batch:
+                    self.__consumer(batch)
+                    self.__recordCount += len(batch)
+                    self.__batchCount += 1
+                # 分析是同步的，每批之后让出事件循环，读取协程可以继续接收
+                await asyncio.sleep(0)
+            # 读取时的异常在这里抛出
+            await reader
+        finally:
+            reader.cancel()
+            self.__client.close()
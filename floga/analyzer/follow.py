@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+if PY2:
+    from compress import normalizeNewline
+else:
+    from analyzer.compress import normalizeNewline
+
+class LogFollower(object):
+    """跟踪正在写入的日志文件(类似tail -F)
+    每次轮询只读取上次位置之后新增的内容，不完整的最后一行留到下次再返回。
+    通过inode识别日志轮转(文件被改名后重新创建)，通过文件大小变小识别截断(copytruncate)
+    """
+    READ_SIZE = 1024 * 1024 # 每次读取的最大字节数
+
+    def __init__(self, path, fromEnd=True, decodeLine=None):
+        """
+        参数列表:
+            path:日志文件路径
+            fromEnd:是否从文件末尾开始跟踪，否则从头读取已有内容
+            decodeLine:日志行的解码函数(分析器的decodeLine)，为None时按照utf-8解码并替换无法解码的字节
+        """
+        self.__path = path
+        self.__fromEnd = fromEnd
+        self.__decodeLine = decodeLine or (lambda line: line if PY2 else line.decode('utf-8', 'replace'))
+        self.__f = None
+        self.__inode = None
+        self.__offset = 0
+        self.__lineNo = 0
+        self.__buf = b''
+
+    def getPath(self):
+        return self.__path
+
+    def __open(self, fromEnd):
+        try:
+            f = open(self.__path, 'rb')
+        except (IOError, OSError):
+            return False
+
+        self.close()
+        self.__f = f
+        self.__inode = os.fstat(f.fileno()).st_ino
+        self.__offset = 0
+        self.__lineNo = 0
+        self.__buf = b''
+        if fromEnd:
+            # 从末尾开始跟踪时，统计已有的行数，保证行号与文件一致
+            while True:
+                data = f.read(self.READ_SIZE)
+                if not data:
+                    break
+                self.__lineNo += data.count(b'\n')
+                self.__offset += len(data)
+                self.__buf = data[data.rfind(b'\n') + 1:] if b'\n' in data else self.__buf + data
+        return True
+
+    def close(self):
+        if self.__f:
+            self.__f.close()
+            self.__f = None
+
+    def __read(self):
+        """读取当前文件新增的完整行
+        只按照\\n分行，与文件的行数一致；行尾的\\r\\n换成\\n，与其他加载方式一致
+        返回值：
+            (起始行数, [日志行])
+        """
+        lineNo = self.__lineNo
+        lines = []
+        while True:
+            data = self.__f.read(self.READ_SIZE)
+            if not data:
+                break
+            self.__offset += len(data)
+            data = self.__buf + data
+            pos = data.rfind(b'\n')
+            if pos == -1:
+                self.__buf = data
+                continue
+            self.__buf = data[pos + 1:]
+            for line in data[:pos].split(b'\n'):
+                lines.append(self.__decodeLine(normalizeNewline(line + b'\n')))
+        self.__lineNo += len(lines)
+        return lineNo, lines
+
+    def poll(self):
+        """轮询新增的日志行
+        参数列表:
+            无
+        返回值：
+            [(是否为新文件, 起始行数, [日志行])]
+            发生轮转或截断时，新文件的内容单独作为一项返回，且'是否为新文件'为True
+        异常：
+            无
+        """
+        res = []
+        if self.__f is None:
+            if not self.__open(self.__fromEnd):
+                return res
+            res.append((True, self.__lineNo, []))
+
+        try:
+            st = os.stat(self.__path)
+        except (IOError, OSError):
+            # 轮转过程中文件可能暂时不存在，先读完旧文件
+            st = None
+
+        lineNo, lines = self.__read()
+        lines and res.append((False, lineNo, lines))
+
+        if st is None:
+            return res
+
+        # 轮转：旧文件已读完，打开新文件从头读取
+        if st.st_ino != self.__inode:
+            if self.__open(False):
+                lineNo, lines = self.__read()
+                res.append((True, lineNo, lines))
+        # 截断：从头读取
+        elif st.st_size < self.__offset:
+            self.__f.seek(0)
+            self.__offset = 0
+            self.__lineNo = 0
+            self.__buf = b''
+            lineNo, lines = self.__read()
+            res.append((True, lineNo, lines))
+        return res
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+# 记录方式
+IGNORE_COUNT = "count" # 只按照文件和分类计数
+IGNORE_SAMPLE = "sample" # 计数，并为每个文件保留有限条数的随机抽样
+IGNORE_ALL = "all" # 计数，并保留全部忽略的行
+
+# 分类
+CATEGORY_BLANK = "blank" # 空行
+CATEGORY_SIP = "sip" # SIP消息跟踪(recv/send以及缩进的消息内容)
+CATEGORY_LOG = "log" # 带时间但没有会话UUID的日志，如模块加载
+CATEGORY_OTHER = "other" # 其他，如命令行输出
+CATEGORY_LIST = [CATEGORY_LOG, CATEGORY_SIP, CATEGORY_BLANK, CATEGORY_OTHER]
+
+def classify(line):
+    """忽略的行分类
+    参数列表:
+        line:日志行，可以是未解码的字节
+    返回值：
+        分类 str
+    异常：
+        无
+    """
+    if not line.strip():
+        return CATEGORY_BLANK
+    if line[:1].isspace() or line[:5] in ('recv ', 'send ', b'recv ', b'send '):
+        return CATEGORY_SIP
+    if line[:4].isdigit() and line[4:5] in ('-', b'-'):
+        return CATEGORY_LOG
+    return CATEGORY_OTHER
+
+def canRestore(data, mode):
+    """缓存的一个文件的记录能否以指定的记录方式恢复
+    记录方式不同时只有计数可以使用，抽样和全部的行需要重新收集
+    参数列表:
+        data:IgnoredLines.getFileData的返回值
+        mode:记录方式
+    返回值：
+        bool
+    异常：
+        无
+    """
+    return data is not None and (data[0] == mode or mode == IGNORE_COUNT)
+
+class IgnoredLines(object):
+    """忽略的行(没有会话UUID的行)
+    FS的日志中这样的行往往占大部分(SIP消息跟踪、模块加载、命令行输出)，默认只按照文件和分类计数，
+    并用蓄水池抽样为每个文件保留至多SAMPLE_SIZE行，内存占用有上限；只有明确指定时才保留全部的行
+    """
+    SAMPLE_SIZE = 100
+
+    def __init__(self, mode=IGNORE_SAMPLE, sampleSize=SAMPLE_SIZE):
+        self.__mode = mode
+        self.__sampleSize = sampleSize
+        self.__counts = {} # {文件索引:{分类:行数}}
+        self.__samples = {} # {文件索引:[(行数, 日志)]}
+        self.__seen = {} # 参与抽样的行数{文件索引:行数}
+        self.__randoms = {} # 每个文件独立的随机数，抽样结果只与文件中的行有关{文件索引:Random}
+        self.__lines = {} # {文件索引:{行数:日志}}，只在保留全部的行时使用
+
+    def getMode(self):
+        return self.__mode
+
+    def add(self, f, line, log, decode=None):
+        """记录一行忽略的行
+        参数列表:
+            f:文件索引
+            line:行数
+            log:日志行，可以是未解码的字节
+            decode:字节的解码函数，只在需要保存这一行时调用
+        返回值：
+            无
+        异常：
+            无
+        """
+        category = classify(log)
+        counts = self.__counts.get(f)
+        if counts is None:
+            counts = self.__counts[f] = {}
+        counts[category] = counts.get(category, 0) + 1
+
+        if self.__mode == IGNORE_ALL:
+            if f not in self.__lines:
+                self.__lines[f] = {}
+            self.__lines[f][line] = decode(log) if decode else log
+        elif self.__mode == IGNORE_SAMPLE:
+            n = self.__seen.get(f, 0) + 1
+            self.__seen[f] = n
+            if n == 1:
+                self.__samples[f] = []
+                self.__randoms[f] = random.Random(f)
+            samples = self.__samples[f]
+            if len(samples) < self.__sampleSize:
+                samples.append((line, decode(log) if decode else log))
+            else:
+                i = self.__randoms[f].randrange(n)
+                if i < self.__sampleSize:
+                    samples[i] = (line, decode(log) if decode else log)
+
+    def getCounts(self):
+        """获取计数
+        参数列表:
+            无
+        返回值：
+            {文件索引:{分类:行数}}
+        异常：
+            无
+        """
+        return self.__counts
+
+    def getLinesDict(self):
+        """获取保留的行
+        参数列表:
+            无
+        返回值：
+            {文件索引:{行数:日志}}，抽样方式下为抽样的行，只计数时为空
+        异常：
+            无
+        """
+        if self.__mode == IGNORE_ALL:
+            return self.__lines
+        return dict((f, dict(samples)) for f, samples in self.__samples.items())
+
+    def getFileData(self, f):
+        """获取一个文件的记录，用于保存缓存
+        参数列表:
+            f:文件索引
+        返回值：
+            (记录方式, 计数, 参与抽样的行数, 抽样, 全部的行)
+        异常：
+            无
+        """
+        return (self.__mode, self.__counts.get(f, {}), self.__seen.get(f, 0), \
+            self.__samples.get(f, []), self.__lines.get(f, {}))
+
+    def setFileData(self, f, data):
+        """恢复一个文件的记录(getFileData的返回值)
+        参数列表:
+            f:文件索引
+            data:文件的记录
+        返回值：
+            无
+        异常：
+            无
+        """
+        mode, counts, seen, samples, lines = data
+        if counts:
+            self.__counts[f] = dict(counts)
+        if self.__mode == IGNORE_ALL and lines:
+            self.__lines[f] = dict(lines)
+        elif self.__mode == IGNORE_SAMPLE and seen:
+            self.__seen[f] = seen
+            self.__samples[f] = list(samples)
+            # 随机数的状态不保存，之后不会再向命中缓存的文件加入行
+            self.__randoms[f] = random.Random(f)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+from datetime import datetime, date, timedelta
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+class LogTimeParser(object):
+    """日志时间解析
+    日志以固定宽度的 YYYY-MM-DD HH:MM:SS.ffffff 开头，按照位置切片转换为整数(自1970-01-01起的微秒数)。
+    相邻的日志大多在同一秒内，缓存上一次的日期和秒，命中时只需要转换微秒部分
+    """
+    TIME_LEN = 26 # 2016-04-14 16:28:35.995307
+    SECOND_LEN = 19 # 2016-04-14 16:28:35
+    DATE_CACHE_SIZE = 1024
+
+    __reSecond = re.compile("(\\d{4})-(\\d{2})-(\\d{2}) (\\d{2}):(\\d{2}):(\\d{2})$")
+    __reSecondB = re.compile(b"(\\d{4})-(\\d{2})-(\\d{2}) (\\d{2}):(\\d{2}):(\\d{2})$") if PY3 else __reSecond
+
+    def __init__(self):
+        self.__lastSecond = None # 上一次的日期和秒(字符串或字节)
+        self.__lastBase = 0 # 上一次的日期和秒对应的微秒数
+        self.__dateDict = {} # {(年, 月, 日):天数}
+
+    def parse(self, log):
+        """解析日志开头的时间
+        参数列表:
+            log:日志信息(不含UUID)，可以是未解码的字节
+        返回值：
+            自1970-01-01起的微秒数 int，格式不符返回None
+        异常：
+            无
+        """
+        if len(log) < self.TIME_LEN or log[19:20] not in ('.', b'.'):
+            return None
+        try:
+            us = int(log[20:26])
+        except ValueError:
+            return None
+
+        second = log[:19]
+        if second != self.__lastSecond:
+            res = (self.__reSecondB if isinstance(second, bytes) else self.__reSecond).match(second)
+            if res is None:
+                return None
+            year, month, day, hour, minute, sec = [int(x) for x in res.groups()]
+            days = self.__dateDict.get((year, month, day))
+            if days is None:
+                try:
+                    days = date(year, month, day).toordinal() - EPOCH_ORDINAL
+                except ValueError:
+                    return None
+                if len(self.__dateDict) >= self.DATE_CACHE_SIZE:
+                    self.__dateDict.clear()
+                self.__dateDict[(year, month, day)] = days
+            if hour > 23 or minute > 59 or sec > 59:
+                return None
+            self.__lastSecond = second
+            self.__lastBase = (days * 86400 + hour * 3600 + minute * 60 + sec) * 1000000
+        return self.__lastBase + us
+
+def toDatetime(us):
+    """微秒数转换为datetime
+    参数列表:
+        us:自1970-01-01起的微秒数
+    返回值：
+        datetime
+    异常：
+        无
+    """
+    return EPOCH + timedelta(microseconds=us)
+
+def fromDatetime(dt):
+    """datetime转换为微秒数
+    参数列表:
+        dt:datetime
+    返回值：
+        自1970-01-01起的微秒数 int
+    异常：
+        无
+    """
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
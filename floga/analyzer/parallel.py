@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import zlib
+from array import array
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+if PY2:
+    from compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+else:
+    from analyzer.compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+
+CHUNK_SIZE = 32 * 1024 * 1024 # 大文件按照此大小切分成多个块并行处理
+
+def splitChunks(path, chunkSize=CHUNK_SIZE, rng=None):
+    """按照行边界切分文件
+    参数列表:
+        path:文件路径
+        chunkSize:块的期望大小
+        rng:只切分其中一段(起始偏移, 结束偏移)，None表示整个文件
+    返回值：
+        [(起始偏移, 结束偏移)]，每块都以完整的行开始和结束；压缩文件无法定位，整个文件(或整段)为一块，结束偏移为-1表示到文件结尾
+    异常：
+        无
+    """
+    if getCompression(path) != COMPRESS_NONE:
+        return [rng or (0, -1)]
+
+    size = os.path.getsize(path) if rng is None else rng[1]
+    chunks = []
+    start = 0 if rng is None else rng[0]
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunkSize
+            if end >= size:
+                end = size
+            else:
+                # 延伸到下一行的开头
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def splitSessLine(line):
+    """拆分出会话UUID和日志信息
+    FS的日志，左边打印的就是会话UUID信息(36位数字或字母以‘-’连接的字符串)，第一个空格右边就是日志信息
+    参数列表:
+        line:日志行，python3下可以是未解码的字节
+    返回值：
+        (UUID位置, UUID)，不是会话日志时返回(-1, "")
+    异常：
+        无
+    """
+    # 未解码的字节行，只解码UUID部分
+    if PY3 and isinstance(line, bytes):
+        pos = line.find(b' ')
+        if pos == -1 or pos < 36 or line[0:pos].count(b'-') != 4:
+            return -1, ""
+        sessUUID = line[0:pos].decode('utf-8', 'replace')
+        # 按照字符数判断，与解码后的行一致
+        if len(sessUUID) < 36:
+            return -1, ""
+        return pos, sessUUID
+
+    pos = line.find(' ')
+    # 若没有找到空格，则不记录（UUID都是36长度的，若不是，则不记录）
+    if pos == -1 or pos < 36 or line[0:pos].count('-') != 4:
+        return -1, ""
+    return pos, line[0:pos]
+
+def getShard(sessUUID, count):
+    """会话所在的分片，按照UUID的crc32划分，与进程和运行次数无关
+    参数列表:
+        sessUUID:会话UUID
+        count:分片个数
+    返回值：
+        分片序号 int
+    异常：
+        无
+    """
+    return (zlib.crc32(sessUUID if PY2 else sessUUID.encode('utf-8')) & 0xffffffff) % count
+
+def readRanges(path, ranges):
+    """按照偏移递增的顺序读取文件中的多段内容
+    未压缩的文件直接定位；压缩文件无法定位，只能向前解压并跳过中间的内容，每个文件只解压一遍
+    参数列表:
+        path:文件路径
+        ranges:[(偏移, 字节长度)]，按照偏移递增排列，偏移为解压后的位置
+    返回值：
+        生成器，每项为一段未解码的字节
+    异常：
+        IOError 打开文件失败或缺少解压模块
+    """
+    compressed = getCompression(path) != COMPRESS_NONE
+    with openLogFile(path, binary=True) as f:
+        pos = 0
+        for offset, length in ranges:
+            if not compressed:
+                f.seek(offset)
+            else:
+                while pos < offset:
+                    skip = f.read(min(offset - pos, CHUNK_SIZE))
+                    if not skip:
+                        break
+                    pos += len(skip)
+            data = f.read(length)
+            pos = offset + len(data)
+            yield data
+
+def collectChunk(task):
+    """工作进程：收集一个文件块中的会话日志
+    参数列表:
+        task:(文件索引, 文件路径, 起始偏移, 结束偏移, 是否只记录位置, 解码出错时的处理方式)
+    返回值：
+        (文件索引, 块内行数, [(UUID, 首行日志, 块内行数数组, 偏移数组, 长度数组, [日志])], [(块内行数, 日志)])
+        会话按照首次出现的顺序排列；偏移和长度为去掉UUID和结尾换行(\\r\\n或\\n)的日志在文件中的位置；只记录位置时日志列表为None
+    异常：
+        无
+    """
+    index, path, start, end, refOnly, errors = task
+    decode = (lambda x: x) if PY2 else (lambda x: x.decode('utf-8', errors))
+    sessList = []
+    sessPos = {}
+    ignoreList = []
+    i = 0
+    offset = start
+    with openLogFile(path, binary=True) as f:
+        start and f.seek(start)
+        while offset < end or end == -1:
+            raw = f.readline()
+            if not raw:
+                break
+            size = len(raw)
+            # 与其他加载方式一致，\r\n按照\n处理，记录的长度不包括\r
+            raw = normalizeNewline(raw)
+            # 在字节上拆分，只记录位置的日志不解码
+            pos, sessUUID = splitSessLine(raw)
+            if pos == -1:
+                ignoreList.append((i, decode(raw)))
+            else:
+                n = sessPos.get(sessUUID)
+                if n is None:
+                    log = decode(raw[pos + 1:-1])
+                    sessPos[sessUUID] = len(sessList)
+                    entry = (sessUUID, log, array('L'), array('L'), array('L'), None if refOnly else [])
+                    sessList.append(entry)
+                else:
+                    entry = sessList[n]
+                    log = None if refOnly else decode(raw[pos + 1:-1])
+                entry[2].append(i)
+                entry[3].append(offset + pos + 1)
+                entry[4].append(len(raw) - pos - 2)
+                if not refOnly:
+                    entry[5].append(log)
+            i += 1
+            offset += size
+    return index, i, sessList, ignoreList
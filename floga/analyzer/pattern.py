@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+class PatternRule(object):
+    """一条提取规则
+    正则表达式只在注册时编译一次；key为正则中必然出现的固定字符串，用于在执行正则之前快速判断是否可能匹配
+    """
+    __slots__ = ("key", "keyB", "regex", "flag", "keepPos", "hits", "matches")
+
+    def __init__(self, key, reExpr, expLen, dropPos, flag):
+        self.key = key
+        self.keyB = key.encode('utf-8') if PY3 else key
+        self.regex = re.compile(reExpr)
+        self.flag = flag
+        # 分组个数不足期望长度的规则永远不会匹配(与reMatch一致)
+        self.keepPos = [i for i in range(expLen) if i not in dropPos] if self.regex.groups >= expLen else None
+        self.hits = 0 # 包含固定字符串、执行了正则的行数
+        self.matches = 0 # 正则匹配成功的行数
+
+    def match(self, log):
+        """对已解码的日志执行正则
+        参数列表:
+            log:日志信息
+        返回值：
+            去掉指定位置之后的提取结果 tuple，不匹配返回None
+        异常：
+            无
+        """
+        if self.keepPos is None:
+            return None
+        res = self.regex.search(log)
+        if res is None:
+            return None
+        return tuple(res.group(i + 1) for i in self.keepPos)
+
+class PatternRegistry(object):
+    """提取规则的注册表
+    按照注册顺序保存编译好的规则。每行日志先经过由全部key组成的正则(多个固定字符串的或)预过滤，
+    不含任何key的行(大部分日志行)直接跳过，不需要解码也不需要执行正则；
+    含有key的行再按照顺序对key命中的规则执行正则。同时统计各规则的命中次数，用于观察过滤比例
+    """
+    def __init__(self, ruleList=None):
+        self.__ruleList = []
+        self.__prefilter = None
+        self.__prefilterB = None
+        self.__lineCount = 0 # 检查的行数
+        self.__passCount = 0 # 通过预过滤的行数
+        for rule in (ruleList or []):
+            self.register(*rule)
+
+    def register(self, key, reExpr, expLen, dropPos, flag):
+        """注册一条规则
+        参数列表:
+            key:正则表达式中的固定字符串
+            reExpr:正则表达式
+            expLen:期望返回元祖长度
+            dropPos:需要去掉的位置列表
+            flag:匹配标志，匹配时原样返回
+        返回值：
+            无
+        异常：
+            re.error 正则表达式错误
+        """
+        self.__ruleList.append(PatternRule(key, reExpr, expLen, dropPos, flag))
+
+        # 重新生成预过滤的正则，较长的key在前
+        keyList = sorted(set(rule.key for rule in self.__ruleList), key=len, reverse=True)
+        self.__prefilter = re.compile("|".join(re.escape(key) for key in keyList))
+        self.__prefilterB = re.compile("|".join(re.escape(key) for key in keyList).encode('utf-8')) if PY3 else self.__prefilter
+
+    def getRuleList(self):
+        return self.__ruleList
+
+    def getStats(self):
+        """获取匹配统计
+        参数列表:
+            无
+        返回值：
+            (检查的行数, 通过预过滤的行数, [(key, 匹配标志, 包含key的行数, 正则匹配的行数)])
+        异常：
+            无
+        """
+        return self.__lineCount, self.__passCount, [(rule.key, rule.flag, rule.hits, rule.matches) for rule in self.__ruleList]
+
+    def addStats(self, stats):
+        """累加其他进程中同一注册表的匹配统计
+        参数列表:
+            stats:getStats的返回值，规则的顺序与本注册表一致
+        返回值：
+            无
+        异常：
+            无
+        """
+        lineCount, passCount, statList = stats
+        self.__lineCount += lineCount
+        self.__passCount += passCount
+        for rule, (key, flag, hits, matches) in zip(self.__ruleList, statList):
+            rule.hits += hits
+            rule.matches += matches
+
+    def resetStats(self):
+        self.__lineCount = 0
+        self.__passCount = 0
+        for rule in self.__ruleList:
+            rule.hits = 0
+            rule.matches = 0
+
+    def iterMatch(self, line, decode=None):
+        """按照注册顺序迭代一行日志匹配的规则
+        参数列表:
+            line:日志信息，可以是未解码的字节
+            decode:字节的解码函数，只在有key命中时调用一次
+        返回值：
+            生成器，每项为元组(匹配标志, 提取的结果)
+        异常：
+            无
+        """
+        self.__lineCount += 1
+        raw = isinstance(line, bytes)
+        if (self.__prefilterB if raw else self.__prefilter).search(line) is None:
+            return
+        self.__passCount += 1
+
+        log = None
+        for rule in self.__ruleList:
+            if (rule.keyB if raw else rule.key) not in line:
+                continue
+            rule.hits += 1
+            if log is None:
+                log = decode(line) if raw and decode else line
+            res = rule.match(log)
+            if res is not None:
+                rule.matches += 1
+                yield rule.flag, res
+
+    def match(self, line, decode=None):
+        """取一行日志第一个匹配的规则
+        参数列表:
+            line:日志信息，可以是未解码的字节
+            decode:字节的解码函数
+        返回值：
+            (匹配标志, 提取的结果)，没有匹配返回None
+        异常：
+            无
+        """
+        # 每行都会调用，不使用生成器以减少开销
+        self.__lineCount += 1
+        raw = isinstance(line, bytes)
+        if (self.__prefilterB if raw else self.__prefilter).search(line) is None:
+            return None
+        self.__passCount += 1
+
+        log = None
+        for rule in self.__ruleList:
+            if (rule.keyB if raw else rule.key) not in line:
+                continue
+            rule.hits += 1
+            if log is None:
+                log = decode(line) if raw and decode else line
+            res = rule.match(log)
+            if res is not None:
+                rule.matches += 1
+                return rule.flag, res
+        return None
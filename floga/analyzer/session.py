@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge
+
+class Session(object):
+    """一路会话的分析信息
+    会话数量很多(每个日志文件数十万路呼叫)，每路会话只用固定的字段保存，不再使用多层嵌套的字典：
+    号码、开始时间、结论和备注为普通字段；
+    关键信息按列存放(文件索引、行数、匹配标志、日志时间为紧凑数组，只有提取的结果为元组列表)；
+    分析详情只保存取值元组，key元组由所有会话共享
+    """
+    __slots__ = ('log', 'callNumber', 'startTime', 'conclusion', 'note', \
+        '__detailKeys', '__detailValues', '__kiFile', '__kiLine', '__kiFlag', '__kiInfo', '__kiTime')
+
+    __flagList = [] # 匹配标志，数组中只保存在此列表中的位置
+    __flagIndex = {} # {匹配标志:位置}
+
+    def __init__(self, log, startTime=None):
+        """
+        参数列表:
+            log:会话日志(SessLog或MmapSessLog)
+            startTime:会话开始时间(自1970-01-01起的微秒数)
+        """
+        self.log = log
+        self.callNumber = ""
+        self.startTime = startTime
+        self.conclusion = ""
+        self.note = ""
+        self.__detailKeys = ()
+        self.__detailValues = ()
+        self.__kiFile = array('H')
+        self.__kiLine = array('L')
+        self.__kiFlag = array('B')
+        self.__kiInfo = []
+        # 微秒数超过32位，使用双精度保存(2^53以内为精确的整数)，读取时再转换为整数
+        self.__kiTime = array('d')
+
+    def addKeyInfo(self, f, line, flag, info, logTime):
+        """追加一条关键信息
+        参数列表:
+            f:文件索引
+            line:行数
+            flag:匹配标志
+            info:提取的结果
+            logTime:日志时间(自1970-01-01起的微秒数)
+        返回值：
+            无
+        异常：
+            无
+        """
+        self.__kiFile.append(f)
+        self.__kiLine.append(line)
+        self.__kiFlag.append(self.__getFlagIndex(flag))
+        self.__kiInfo.append(info)
+        self.__kiTime.append(logTime)
+
+    @classmethod
+    def __getFlagIndex(cls, flag):
+        index = cls.__flagIndex.get(flag)
+        if index is None:
+            index = cls.__flagIndex[flag] = len(cls.__flagList)
+            cls.__flagList.append(flag)
+        return index
+
+    def extendKeyInfo(self, columns, flagList):
+        """追加按列存放的关键信息，用于合并其他进程中提取的结果
+        参数列表:
+            columns:关键信息的各列(getKeyInfoColumns的返回值)
+            flagList:columns中匹配标志位置对应的匹配标志列表(提取结果的进程中getFlagList的返回值)
+        返回值：
+            无
+        异常：
+            无
+        """
+        kiFile, kiLine, kiFlag, kiInfo, kiTime = columns
+        indexList = [self.__getFlagIndex(flag) for flag in flagList]
+        self.__kiFile.extend(kiFile)
+        self.__kiLine.extend(kiLine)
+        self.__kiFlag.extend(array('B', [indexList[x] for x in kiFlag]))
+        self.__kiInfo.extend(kiInfo)
+        self.__kiTime.extend(kiTime)
+
+    def sortKeyInfo(self):
+        """关键信息按照文件索引和行数的顺序重新排列
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            无
+        """
+        order = sorted(range(len(self.__kiInfo)), key=lambda i:(self.__kiFile[i], self.__kiLine[i]))
+        self.__kiFile = array('H', [self.__kiFile[i] for i in order])
+        self.__kiLine = array('L', [self.__kiLine[i] for i in order])
+        self.__kiFlag = array('B', [self.__kiFlag[i] for i in order])
+        self.__kiInfo = [self.__kiInfo[i] for i in order]
+        self.__kiTime = array('d', [self.__kiTime[i] for i in order])
+
+    def getKeyInfoCount(self):
+        return len(self.__kiInfo)
+
+    def getKeyInfo(self, i):
+        """获取一条关键信息
+        参数列表:
+            i:位置
+        返回值：
+            元组(文件索引, 行数, 匹配标志, 提取的结果, 日志时间)
+        异常：
+            IndexError 位置超出范围
+        """
+        return self.__kiFile[i], self.__kiLine[i], self.__flagList[self.__kiFlag[i]], self.__kiInfo[i], int(self.__kiTime[i])
+
+    def getKeyInfoList(self):
+        """获取关键信息列表，每次调用重新生成
+        参数列表:
+            无
+        返回值：
+            [(文件索引, 行数, 匹配标志, 提取的结果, 日志时间)]
+        异常：
+            无
+        """
+        flagList = self.__flagList
+        return list(zip(self.__kiFile, self.__kiLine, [flagList[x] for x in self.__kiFlag], self.__kiInfo, [int(x) for x in self.__kiTime]))
+
+    def getKeyInfoColumns(self):
+        """获取按列存放的关键信息，用于批量分析，调用者不能修改
+        参数列表:
+            无
+        返回值：
+            (文件索引数组, 行数数组, 匹配标志位置数组, [提取的结果], 日志时间数组)，匹配标志位置见getFlagList
+        异常：
+            无
+        """
+        return self.__kiFile, self.__kiLine, self.__kiFlag, self.__kiInfo, self.__kiTime
+
+    @classmethod
+    def getFlagList(cls):
+        """获取匹配标志列表，匹配标志位置数组中保存的是在此列表中的位置，所有会话共用
+        参数列表:
+            无
+        返回值：
+            [匹配标志]
+        异常：
+            无
+        """
+        return cls.__flagList
+
+    def setDetails(self, keys, values):
+        """保存分析详情
+        参数列表:
+            keys:详情的key元组，所有会话共用同一个元组
+            values:与keys对应的取值
+        返回值：
+            无
+        异常：
+            无
+        """
+        self.__detailKeys = keys
+        self.__detailValues = tuple(values)
+
+    def getDetails(self):
+        return dict(zip(self.__detailKeys, self.__detailValues))
+
+class KeyInfoIndex(object):
+    """关键信息的倒排索引
+    显示详情时对同一路会话做多次匹配，每次都遍历全部关键信息的代价是匹配次数×关键信息数。
+    遍历一次关键信息建立匹配标志到位置的索引；带有提取结果的条件时，再按需为这个匹配标志建立
+    (第一个结果, 第二个结果)到位置的索引(结果去掉首尾空白，None表示不限)，之后每次匹配只需要查字典
+    """
+
+    def __init__(self, keyInfoList):
+        """
+        参数列表:
+            keyInfoList:关键信息列表[(文件索引, 行数, 匹配标志, 提取的结果, 日志时间)]
+        """
+        self.__keyInfoList = keyInfoList
+        self.__paramDict = {} # {匹配标志:{(第一个结果, 第二个结果):[位置]}}，按需建立
+        flagDict = {} # {匹配标志:[位置]}
+        for i, x in enumerate(keyInfoList):
+            posList = flagDict.get(x[2])
+            if posList is None:
+                flagDict[x[2]] = [i]
+            else:
+                posList.append(i)
+        self.__flagDict = flagDict
+
+    def __buildParamIndex(self, flag):
+        paramIndex = {}
+        for i in self.__flagDict.get(flag, []):
+            info = self.__keyInfoList[i][3]
+            if len(info) >= 2:
+                p1, p2 = info[0].strip(), info[1].strip()
+                keys = ((p1, None), (None, p2), (p1, p2))
+            elif len(info) == 1:
+                keys = ((info[0].strip(), None),)
+            else:
+                continue
+            for key in keys:
+                posList = paramIndex.get(key)
+                if posList is None:
+                    paramIndex[key] = [i]
+                else:
+                    posList.append(i)
+        self.__paramDict[flag] = paramIndex
+        return paramIndex
+
+    def getKeyInfoList(self):
+        return self.__keyInfoList
+
+    def find(self, flag, param1="", param2="", f=-1, l=-1):
+        """查找第一条满足条件的关键信息
+        参数列表:
+            flag:匹配标志
+            param1:第一个结果(去掉首尾空白后比较)，空字符串为不限
+            param2:第二个结果(去掉首尾空白后比较)，空字符串为不限
+            f:最小的文件索引，-1为不限
+            l:最小的行数，-1为不限
+        返回值：
+            位置 int，没有找到返回-1
+        异常：
+            无
+        """
+        if param1 == "" and param2 == "":
+            posList = self.__flagDict.get(flag)
+        else:
+            paramIndex = self.__paramDict.get(flag)
+            if paramIndex is None:
+                paramIndex = self.__buildParamIndex(flag)
+            posList = paramIndex.get((param1.strip() if param1 != "" else None, param2.strip() if param2 != "" else None))
+        if not posList:
+            return -1
+        if f == -1 and l == -1:
+            return posList[0]
+        for i in posList:
+            x = self.__keyInfoList[i]
+            if (x[0] >= f if f != -1 else True) and (x[1] >= l if l != -1 else True):
+                return i
+        return -1
+
+class SessIndex(object):
+    """会话的二级索引，用于显示和输出时按照号码、结论过滤
+    会话按照(开始时间, UUID)排序保存，另外按照号码和结论分组，每组同样有序。
+    按号码查找只需要取出这个号码的会话；按结论查找时结论的取值很少，合并满足条件的几组即可，结果仍然按照开始时间排序。
+    跟踪模式下只更新重新分析过的会话，取值没有变化时不做任何操作
+    """
+
+    def __init__(self):
+        self.__keyDict = {} # {会话UUID:(开始时间, 号码, 结论)}
+        self.__timeList = [] # [(开始时间, 会话UUID)]
+        self.__numberDict = {} # {号码:[(开始时间, 会话UUID)]}，不包括没有号码的会话
+        self.__conclusionDict = {} # {结论:[(开始时间, 会话UUID)]}
+
+    @staticmethod
+    def __getKey(sess):
+        # 没有开始时间的会话排在最前面
+        return (sess.startTime if sess.startTime is not None else -1, sess.callNumber, sess.conclusion)
+
+    @staticmethod
+    def __remove(bucketDict, key, item):
+        bucket = bucketDict[key]
+        i = bisect_left(bucket, item)
+        if i < len(bucket) and bucket[i] == item:
+            del bucket[i]
+        if not bucket:
+            del bucketDict[key]
+
+    @staticmethod
+    def __insert(bucketDict, key, item):
+        bucket = bucketDict.get(key)
+        if bucket is None:
+            bucketDict[key] = [item]
+        else:
+            insort(bucket, item)
+
+    def build(self, sessLogInfoDict):
+        """按照全部会话重新建立索引
+        参数列表:
+            sessLogInfoDict:{会话UUID:Session}
+        返回值：
+            无
+        异常：
+            无
+        """
+        keyDict = dict((sessUUID, self.__getKey(sess)) for sessUUID, sess in sessLogInfoDict.items())
+        timeList = sorted((key[0], sessUUID) for sessUUID, key in keyDict.items())
+        numberDict = {}
+        conclusionDict = {}
+        for item in timeList:
+            startTime, callNumber, conclusion = keyDict[item[1]]
+            if callNumber:
+                bucket = numberDict.get(callNumber)
+                if bucket is None:
+                    numberDict[callNumber] = [item]
+                else:
+                    bucket.append(item)
+            bucket = conclusionDict.get(conclusion)
+            if bucket is None:
+                conclusionDict[conclusion] = [item]
+            else:
+                bucket.append(item)
+        self.__keyDict = keyDict
+        self.__timeList = timeList
+        self.__numberDict = numberDict
+        self.__conclusionDict = conclusionDict
+
+    def update(self, sessUUID, sess):
+        """会话的开始时间、号码或结论变化后更新索引
+        参数列表:
+            sessUUID:会话UUID
+            sess:Session
+        返回值：
+            无
+        异常：
+            无
+        """
+        key = self.__getKey(sess)
+        oldKey = self.__keyDict.get(sessUUID)
+        if key == oldKey:
+            return
+        item = (key[0], sessUUID)
+        if oldKey is None:
+            insort(self.__timeList, item)
+        else:
+            oldItem = (oldKey[0], sessUUID)
+            if oldKey[0] != key[0]:
+                i = bisect_left(self.__timeList, oldItem)
+                del self.__timeList[i]
+                insort(self.__timeList, item)
+            if oldKey[1] and (oldKey[0] != key[0] or oldKey[1] != key[1]):
+                self.__remove(self.__numberDict, oldKey[1], oldItem)
+            if oldKey[0] != key[0] or oldKey[2] != key[2]:
+                self.__remove(self.__conclusionDict, oldKey[2], oldItem)
+        if key[1] and (oldKey is None or oldKey[0] != key[0] or oldKey[1] != key[1]):
+            self.__insert(self.__numberDict, key[1], item)
+        if oldKey is None or oldKey[0] != key[0] or oldKey[2] != key[2]:
+            self.__insert(self.__conclusionDict, key[2], item)
+        self.__keyDict[sessUUID] = key
+
+    def find(self, callNumber="", conclusion=""):
+        """查找满足条件的会话
+        参数列表:
+            callNumber:呼叫号码(完全相同)，空字符串为不限
+            conclusion:结论(不区分大小写，包含即可)，空字符串为不限
+        返回值：
+            按照开始时间排序的会话UUID列表
+        异常：
+            无
+        """
+        targConclusion = conclusion.upper()
+        if callNumber:
+            items = self.__numberDict.get(callNumber, [])
+            if targConclusion:
+                keyDict = self.__keyDict
+                items = [x for x in items if targConclusion in keyDict[x[1]][2].upper()]
+        elif not targConclusion:
+            items = self.__timeList
+        else:
+            bucketList = [bucket for c, bucket in self.__conclusionDict.items() if targConclusion in c.upper()]
+            if len(bucketList) == len(self.__conclusionDict):
+                items = self.__timeList
+            elif len(bucketList) == 1:
+                items = bucketList[0]
+            else:
+                items = merge(*bucketList)
+        return [x[1] for x in items]
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from bisect import bisect_left
+
+class SessLog(object):
+    """内存方式存放的会话日志
+    按照加入的顺序，以两个紧凑数组保存每行日志的(文件索引, 行数)。
+    以内存方式加载的文件，日志内容通过reader从已加载的行中读取，会话中不再保存副本；其他文件的日志保存解码后的内容。
+    按照文件顺序收集时加入的顺序就是文件索引和行数的顺序，迭代时不需要排序
+    """
+    __slots__ = ('__reader', '__skip', '__files', '__lines', '__texts', '__sorted')
+
+    def __init__(self, reader=None, skip=0):
+        """
+        参数列表:
+            reader:读取函数 reader(文件索引, 行数)，返回已加载的一行日志
+            skip:已加载的行中会话UUID和之后的空格的长度，读取时去掉这部分和结尾的换行
+        """
+        self.__reader = reader
+        self.__skip = skip
+        self.__files = array('I')
+        self.__lines = array('I')
+        self.__texts = None # 与位置一一对应的日志内容，从已加载的行中读取的为None
+        self.__sorted = True # 是否按照文件索引和行数的顺序加入
+
+    def add(self, f, line, log, ref=None):
+        """添加一行日志
+        参数列表:
+            f:文件索引
+            line:行数
+            log:日志内容，为None时通过reader从已加载的行中读取
+            ref:日志在文件中的位置(偏移, 长度)，内存方式下不使用
+        返回值：
+            无
+        异常：
+            无
+        """
+        n = len(self.__lines)
+        if n and self.__sorted and (f, line) < (self.__files[-1], self.__lines[-1]):
+            self.__sorted = False
+        self.__files.append(f)
+        self.__lines.append(line)
+        if log is not None and self.__texts is None:
+            self.__texts = [None] * n
+        if self.__texts is not None:
+            self.__texts.append(log)
+
+    def extend(self, f, lines, logs=None):
+        """按顺序添加同一个文件中的多行日志
+        参数列表:
+            f:文件索引
+            lines:行数数组
+            logs:与行数一一对应的日志内容列表，为None时全部通过reader从已加载的行中读取
+        返回值：
+            无
+        异常：
+            无
+        """
+        n = len(self.__lines)
+        if not lines:
+            return
+        if n and self.__sorted and (f, lines[0]) < (self.__files[-1], self.__lines[-1]):
+            self.__sorted = False
+        self.__files.extend(array('I', [f]) * len(lines))
+        self.__lines.fromlist(lines.tolist())
+        if logs is not None and self.__texts is None:
+            self.__texts = [None] * n
+        if self.__texts is not None:
+            self.__texts.extend(logs if logs is not None else [None] * len(lines))
+
+    def __getText(self, i):
+        log = self.__texts[i] if self.__texts is not None else None
+        if log is None:
+            log = self.__reader(self.__files[i], self.__lines[i])[self.__skip:-1]
+        return log
+
+    def getLine(self, f, line):
+        for i in range(len(self.__lines)):
+            if self.__files[i] == f and self.__lines[i] == line:
+                return self.__getText(i)
+        return ""
+
+    def detach(self):
+        """把从已加载的行中读取的日志复制到会话中，用于释放已加载的行之前
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            无
+        """
+        self.__texts = [self.__getText(i) for i in range(len(self.__lines))]
+
+    def iterLines(self, raw=False, files=None):
+        """按照文件索引和行数的顺序迭代日志
+        参数列表:
+            raw:是否返回未解码的日志，内存方式下日志已经解码，不使用
+            files:只迭代指定索引的文件，默认迭代全部文件
+        返回值：
+            生成器，每项为元组(文件索引, 行数, 日志)
+        异常：
+            无
+        """
+        order = range(len(self.__lines))
+        # 交错合并收集的会话，加入的顺序按照日志时间，需要重新排序
+        if not self.__sorted:
+            order = sorted(order, key=lambda i:(self.__files[i], self.__lines[i]))
+        for i in order:
+            if files is None or self.__files[i] in files:
+                yield self.__files[i], self.__lines[i], self.__getText(i)
+
+    def keys(self):
+        return sorted(set(self.__files))
+
+    def __len__(self):
+        return len(self.__lines)
+
+class MmapSessLog(object):
+    """内存映射或字节方式存放的会话日志
+    每个文件只保存行数、偏移、长度三个紧凑数组，日志内容在需要显示或输出时才从映射的文件中读取并解码
+    """
+    __slots__ = ('__reader', '__rawReader', '__refs', '__texts')
+
+    def __init__(self, reader, rawReader=None):
+        """
+        参数列表:
+            reader:读取函数 reader(文件索引, 偏移, 长度)，返回解码后的日志内容
+            rawReader:读取函数 rawReader(文件索引, 偏移, 长度)，返回未解码的字节
+        """
+        self.__reader = reader
+        self.__rawReader = rawReader or reader
+        self.__refs = {} # {文件索引:(行数数组, 偏移数组, 长度数组)}
+        self.__texts = None # 未映射文件的日志(SessLog)
+
+    def add(self, f, line, log, ref=None):
+        """添加一行日志
+        参数列表:
+            f:文件索引
+            line:行数
+            log:日志内容，ref为None时才保存
+            ref:日志在文件中的位置(偏移, 长度)
+        返回值：
+            无
+        异常：
+            无
+        """
+        if ref is None:
+            if self.__texts is None:
+                self.__texts = SessLog()
+            self.__texts.add(f, line, log)
+            return
+
+        refs = self.__refs.get(f)
+        if refs is None:
+            refs = self.__refs[f] = (array('L'), array('L'), array('L'))
+        refs[0].append(line)
+        refs[1].append(ref[0])
+        refs[2].append(ref[1])
+
+    def extend(self, f, lines, offsets, lengths):
+        """按顺序添加同一个文件中的多行日志的位置
+        参数列表:
+            f:文件索引
+            lines:行数数组
+            offsets:偏移数组
+            lengths:长度数组
+        返回值：
+            无
+        异常：
+            无
+        """
+        refs = self.__refs.get(f)
+        if refs is None:
+            refs = self.__refs[f] = (array('L'), array('L'), array('L'))
+        refs[0].extend(lines)
+        refs[1].extend(offsets)
+        refs[2].extend(lengths)
+
+    def getLine(self, f, line):
+        refs = self.__refs.get(f)
+        if refs is not None:
+            pos = bisect_left(refs[0], line)
+            if pos < len(refs[0]) and refs[0][pos] == line:
+                return self.__reader(f, refs[1][pos], refs[2][pos])
+        return self.__texts.getLine(f, line) if self.__texts else ""
+
+    def iterLines(self, raw=False):
+        """按照文件索引和行数的顺序迭代日志
+        参数列表:
+            raw:是否返回未解码的字节，便于在解码之前先按照关键字过滤
+        返回值：
+            生成器，每项为元组(文件索引, 行数, 日志)，raw为True时有位置的日志为字节
+        异常：
+            无
+        """
+        reader = self.__rawReader if raw else self.__reader
+        for f in sorted(set(self.__refs.keys()) | set(self.__texts.keys() if self.__texts else [])):
+            refs = self.__refs.get(f)
+            if refs is not None:
+                for i, line in enumerate(refs[0]):
+                    yield f, line, reader(f, refs[1][i], refs[2][i])
+            if self.__texts:
+                for item in self.__texts.iterLines(files=[f]):
+                    yield item
+
+    def keys(self):
+        return sorted(set(self.__refs.keys()) | set(self.__texts.keys() if self.__texts else []))
+
+    def __len__(self):
+        return len(self.keys())
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# syslog接收(UDP和TCP)，只支持python3(asyncio)
+
+import time
+import socket
+import asyncio
+
+DEFAULT_PORT = 514
+QUEUE_SIZE = 50000 # 等待解析的消息个数上限
+BATCH_SIZE = 2000 # 每次解析的消息个数上限
+MAX_LENGTH = 64 * 1024 # 单条消息的长度上限
+POLL_INTERVAL = 0.5 # 没有消息时检查是否停止的间隔(秒)
+RCVBUF_SIZE = 8 * 1024 * 1024 # UDP接收缓冲区，吸收突发(受系统的net.core.rmem_max限制)
+
+# 丢弃的原因
+DROP_KERNEL = "kernel" # UDP接收缓冲区满，由内核丢弃(只支持Linux)
+DROP_QUEUE = "queue" # 队列满(只有UDP，TCP在放入时等待)
+DROP_OVERSIZE = "oversize" # 超过长度上限
+DROP_INVALID = "invalid" # 不是syslog格式
+DROP_LIST = [DROP_KERNEL, DROP_QUEUE, DROP_OVERSIZE, DROP_INVALID]
+
+def _getKernelDrops(port):
+    # /proc/net/udp中本地端口为port的套接字的丢弃计数(最后一列)，不支持时返回0
+    count = 0
+    for path in ["/proc/net/udp", "/proc/net/udp6"]:
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        count += int(fields[-1])
+        except (IOError, OSError, ValueError, IndexError, StopIteration):
+            pass
+    return count
+
+def _skipStructuredData(data):
+    # RFC 5424的结构化数据，返回之后的位置；取值中的\]不是结束
+    i = 0
+    while i < len(data) and data[i] == "[":
+        i += 1
+        while i < len(data) and data[i] != "]":
+            i += 2 if data[i] == "\\" else 1
+        i += 1
+    return i
+
+def parseSyslog(data):
+    """去掉syslog的信封，支持RFC 5424和RFC 3164
+    <PRI>1 时间 主机名 应用 进程号 消息ID 结构化数据 消息
+    <PRI>Mmm dd hh:mm:ss 主机名 标签: 消息
+    参数列表:
+        data:一条syslog消息(字符串)
+    返回值：
+        (主机名, 消息)，没有主机名时为''；不是syslog格式返回None
+    异常：
+        无
+    """
+    end = data.find(">", 1, 5)
+    if data[:1] != "<" or end == -1 or not data[1:end].isdigit():
+        return None
+    rest = data[end + 1:]
+    if rest[:2] == "1 ":
+        parts = rest.split(" ", 6)
+        if len(parts) < 6:
+            return None
+        host = parts[2] if parts[2] != "-" else ""
+        sdMsg = parts[6] if len(parts) == 7 else ""
+        if sdMsg[:1] == "-":
+            msg = sdMsg[2:]
+        else:
+            msg = sdMsg[_skipStructuredData(sdMsg) + 1:]
+        if msg[:1] == u"\ufeff":
+            msg = msg[1:]
+        return host, msg
+
+    # RFC 3164的时间固定为15个字符，部分发送方省略时间和主机名
+    if len(rest) > 16 and rest[3] == " " and rest[6] == " " and rest[9] == ":" and rest[15] == " ":
+        host, sep, rest = rest[16:].partition(" ")
+    else:
+        host = ""
+    pos = rest.find(": ")
+    if pos != -1 and " " not in rest[:pos]:
+        rest = rest[pos + 2:]
+    return host, rest
+
+class NodeRouter(object):
+    """按照主机名把日志行分给各个节点的分析器
+    每个节点第一次出现时由factory建立分析器，并登记为一个跟踪的日志文件，之后的行增量加入和分析
+    """
+
+    def __init__(self, factory, onResult=None):
+        """
+        参数列表:
+            factory:建立分析器的函数 factory(主机名)，返回FsLogAnalyzer
+            onResult:增量分析后的回调 onResult(主机名, 分析器, 重新分析的会话UUID列表)
+        """
+        self.__factory = factory
+        self.__onResult = onResult
+        self.__nodeDict = {} # {主机名:[分析器, 文件索引, 已加入的行数]}
+
+    def feed(self, host, lines):
+        """加入一个节点的日志行
+        参数列表:
+            host:主机名
+            lines:日志行列表(带换行)
+        返回值：
+            无
+        异常：
+            无
+        """
+        node = self.__nodeDict.get(host)
+        if node is None:
+            an = self.__factory(host)
+            node = self.__nodeDict[host] = [an, an.addFollowFile("syslog://%s" % (host or "unknown")), 0]
+        an, f, lineNo = node
+        sessUUIDList = an.feedLines(f, lineNo, lines)
+        node[2] += len(lines)
+        self.__onResult and self.__onResult(host, an, sessUUIDList)
+
+    def getNodeDict(self):
+        """获取各个节点
+        参数列表:
+            无
+        返回值：
+            {主机名:(分析器, 已加入的行数)}
+        异常：
+            无
+        """
+        return dict((host, (node[0], node[2])) for host, node in self.__nodeDict.items())
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, put):
+        self.__put = put
+
+    def datagram_received(self, data, addr):
+        self.__put(data)
+
+class SyslogReceiver(object):
+    """syslog接收
+    消息内容为与日志文件中相同的一行日志(如rsyslog的imfile转发的FS日志文件)。
+    UDP每个报文为一条消息；TCP支持按长度(RFC 6587的octet counting)和按换行两种分帧。
+    接收时只把消息原文放入有上限的队列，解析信封和分析在分析协程中按批进行，按照主机名分组后交给consumer。
+    UDP无法让发送方减速，队列满时丢弃并计数；TCP在队列满时等待，不再从连接读取，由发送方缓冲
+    """
+
+    def __init__(self, consumer, queueSize=QUEUE_SIZE, batchSize=BATCH_SIZE, maxLength=MAX_LENGTH):
+        """
+        参数列表:
+            consumer:分析函数 consumer(主机名, [日志行])
+            queueSize:队列长度上限
+            batchSize:每批的消息个数上限
+            maxLength:单条消息的长度上限
+        """
+        self.__consumer = consumer
+        self.__batchSize = batchSize
+        self.__maxLength = maxLength
+        self.__queueSize = queueSize
+        self.__queue = None
+        self.__transport = None
+        self.__udpPort = None
+        self.__kernelDrops = 0
+        self.__server = None
+        self.__stopped = False
+        self.__received = 0
+        self.__lines = 0
+        self.__maxQueued = 0
+        self.__drops = dict((x, 0) for x in DROP_LIST)
+        self.__startTime = None
+
+    def getStats(self):
+        """获取接收的统计
+        参数列表:
+            无
+        返回值：
+            {"received":接收的消息数, "lines":分析的行数, "maxQueued":队列中最多的消息数,
+             "drops":{丢弃的原因:消息数}, "seconds":运行的秒数}
+        异常：
+            无
+        """
+        return {"received":self.__received, "lines":self.__lines, "maxQueued":self.__maxQueued, \
+            "drops":dict(self.__drops, **{DROP_KERNEL:self.__getKernelDrops()}), "seconds":time.time() - self.__startTime if self.__startTime else 0}
+
+    def __getKernelDrops(self):
+        # 开始监听之前的丢弃计数不计入
+        return _getKernelDrops(self.__udpPort) - self.__kernelDrops if self.__udpPort else self.__kernelDrops
+
+    def __putNowait(self, data):
+        self.__received += 1
+        if len(data) > self.__maxLength:
+            self.__drops[DROP_OVERSIZE] += 1
+            return
+        try:
+            self.__queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.__drops[DROP_QUEUE] += 1
+            return
+        self.__maxQueued = max(self.__maxQueued, self.__queue.qsize())
+
+    async def __handleTcp(self, reader, writer):
+        skipping = False # 正在丢弃超长的一行
+        try:
+            while not self.__stopped:
+                try:
+                    head = await reader.readexactly(1)
+                    if not skipping and head.isdigit():
+                        count = head + await reader.readuntil(b" ")
+                        length = int(count[:-1])
+                        data = await reader.readexactly(min(length, self.__maxLength + 1))
+                        if length > self.__maxLength:
+                            # 超长的消息分段读取并丢弃，缓冲区大小不变
+                            length -= len(data)
+                            while length > 0:
+                                length -= len(await reader.readexactly(min(length, self.__maxLength)))
+                    else:
+                        data = head + await reader.readuntil(b"\n")
+                except asyncio.LimitOverrunError as Err:
+                    # 超长的一行，先丢弃已缓冲的部分，剩余部分到换行为止继续丢弃
+                    await reader.readexactly(Err.consumed)
+                    if not skipping:
+                        self.__received += 1
+                        self.__drops[DROP_OVERSIZE] += 1
+                    skipping = True
+                    continue
+                if skipping:
+                    skipping = False
+                    continue
+                self.__received += 1
+                if len(data) > self.__maxLength:
+                    self.__drops[DROP_OVERSIZE] += 1
+                    continue
+                await self.__queue.put(data)
+                self.__maxQueued = max(self.__maxQueued, self.__queue.qsize())
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="0.0.0.0", udpPort=DEFAULT_PORT, tcpPort=DEFAULT_PORT):
+        """开始监听
+        参数列表:
+            host:监听地址
+            udpPort:UDP端口，为None时不监听
+            tcpPort:TCP端口，为None时不监听
+        返回值：
+            (UDP端口, TCP端口)，实际监听的端口(指定为0时由系统分配)，不监听的为None
+        异常：
+            OSError 监听失败
+        """
+        loop = asyncio.get_event_loop()
+        self.__queue = asyncio.Queue(self.__queueSize)
+        self.__startTime = time.time()
+        ports = [None, None]
+        if udpPort is not None:
+            self.__transport, protocol = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self.__putNowait), local_addr=(host, udpPort))
+            ports[0] = self.__udpPort = self.__transport.get_extra_info("sockname")[1]
+            try:
+                self.__transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_SIZE)
+            except (IOError, OSError):
+                pass
+            self.__kernelDrops = _getKernelDrops(self.__udpPort)
+        if tcpPort is not None:
+            self.__server = await asyncio.start_server(self.__handleTcp, host, tcpPort, limit=self.__maxLength)
+            ports[1] = self.__server.sockets[0].getsockname()[1]
+        return tuple(ports)
+
+    def stop(self):
+        # 停止接收，run在处理完队列中的消息后返回
+        self.__stopped = True
+        if self.__transport:
+            # 关闭之后无法再读取内核的丢弃计数，保留最后的值
+            self.__kernelDrops = self.__getKernelDrops()
+            self.__udpPort = None
+            self.__transport.close()
+            self.__transport = None
+        if self.__server:
+            self.__server.close()
+            self.__server = None
+
+    def __process(self, batch):
+        # 一批消息解析后按照主机名分组，每个节点只调用一次分析
+        groupDict = {}
+        for data in batch:
+            res = parseSyslog(data.decode('utf-8', 'replace').rstrip("\r\n"))
+            if res is None:
+                self.__drops[DROP_INVALID] += 1
+                continue
+            host, msg = res
+            lines = groupDict.get(host)
+            if lines is None:
+                lines = groupDict[host] = []
+            lines.append(msg + "\n")
+        for host, lines in groupDict.items():
+            self.__consumer(host, lines)
+            self.__lines += len(lines)
+
+    async def run(self):
+        """持续解析和分析，直到stop
+        参数列表:
+            无
+        返回值：
+            无
+        异常：
+            无
+        """
+        queue = self.__queue
+        while not (self.__stopped and queue.empty()):
+            try:
+                batch = [await asyncio.wait_for(queue.get(), POLL_INTERVAL)]
+            except asyncio.TimeoutError:
+                continue
+            while len(batch) < self.__batchSize and not queue.empty():
+                batch.append(queue.get_nowait())
+            self.__process(batch)
+            # 分析是同步的，每批之后让出事件循环，接收可以继续
+            await asyncio.sleep(0)
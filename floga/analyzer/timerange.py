@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+from datetime import datetime, date, time, timedelta
+
+PY2 = sys.version_info[0] == 2
+PY3 = sys.version_info[0] == 3
+
+if PY2:
+    from compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+else:
+    from analyzer.compress import openLogFile, normalizeNewline, getCompression, COMPRESS_NONE
+
+LOG_TIME_RE = b"(\\d{4})-(\\d{1,2})-(\\d{1,2}) (\\d{2}):(\\d{2}):(\\d{2}).(\\d{6})"
+SEARCH_SIZE = 64 * 1024 # 二分查找缩小到此范围后改为逐行查找
+COUNT_SIZE = 1024 * 1024 # 统计行数时每次读取的字节数
+
+reTime = re.compile(LOG_TIME_RE)
+
+# 支持的时间参数格式，日期和时间之间不能有空格(命令行按照空格拆分参数)
+TIME_FORMAT_LIST = [
+    ("%Y-%m-%d_%H:%M:%S.%f", False), ("%Y-%m-%d_%H:%M:%S", False), ("%Y-%m-%d_%H:%M", False),
+    ("%Y-%m-%dT%H:%M:%S.%f", False), ("%Y-%m-%dT%H:%M:%S", False), ("%Y-%m-%dT%H:%M", False),
+    ("%H:%M:%S.%f", True), ("%H:%M:%S", True), ("%H:%M", True),
+]
+
+def parseTimeArg(s):
+    """解析命令行的时间参数
+    参数列表:
+        s:时间字符串，如 2016-03-21_14:02:00、2016-03-21T14:02 或只有时间的 14:02
+    返回值：
+        datetime或time(只有时间时，日期取日志文件中第一条日志的日期)，格式错误返回None
+    异常：
+        无
+    """
+    for fmt, timeOnly in TIME_FORMAT_LIST:
+        try:
+            dt = datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+        return dt.time() if timeOnly else dt
+    return None
+
+def getLineTime(line):
+    """提取一行日志的时间
+    参数列表:
+        line:未解码的日志行
+    返回值：
+        (年, 月, 日, 时, 分, 秒, 微秒)，没有时间返回None
+    异常：
+        无
+    """
+    res = reTime.search(line)
+    if res:
+        return tuple(int(x) for x in res.groups())
+    return None
+
+def toTimeKey(dt):
+    return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond)
+
+def timeAfter(f, pos):
+    """从pos之后的第一个完整行开始，查找第一条有时间的日志
+    参数列表:
+        f:二进制方式打开的文件
+        pos:偏移
+    返回值：
+        (时间, 行的偏移)，直到文件结尾都没有时间返回(None, 文件结尾的偏移)
+    异常：
+        无
+    """
+    f.seek(pos)
+    if pos:
+        pos += len(f.readline())
+    while True:
+        line = f.readline()
+        if not line:
+            return None, pos
+        t = getLineTime(line)
+        if t is not None:
+            return t, pos
+        pos += len(line)
+
+def searchTime(f, size, after):
+    """二分查找第一条满足条件的日志
+    文件中日志的时间基本有序，按照文件偏移二分，每次从偏移处重新对齐到下一条有时间的日志。
+    没有时间的行(如SIP消息的续行)属于前一条日志，不会成为范围的边界
+    参数列表:
+        f:二进制方式打开的文件
+        size:文件大小
+        after:判断函数 after(时间)，时间在目标之后返回True
+    返回值：
+        第一条满足条件的日志的偏移，都不满足返回文件大小
+    异常：
+        无
+    """
+    lo, hi = 0, size
+    while hi - lo > SEARCH_SIZE:
+        mid = (lo + hi) // 2
+        t, pos = timeAfter(f, mid)
+        if t is None or after(t):
+            hi = mid
+        else:
+            lo = mid
+
+    # 范围足够小后逐行查找
+    f.seek(lo)
+    pos = lo
+    if lo:
+        pos += len(f.readline())
+    while True:
+        line = f.readline()
+        if not line:
+            return size
+        t = getLineTime(line)
+        if t is not None and after(t):
+            return pos
+        pos += len(line)
+
+def resolveTime(value, firstTime):
+    # 只有时间的参数，日期取文件中第一条日志的日期
+    if isinstance(value, time):
+        return datetime.combine(date(firstTime[0], firstTime[1], firstTime[2]), value)
+    return value
+
+def findTimeRange(path, begin=None, end=None, margin=0):
+    """查找日志文件中时间范围对应的字节范围
+    未压缩的文件按照偏移二分查找，只读取少量内容；压缩文件无法定位，从头解压逐行查找，超过结束时间即停止
+    参数列表:
+        path:文件路径
+        begin:开始时间 datetime或time，None表示从文件开头
+        end:结束时间 datetime或time，None表示到文件结尾
+        margin:开始时间提前的秒数，使较早开始的会话也能包含建立过程的日志
+    返回值：
+        (起始偏移, 结束偏移)，压缩文件为解压后的偏移；文件中没有时间时返回None
+    异常：
+        IOError 打开文件失败
+    """
+    with openLogFile(path, binary=True) as f:
+        firstTime, pos = timeAfter(f, 0)
+    if firstTime is None:
+        return None
+
+    begin = resolveTime(begin, firstTime)
+    end = resolveTime(end, firstTime)
+    # 只有时间的结束时间早于开始时间，说明跨过了零点
+    if begin is not None and end is not None and end < begin:
+        end += timedelta(days=1)
+    beginKey = toTimeKey(begin - timedelta(seconds=margin)) if begin is not None else None
+    endKey = toTimeKey(end) if end is not None else None
+
+    if getCompression(path) == COMPRESS_NONE:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            start = searchTime(f, size, lambda t:t >= beginKey) if beginKey is not None else 0
+            stop = searchTime(f, size, lambda t:t > endKey) if endKey is not None else size
+        return start, max(start, stop)
+
+    start = -1
+    pos = 0
+    with openLogFile(path, binary=True) as f:
+        for line in f:
+            t = getLineTime(line)
+            if t is not None:
+                if start == -1 and (beginKey is None or t >= beginKey):
+                    start = pos
+                if endKey is not None and t > endKey:
+                    break
+            pos += len(line)
+    return (pos, pos) if start == -1 else (start, pos)
+
+def iterRangeLines(path, rng):
+    """逐行迭代文件中一段字节范围内的日志
+    参数列表:
+        path:文件路径
+        rng:(起始偏移, 结束偏移)，压缩文件为解压后的偏移
+    返回值：
+        生成器，每项为元组(偏移, 未解码的日志行)，行尾的\\r\\n换成\\n
+    异常：
+        IOError 打开文件失败
+    """
+    start, end = rng
+    with openLogFile(path, binary=True) as f:
+        # 压缩文件的seek由解压后丢弃前面的内容实现
+        start and f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            yield pos, normalizeNewline(line)
+            pos += len(line)
+
+def countLines(path, end):
+    """统计文件中一段偏移之前的行数
+    参数列表:
+        path:文件路径
+        end:结束偏移，压缩文件为解压后的偏移
+    返回值：
+        偏移之前的行数
+    异常：
+        IOError 打开文件失败
+    """
+    count = 0
+    pos = 0
+    with openLogFile(path, binary=True) as f:
+        while pos < end:
+            block = f.read(min(COUNT_SIZE, end - pos))
+            if not block:
+                break
+            count += block.count(b'\n')
+            pos += len(block)
+    return count
@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*- 
 
-from base import PRINT, INPUT, getPathSeparator
+from .base import PRINT, INPUT, getPathSeparator
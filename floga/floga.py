@@ -11,6 +11,8 @@ PY3 = sys.version_info[0] == 3
 from base.base import PRINT, INPUT, getColor
 
 from manager.manager_fs import fsMgr, FsCmd
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.timerange import parseTimeArg
 
 class FLog(FsCmd):
 
@@ -21,7 +23,10 @@ class FLog(FsCmd):
     def __init__(self):
         cmdLists = [
             # 使能标记, [命令全称,命令简写],参数最少个数,命令简介,参数说明
-            (True, ['load', 'l'], 2, "加载分析文件", "[日志文件类型('fs','cb')] [日志文件列表(至少一个，可多个，支持 * ? [] 三种通配符)]\n{-r 日志文件路径 -o 输出路径 -mode 模式('session','memory','mix')}"),
+            (True, ['load', 'l'], 2, "加载分析文件", "[日志文件类型('fs','cb')] [日志文件列表(至少一个，可多个，支持 * ? [] 三种通配符)]\n{-r 日志文件路径 -o 输出路径 -mode 会话存放方式('session':只保存位置，查询时读磁盘,'memory':全部常驻内存(默认),'mix':异常和最近的会话常驻内存) -ingest 加载方式('memory','stream','mmap','bytes') -decode 解码出错处理('replace','ignore','backslashreplace') -sort 排序方式('file','merge') -ignore 忽略的行的记录方式('sample':计数和抽样,'count':只计数,'all':保留全部) -jobs 并行进程数 -cache 缓存目录 -cachesize 缓存上限(MB) -rules 会话过程规则文件(JSON或YAML) -classify 会话过程分析方式('session':逐个会话,'columnar':按列批量分析，需要numpy)\n -from 开始时间 -to 结束时间(如 2016-03-21_14:02:00 或 14:02) -margin 开始时间提前的秒数(默认60)}"),
+            (True, ['follow', 'f'], 2, "跟踪正在写入的日志", "[日志文件类型('fs','cb')] [日志文件]\n{-r 日志文件路径 -i 轮询间隔(秒) -from 开始位置('head','tail')}"),
+            (True, ['esl', 'e'], 1, "接收FS的ESL事件并实时分析(需要python3)", "[日志文件类型('fs')] {ESL地址(默认127.0.0.1:8021)}\n{-p 密码(默认ClueCon) -queue 等待分析的事件个数上限}"),
+            (True, ['syslog', 'sl'], 1, "接收syslog转发的日志并按节点实时分析(需要python3)", "[日志文件类型('fs')] {监听端口(默认514)}\n{-proto 协议('udp','tcp','both') -bind 监听地址 -queue 等待解析的消息个数上限}"),
             (False, ['reload', 'rl'], 2, "重新加载分析文件", "[日志文件类型('fs','cb')] [日志文件列表(至少一个，可多个，支持 * ? [] 三种通配符)] {-r 日志文件路径 -o 输出路径}"),
             (True, ['clear', 'c'], 0, "清除已加载的分析文件", "无"),
             (True, ['showloadfile', 'slf'], 0, "查看已加载的日志文件", "{'all'|日志文件类型('fs','cb')}"),
@@ -47,11 +52,55 @@ class FLog(FsCmd):
             PRINT(s)
         return manager
 
+    # load命令的选项: (选项名, 命令行参数, 取值范围或校验函数, 出错提示)，取值范围为None时不校验
+    __optionList = [
+        ("logDir", '-r', None, ""),
+        ("outputDir", '-o', None, ""),
+        ("mode", '-mode', ["session", "memory", "mix"], "模式错误"),
+        ("ingest", '-ingest', ["memory", "stream", "mmap", "bytes"], "加载方式错误"),
+        ("errors", '-decode', ["replace", "ignore", "backslashreplace"], "解码出错处理方式错误"),
+        ("sortMode", '-sort', ["file", "merge"], "排序方式错误"),
+        ("ignoreMode", '-ignore', ["sample", "count", "all"], "忽略的行的记录方式错误"),
+        ("jobs", '-jobs', lambda x: x.isdigit() and int(x) >= 1, "进程数错误"),
+        ("cacheDir", '-cache', None, ""),
+        ("cacheSize", '-cachesize', lambda x: x.isdigit() and int(x) >= 1, "缓存上限错误"),
+        ("rulePath", '-rules', None, ""),
+        ("classifyMode", '-classify', ["session", "columnar"], "分析方式错误"),
+        ("timeFrom", '-from', lambda x: parseTimeArg(x) is not None, "开始时间错误"),
+        ("timeTo", '-to', lambda x: parseTimeArg(x) is not None, "结束时间错误"),
+        ("margin", '-margin', lambda x: x.isdigit(), "提前秒数错误"),
+    ]
+
     def __getOption(self, cmd):
-        cmd, logDir = self.__xDict["Manager"]["fs"].getOption(cmd, '-r')
-        cmd, outputDir = self.__xDict["Manager"]["fs"].getOption(cmd, '-o')
-        cmd, mode = self.__xDict["Manager"]["fs"].getOption(cmd, '-mode')
-        return True, cmd, logDir, outputDir, mode or "session"
+        """解析并校验load命令的选项
+        参数列表:
+            cmd:命令参数列表
+        返回值：
+            成功标志, 去掉选项后的命令参数列表, 选项字典 元组(bool, list, dict)
+            选项字典的key见__optionList，另有timeWindow为(开始时间, 结束时间, 提前秒数)或None
+        异常：
+            无
+        """
+        optionDict = {}
+        for name, opt, check, msg in self.__optionList:
+            cmd, value = self.__xDict["Manager"]["fs"].getOption(cmd, opt)
+            if value and check is not None and not (check(value) if callable(check) else value in check):
+                s = "%s'%s'" % (msg, value)
+                PRINT(s)
+                return False, cmd, None
+            optionDict[name] = value
+
+        # 默认全部常驻内存，与没有存放方式选项时相同
+        optionDict["mode"] = optionDict["mode"] or "memory"
+        optionDict["jobs"] = int(optionDict["jobs"] or 1)
+        optionDict["cacheSize"] = int(optionDict["cacheSize"] or 0) * 1024 * 1024
+        begin = parseTimeArg(optionDict["timeFrom"]) if optionDict["timeFrom"] else None
+        end = parseTimeArg(optionDict["timeTo"]) if optionDict["timeTo"] else None
+        optionDict["timeWindow"] = None
+        if begin is not None or end is not None:
+            margin = optionDict["margin"]
+            optionDict["timeWindow"] = (begin, end, int(margin) if margin else FsLogAnalyzer.TIME_MARGIN)
+        return True, cmd, optionDict
 
     # load命令  
     def do_load(self, line):
@@ -60,13 +109,27 @@ class FLog(FsCmd):
         if manager is None:
             return False
 
-        ok, cmd, logDir, outputDir, mode = self.__getOption(cmd)
+        ok, cmd, optionDict = self.__getOption(cmd)
+        if not ok:
+            return False
+        ok, msg = manager.setCallFlowRules(optionDict["rulePath"])
         if not ok:
+            s = "规则文件加载失败。原因:'%s'" % msg
+            PRINT(s)
             return False
+        ok, msg = manager.setClassifyMode(optionDict["classifyMode"])
+        if not ok:
+            s = "分析方式设置失败。原因:'%s'" % msg
+            PRINT(s)
+            return False
+        manager.setCache(optionDict["cacheDir"], optionDict["cacheSize"])
+        manager.setTimeWindow(optionDict["timeWindow"])
+        mode = optionDict["mode"]
         needload = False
         
         for c in cmd[1:]:
-            successFileList, failedFileList, filePath = manager.load(c, False, logDir, outputDir)
+            successFileList, failedFileList, filePath = manager.load(c, False, optionDict["logDir"], optionDict["outputDir"], \
+                optionDict["ingest"], optionDict["errors"], optionDict["sortMode"], optionDict["ignoreMode"])
             
             for fileName, msg in failedFileList:
                 s = "日志加载失败。模式: '" + mode + "'" + " 日志类型: '" + cmd[0] + "' 文件路径: " + fileName + " 原因: " + msg
@@ -80,13 +143,110 @@ class FLog(FsCmd):
         else:
             if needload:
                 s = "%d个日志需要分析" % (len(successFileList))
-                ok, msg = manager.run(mode)
+                ok, msg = manager.run(mode, optionDict["jobs"])
                 if not ok:
                     s = "运行失败。原因:'%s'" % (msg)
                     PRINT(s)
 
     do_l = do_load
 
+    # follow命令
+    def do_follow(self, line):
+        cmd = line.split()
+        if len(cmd) < 2:
+            s = "此命令至少需要输入2个参数"
+            PRINT(s)
+            return False
+        manager = self.__getManager(cmd[0])
+        if manager is None:
+            return False
+
+        cmd, logDir = manager.getOption(cmd, '-r')
+        cmd, interval = manager.getOption(cmd, '-i')
+        cmd, start = manager.getOption(cmd, '-from')
+        try:
+            interval = float(interval or 1)
+        except ValueError:
+            s = "轮询间隔错误'%s'" % interval
+            PRINT(s)
+            return False
+
+        ok, msg = manager.follow(cmd[1], logDir, interval, start not in ["head"])
+        if not ok:
+            s = "跟踪失败。原因:'%s'" % (msg)
+            PRINT(s)
+
+    do_f = do_follow
+
+    # esl命令
+    def do_esl(self, line):
+        cmd = line.split()
+        if len(cmd) < 1:
+            s = "此命令至少需要输入1个参数"
+            PRINT(s)
+            return False
+        manager = self.__getManager(cmd[0])
+        if manager is None:
+            return False
+        if not hasattr(manager, "followEsl"):
+            s = "类型'%s'不支持ESL" % cmd[0]
+            PRINT(s)
+            return False
+
+        cmd, password = manager.getOption(cmd, '-p')
+        cmd, queueSize = manager.getOption(cmd, '-queue')
+        try:
+            queueSize = int(queueSize or 0)
+        except ValueError:
+            s = "队列长度错误'%s'" % queueSize
+            PRINT(s)
+            return False
+
+        ok, msg = manager.followEsl(cmd[1] if len(cmd) > 1 else "", password, queueSize)
+        if not ok:
+            s = "ESL接入失败。原因:'%s'" % (msg)
+            PRINT(s)
+
+    do_e = do_esl
+
+    # syslog命令
+    def do_syslog(self, line):
+        cmd = line.split()
+        if len(cmd) < 1:
+            s = "此命令至少需要输入1个参数"
+            PRINT(s)
+            return False
+        manager = self.__getManager(cmd[0])
+        if manager is None:
+            return False
+        if not hasattr(manager, "receiveSyslog"):
+            s = "类型'%s'不支持syslog" % cmd[0]
+            PRINT(s)
+            return False
+
+        cmd, proto = manager.getOption(cmd, '-proto')
+        cmd, bind = manager.getOption(cmd, '-bind')
+        cmd, queueSize = manager.getOption(cmd, '-queue')
+        try:
+            port = int(cmd[1]) if len(cmd) > 1 else 0
+        except ValueError:
+            s = "端口错误'%s'" % cmd[1]
+            PRINT(s)
+            return False
+        try:
+            queueSize = int(queueSize or 0)
+        except ValueError:
+            s = "队列长度错误'%s'" % queueSize
+            PRINT(s)
+            return False
+
+        ok, msg = manager.receiveSyslog(port, proto, bind, queueSize)
+        if not ok:
+            s = "syslog接收失败。原因:'%s'" % (msg)
+            PRINT(s)
+
+    do_sl = do_syslog
+
     # reload命令       
     def do_reload(self, line):
         cmd = line.split()
@@ -1,4 +1,4 @@
 # -*- coding: utf-8 -*- 
-from manager import Command, Manager
-from manager_fs import FsCmd, FsManager
+from .manager import Command, Manager
+from .manager_fs import FsCmd, FsManager
 
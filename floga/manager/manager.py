@@ -2,12 +2,17 @@
 
 import sys
 import os
+import time
 from cmd import Cmd
 from platform import system as osys
 
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
+from base.base import PRINT, getPathSeparator
+from analyzer.follow import LogFollower
+from analyzer.cache import AnalysisCache
+
 class Manager(object):
     """ 控制器基类
         衔接命令行框架与分析器
@@ -66,24 +71,23 @@ class Manager(object):
     def getAnalyzerLogPath(self):
         return self.getAnalyzer().getPath()
 
-    def load(self, fileName, rl=False, logDir="", outputDir=""):
+    def load(self, fileName, rl=False, logDir="", outputDir="", ingest="", errors="", sortMode="", ignoreMode=""):
         """ 加载
             参数列表:
                 fileName:日志文件名
                 rl:是否重新加载
                 logDir:日志文件目录
                 outputDir:输出目录
+                ingest:加载方式('memory','stream','mmap','bytes')
+                errors:字节解码出错时的处理方式('replace','ignore','backslashreplace')
+                sortMode:日志行的排序方式('file','merge')
+                ignoreMode:忽略的行的记录方式('sample','count','all')
             返回值:分析器加载结果 结果值,错误信息 bool,str
             异常:无
         """
         # 获取分析器
         an = self.getAnalyzer()
-        # 计算出日志存放的绝对路径=当前脚本目录的上层目录的log目录
-        if not logDir:
-            absLogPath = os.path.join(self.getPwd(), os.pardir, "log", fileName)
-        else:
-            sep = getPathSeparator()
-            absLogPath = os.path.join(logDir if logDir[-1] == sep else logDir + sep, fileName)
+        absLogPath = self.getAbsLogPath(fileName, logDir)
 
         # 如果存在输出路径则选择输出路径，不存在则输出在工程路径的根目录下的output文件夹下
         if not outputDir:
@@ -93,16 +97,95 @@ class Manager(object):
             self.__outputDir = outputDir if outputDir[-1] == sep else outputDir + sep
 
         # 分析器加载日志并分析
-        successFileList, failedFileList = an.load(absLogPath, rl)
+        an.setDecodeErrors(errors or an.DECODE_ERRORS_LIST[0])
+        an.setSortMode(sortMode or an.SORT_FILE)
+        an.setIgnoreMode(ignoreMode or an.IGNORE_SAMPLE)
+        successFileList, failedFileList = an.load(absLogPath, rl, ingest or an.INGEST_MEMORY)
         return successFileList, failedFileList, absLogPath
 
-    def run(self, mode = "session"):
+    def getAbsLogPath(self, fileName, logDir=""):
+        """ 计算日志文件的绝对路径
+            参数列表:
+                fileName:日志文件名
+                logDir:日志文件目录，为空时为当前脚本目录的上层目录的log目录
+            返回值:日志文件路径 str
+            异常:无
+        """
+        if not logDir:
+            return os.path.join(self.getPwd(), os.pardir, "log", fileName)
+        else:
+            sep = getPathSeparator()
+            return os.path.join(logDir if logDir[-1] == sep else logDir + sep, fileName)
+
+    def follow(self, fileName, logDir="", interval=1.0, fromEnd=True):
+        """ 跟踪正在写入的日志文件，增量分析并显示结果有变化的会话，Ctrl+C停止
+            参数列表:
+                fileName:日志文件名
+                logDir:日志文件目录
+                interval:轮询间隔(秒)
+                fromEnd:是否从文件末尾开始跟踪
+            返回值:结果值,错误信息 bool,str
+            异常:无
+        """
+        an = self.getAnalyzer()
+        absLogPath = an.getBeautifulPath(self.getAbsLogPath(fileName, logDir))
+        if not os.path.isfile(absLogPath):
+            return False, "文件不存在"
+
+        s = "正在跟踪日志文件 %s (Ctrl+C停止)" % absLogPath
+        PRINT(s)
+        follower = LogFollower(absLogPath, fromEnd, an.decodeLine)
+        f = -1
+        try:
+            while True:
+                for newFile, lineNo, lines in follower.poll():
+                    # 首次打开、轮转或截断后，作为一个新的日志文件登记
+                    if newFile:
+                        f = an.addFollowFile(absLogPath)
+                    an.showFollowResult(an.feedLines(f, lineNo, lines))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            follower.close()
+        return True, ""
+
+    def setCache(self, cacheDir, maxSize=0):
+        """ 设置分析结果的磁盘缓存
+            参数列表:
+                cacheDir:缓存目录，为空时不使用缓存
+                maxSize:缓存总大小上限(字节)，为0时使用默认值
+            返回值:无
+            异常:无
+        """
+        an = self.getAnalyzer()
+        if not cacheDir:
+            an.setCache(None)
+        else:
+            an.setCache(AnalysisCache(cacheDir, maxSize or AnalysisCache.DEFAULT_MAX_SIZE))
+
+    def setTimeWindow(self, timeWindow=None):
+        """ 设置加载的时间范围
+            参数列表:
+                timeWindow:(开始时间, 结束时间, 开始时间提前的秒数)，None表示加载整个文件
+            返回值:无
+            异常:无
+        """
+        an = self.getAnalyzer()
+        if timeWindow is None:
+            an.setTimeWindow()
+        else:
+            an.setTimeWindow(*timeWindow)
+
+    def run(self, mode = "session", jobs = 1):
         """ 运行控制器
-            参数列表:无
+            参数列表:
+                mode:会话存放方式('session','memory','mix')
+                jobs:并行的进程数
             返回值:分析器运行结果 结果值,错误信息 bool,str
             异常:无
         """
-        return self.getAnalyzer().run(mode)
+        return self.getAnalyzer().run(mode, jobs)
     
     def clear(self):
         """ 运行控制器
@@ -7,12 +7,19 @@ from cmd import Cmd
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
+from base.base import PRINT
+
 if PY2:
     from analyzer.analyzer_fs import FsLogAnalyzer
     from manager import Manager, Command
+    esl = None # ESL接入和syslog接收基于asyncio，只支持python3
+    syslogrecv = None
 else:
+    import asyncio
     from analyzer.analyzer_fs import FsLogAnalyzer
     from manager.manager import Manager, Command
+    from analyzer import esl
+    from analyzer import syslogrecv
 
     def unicode(s, code):
         return s
@@ -31,6 +38,160 @@ class FsManager(Manager):
     def showUUIDList(self, cmd):
         return self.getAnalyzer().showSessUUIDList()
 
+    def showRuleStats(self, cmd):
+        return self.getAnalyzer().showRuleStats()
+
+    def showIgnoreStats(self, cmd):
+        return self.getAnalyzer().showIgnoreStats()
+
+    def setCallFlowRules(self, path=""):
+        """ 设置会话过程的规则
+            参数列表:
+                path:规则文件路径，为空时使用内置的规则
+            返回值:成功或失败，错误信息 bool,str
+            异常:无
+        """
+        return self.getAnalyzer().setCallFlowRules(path)
+
+    def setClassifyMode(self, mode=""):
+        """ 设置会话过程的分析方式
+            参数列表:
+                mode:分析方式('session','columnar')，为空时逐个会话分析
+            返回值:成功或失败，错误信息 bool,str
+            异常:无
+        """
+        an = self.getAnalyzer()
+        return an.setClassifyMode(mode or an.CLASSIFY_SESSION)
+
+    def followEsl(self, address="", password="", queueSize=0):
+        """ 连接FS的Event Socket，实时分析事件并显示结果有变化的会话，Ctrl+C或连接断开时停止
+            参数列表:
+                address:ESL服务端地址('主机:端口')，为空时为127.0.0.1:8021
+                password:ESL密码，为空时为ClueCon
+                queueSize:等待分析的事件个数上限，为0时使用默认值
+            返回值:结果值,错误信息 bool,str
+            异常:无
+        """
+        if esl is None:
+            return False, "ESL接入需要python3"
+        try:
+            host, port = esl.parseAddress(address)
+        except ValueError:
+            return False, "地址错误'%s'" % address
+
+        an = self.getAnalyzer()
+        client = esl.EslClient(host, port, password or esl.DEFAULT_PASSWORD)
+        f = an.addFollowFile("esl://%s" % client.getAddress())
+        lineNo = [0]
+
+        def consume(records):
+            an.showFollowResult(an.feedEvents(f, lineNo[0], records))
+            lineNo[0] += len(records)
+
+        ingest = esl.EslIngest(client, esl.EslEventMapper(), consume, queueSize or esl.QUEUE_SIZE)
+        s = "正在接收ESL事件 %s (Ctrl+C停止)" % client.getAddress()
+        PRINT(s)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(ingest.run())
+        except KeyboardInterrupt:
+            pass
+        except (IOError, OSError) as Err:
+            return False, str(Err)
+        finally:
+            loop.close()
+        stats = ingest.getStats()
+        s = "共接收事件%d个，分析%d条，队列中最多%d条" % (stats["events"], stats["records"], stats["maxQueued"])
+        PRINT(s)
+        return True, ""
+
+    def receiveSyslog(self, port=0, proto="", bind="", queueSize=0):
+        """ 接收syslog转发的日志，按照主机名分给各个节点的分析器，实时分析并显示结果有变化的会话，Ctrl+C停止
+            参数列表:
+                port:监听端口，为0时为514
+                proto:协议('udp','tcp','both')，为空时为both
+                bind:监听地址，为空时为0.0.0.0
+                queueSize:等待解析的消息个数上限，为0时使用默认值
+            返回值:结果值,错误信息 bool,str
+            异常:无
+        """
+        if syslogrecv is None:
+            return False, "syslog接收需要python3"
+        proto = proto or "both"
+        if proto not in ["udp", "tcp", "both"]:
+            return False, "协议错误'%s'" % proto
+        port = port or syslogrecv.DEFAULT_PORT
+
+        # 各个节点使用与当前分析器相同的会话过程规则
+        rulePath = self.getAnalyzer().getCallFlowRulePath()
+
+        def newAnalyzer(host):
+            node = FsLogAnalyzer()
+            rulePath and node.setCallFlowRules(rulePath)
+            s = "新的节点 %s" % (host or "unknown")
+            PRINT(s)
+            return node
+
+        def showResult(host, node, sessUUIDList):
+            node.showFollowResult(sessUUIDList)
+
+        router = syslogrecv.NodeRouter(newAnalyzer, showResult)
+        receiver = syslogrecv.SyslogReceiver(router.feed, queueSize or syslogrecv.QUEUE_SIZE)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            ports = loop.run_until_complete(receiver.start(bind or "0.0.0.0", \
+                port if proto != "tcp" else None, port if proto != "udp" else None))
+            s = "正在接收syslog %s (UDP端口%s，TCP端口%s，Ctrl+C停止)" % (bind or "0.0.0.0", ports[0] or "-", ports[1] or "-")
+            PRINT(s)
+            loop.run_until_complete(receiver.run())
+        except KeyboardInterrupt:
+            pass
+        except (IOError, OSError) as Err:
+            return False, str(Err)
+        finally:
+            receiver.stop()
+            loop.close()
+            asyncio.set_event_loop(None)
+
+        stats = receiver.getStats()
+        s = "共接收消息%d条，分析%d行，队列中最多%d条，%.0f条/秒" % (stats["received"], stats["lines"], stats["maxQueued"], \
+            stats["received"] / max(stats["seconds"], 0.001))
+        PRINT(s)
+        s = "丢弃：接收缓冲区满%d条，队列满%d条，超长%d条，格式错误%d条" % (stats["drops"][syslogrecv.DROP_KERNEL], stats["drops"][syslogrecv.DROP_QUEUE], \
+            stats["drops"][syslogrecv.DROP_OVERSIZE], stats["drops"][syslogrecv.DROP_INVALID])
+        PRINT(s)
+        for host, (node, lines) in sorted(router.getNodeDict().items()):
+            s = "节点 %s：%d行，%d路会话" % (host or "unknown", lines, len(node.getSessLogInfoDict()))
+            PRINT(s)
+        return True, ""
+
+    def loadRules(self, cmd):
+
+        an = self.getAnalyzer()
+
+        path = cmd[0] if cmd[0].lower() not in ["default"] else ""
+        ok, msg = an.setCallFlowRules(path)
+        if not ok:
+            s = "规则文件加载失败。原因:'%s'" % msg
+            PRINT(s)
+            return False
+
+        s = "会话过程规则：%s" % (path or "内置规则")
+        PRINT(s)
+        # 已提取的关键信息不受规则影响，只需要重新分析
+        an.reanalyze()
+        return True
+
+    def dumpRules(self, cmd):
+
+        an = self.getAnalyzer()
+
+        ok, msg = an.dumpCallFlowRules(cmd[0])
+        s = ("内置规则已保存到%s" % cmd[0]) if ok else ("规则保存失败。原因:'%s'" % msg)
+        PRINT(s)
+        return ok
+
     def showResultByCallNumber(self, cmd):
 
         an = self.getAnalyzer()
@@ -157,6 +318,10 @@ class FsCmd(Command):
             
             (True, ['fsshowcallnumberlist', 'fsscl'], 0, "显示呼叫号码列表", "无"),
             (True, ['fsshowuuidlist', 'fssul'], 0, "显示UUID列表", "无"),
+            (True, ['fsshowrulestats', 'fssrs'], 0, "显示提取规则的匹配统计", "无"),
+            (True, ['fsshowignorestats', 'fssis'], 0, "显示忽略的行的统计", "无"),
+            (True, ['fsloadrules', 'fslr'], 1, "加载会话过程规则并重新分析", "[规则文件(JSON或YAML)|'default']"),
+            (True, ['fsdumprules', 'fsdr'], 1, "保存内置的会话过程规则", "[规则文件]"),
             
             (True, ['fsshowresultbycallnumber', 'fssrc'], 1, "按号码显示结果", "[呼叫号码|'all'] {'OK'|'ERROR'}"),
             (True, ['fsshowresultbyuuid', 'fssru'], 1, "按UUID显示结果", "[UUID|'all'] {'OK'|'ERROR'}"),
@@ -196,6 +361,34 @@ class FsCmd(Command):
 
     do_fssul = do_fsshowuuidlist
 
+    # 显示提取规则的匹配统计
+    def do_fsshowrulestats(self, line):
+        p = self.checkParmater("fssrs", line)
+        p and fsMgr.showRuleStats(p)
+
+    do_fssrs = do_fsshowrulestats
+
+    # 显示忽略的行的统计
+    def do_fsshowignorestats(self, line):
+        p = self.checkParmater("fssis", line)
+        p and fsMgr.showIgnoreStats(p)
+
+    do_fssis = do_fsshowignorestats
+
+    # 加载会话过程规则
+    def do_fsloadrules(self, line):
+        p = self.checkParmater("fslr", line)
+        p and fsMgr.loadRules(p)
+
+    do_fslr = do_fsloadrules
+
+    # 保存内置的会话过程规则
+    def do_fsdumprules(self, line):
+        p = self.checkParmater("fsdr", line)
+        p and fsMgr.dumpRules(p)
+
+    do_fsdr = do_fsdumprules
+
     # 按号码显示结果
     def do_fsshowresultbycallnumber(self, line):
         p = self.checkParmater("fssrc", line)
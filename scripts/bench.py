@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Floga基准测试
+# 用法: python3 bench.py [选项] 测试项
+# python2也可以运行，但没有numpy时不能测试classify，也不能测试esl
+import os
+import sys
+import time
+import random
+import uuid
+import gzip
+import bz2
+import shutil
+import tempfile
+import subprocess
+from multiprocessing import cpu_count
+from datetime import datetime, timedelta
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'floga'))
+
+# 屏蔽分析器的界面输出，只保留计时结果
+import base.base
+base.base.PRINT = lambda s, end='\n', color='white': None
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.compress import lzma
+from analyzer.parallel import CHUNK_SIZE
+from analyzer.session import Session
+
+class Quiet(object):
+    # 屏蔽进度条输出
+    def __enter__(self):
+        self.__stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        return self
+
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self.__stdout
+
+def genLog(path, calls, seed=1, noise=3):
+    """生成模拟的FS DEBUG日志
+    参数列表:
+        path:输出文件路径
+        calls:呼叫数
+        seed:随机种子
+        noise:每条关键日志之后最多的无关日志行数
+    返回值：
+        生成的行数
+    异常：
+        无
+    """
+    rnd = random.Random(seed)
+    now = [datetime(2016, 3, 21, 17, 41, 14, 701532)]
+    count = [0]
+
+    def ts():
+        now[0] += timedelta(microseconds=rnd.randint(50, 40000))
+        return now[0].strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    with open(path, 'w') as f:
+        for c in range(calls):
+            sessUUID = str(uuid.UUID(int=rnd.getrandbits(128)))
+            number = str(6000 + rnd.randint(0, 2000))
+            chan = "sofia/external/%s@10.0.7.152:5080" % number
+            kind = rnd.choice(["ok180", "ok183", "okinv", "busy", "cancel", "partial", "inbound"])
+
+            def w(s):
+                f.write("%s %s [DEBUG] switch_core_state_machine.c:473 %s\n" % (sessUUID, ts(), s))
+                count[0] += 1
+                for i in range(rnd.randint(0, noise)):
+                    f.write("%s %s [DEBUG] sofia.c:%d (%s) Channel is not interesting\n" % (sessUUID, ts(), rnd.randint(1, 9999), chan))
+                    count[0] += 1
+                    if rnd.random() < 0.3:
+                        f.write("   Via: SIP/2.0/UDP 10.0.7.152:5080;branch=z9hG4bK%d\n" % rnd.randint(1, 1000000))
+                        count[0] += 1
+
+            w("New Channel %s [%s]" % (chan, sessUUID))
+            w("(%s) State Change CS_NEW -> CS_INIT" % chan)
+            if kind == "inbound":
+                w("receiving invite from 10.0.7.1:5060 version: 1.6")
+            w("(%s) State Change CS_INIT -> CS_ROUTING" % chan)
+            if rnd.random() < 0.2:
+                w("Dialplan: %s Action transfer(%s XML default)" % (chan, number + "1"))
+            w("(%s) State Change CS_ROUTING -> CS_CONSUME_MEDIA" % chan)
+            if kind == "partial":
+                continue
+            w("Channel %s entering state [calling][0]" % chan)
+            w('Flipping CID from "Outbound Call" <%s> to "Customer" <%s>' % (number, "138" + number))
+            if kind in ["ok180", "busy", "cancel"]:
+                w("Channel %s entering state [proceeding][180]" % chan)
+                w("(%s) Callstate Change DOWN -> RINGING" % chan)
+            elif kind == "ok183":
+                w("Channel %s entering state [proceeding][183]" % chan)
+                w("(%s) Callstate Change DOWN -> EARLY" % chan)
+
+            if kind in ["ok180", "ok183", "okinv", "inbound"]:
+                w("Channel %s entering state [completing][200]" % chan)
+                w("Channel %s entering state [ready][200]" % chan)
+                w("(%s) Callstate Change %s -> ACTIVE" % (chan, {"ok180": "RINGING", "ok183": "EARLY"}.get(kind, "DOWN")))
+                w("AUDIO RTP [%s] 10.0.7.176 port %d -> 192.168.0.178 port 7076 codec: 18 ms: 20" % (chan, rnd.randint(2000, 30000)))
+                if rnd.random() < 0.5:
+                    w("Sending BYE to %s" % chan)
+                    w("Hangup %s [CS_EXECUTE] [NORMAL_CLEARING]" % chan)
+                else:
+                    w("952 Hangup %s [CS_EXECUTE] [NORMAL_CLEARING]" % chan)
+                w("(%s) Callstate Change ACTIVE -> HANGUP" % chan)
+            elif kind == "busy":
+                w("Channel %s entering state [terminated][486]" % chan)
+                w("Hangup %s [CS_CONSUME_MEDIA] [USER_BUSY]" % chan)
+                w("(%s) Callstate Change RINGING -> HANGUP" % chan)
+            elif kind == "cancel":
+                w("Sending CANCEL to %s" % chan)
+                w("Hangup %s [CS_CONSUME_MEDIA] [ORIGINATOR_CANCEL]" % chan)
+                w("(%s) Callstate Change RINGING -> HANGUP" % chan)
+    return count[0]
+
+def getRss():
+    # 当前进程的常驻内存(字节)，只支持Linux
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def compressFile(path, opener, postfix):
+    newPath = path + postfix
+    with open(path, 'rb') as src:
+        dst = opener(newPath, 'wb')
+        shutil.copyfileobj(src, dst)
+        dst.close()
+    return newPath
+
+def benchIngest(workDir, options):
+    """压缩日志与文本日志的读取吞吐量对比"""
+    path = os.path.join(workDir, "freeswitch.log")
+    lines = genLog(path, options.calls)
+    size = os.path.getsize(path)
+
+    fileList = [("plain", path), ("gzip", compressFile(path, gzip.GzipFile, ".gz")), ("bz2", compressFile(path, bz2.BZ2File, ".bz2"))]
+    if lzma:
+        fileList.append(("xz", compressFile(path, lzma.LZMAFile, ".xz")))
+
+    print("%d行 %.1fMB" % (lines, size / 1048576.0))
+    print("%-8s %-10s %-10s %-10s" % ("格式", "文件MB", "耗时秒", "MB/秒"))
+    for name, p in fileList:
+        an = FsLogAnalyzer()
+        with Quiet():
+            time1 = time.time()
+            an.load(p, False, an.INGEST_STREAM)
+            for f, i, line in an.iterLines():
+                pass
+            time2 = time.time()
+        print("%-8s %-10.1f %-10.2f %-10.1f" % (name, os.path.getsize(p) / 1048576.0, time2 - time1, size / 1048576.0 / (time2 - time1)))
+
+def benchLoad(workDir, options):
+    """各种加载方式下加载和分析的耗时对比"""
+    path = os.path.join(workDir, "freeswitch.log")
+    lines = genLog(path, options.calls)
+
+    print("%d行 %.1fMB" % (lines, os.path.getsize(path) / 1048576.0))
+    print("%-8s %-10s %-10s %-10s" % ("加载方式", "加载秒", "分析秒", "会话数"))
+    for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+        an = FsLogAnalyzer()
+        with Quiet():
+            time1 = time.time()
+            an.load(path, False, ingest)
+            time2 = time.time()
+            an.run()
+            time3 = time.time()
+        print("%-8s %-10.2f %-10.2f %-10d" % (ingest, time2 - time1, time3 - time2, len(an.getSessUUIDList())))
+        an.clear()
+
+def benchStore(workDir, options):
+    """各种会话存放方式(-mode)的内存占用和查询耗时对比
+    每种方式在单独的子进程中运行，内存占用为分析完成后仍然占用的内存：python3使用tracemalloc统计，
+    python2只能取RSS(已释放的内存不一定归还系统，差异偏小)。查询为随机读取会话的全部日志并生成详细结果
+    """
+    path = os.path.join(workDir, "freeswitch.log")
+    if options.store:
+        import gc
+        try:
+            import tracemalloc
+            tracemalloc.start()
+        except ImportError:
+            tracemalloc = None
+        an = FsLogAnalyzer()
+        with Quiet():
+            time1 = time.time()
+            an.load(path, False, an.INGEST_MEMORY)
+            an.run(options.store)
+            time2 = time.time()
+            gc.collect()
+            rss = tracemalloc.get_traced_memory()[0] if tracemalloc else getRss()
+            tracemalloc and tracemalloc.stop()
+            sessUUIDList = sorted(an.getSessUUIDList())
+            rnd = random.Random(1)
+            queryList = [rnd.choice(sessUUIDList) for i in range(options.queries)]
+            time3 = time.time()
+            for sessUUID in queryList:
+                list(an.getSessLogInfoDict()[sessUUID].log.iterLines())
+                an.getDetails(sessUUID)
+            time4 = time.time()
+        print("%-8s %-10.2f %-10.1f %-10.3f" % (options.store, time2 - time1, rss / 1048576.0, \
+            (time4 - time3) * 1000.0 / max(len(queryList), 1)))
+        sys.stdout.flush()
+        return
+
+    lines = genLog(path, options.calls)
+    print("%d行 %.1fMB" % (lines, os.path.getsize(path) / 1048576.0))
+    print("%-8s %-10s %-10s %-10s" % ("存放方式", "分析秒", "常驻MB", "每次查询毫秒"))
+    for store in FsLogAnalyzer.STORE_LIST:
+        subprocess.call([sys.executable, os.path.abspath(__file__), "-d", workDir, "-n", str(options.calls), "-q", str(options.queries), "--store", store, "store"])
+
+def benchExtract(workDir, options):
+    """关键信息提取的吞吐量对比
+    逐条re.search:按照顺序对每条规则调用reMatch(每次查找正则缓存并切片分组)，即规则注册表之前的做法；
+    注册表:每条规则只编译一次，先用固定字符串判断，只对命中的规则执行正则；字节行在命中之后才解码
+    """
+    path = os.path.join(workDir, "freeswitch.log")
+    lines = genLog(path, options.calls)
+    an = FsLogAnalyzer()
+    rules = an.getKeyInfoRules()
+    with open(path, 'rb') as f:
+        rawList = f.readlines()
+    logList = [an.decodeLine(x) for x in rawList]
+    reList = [(rule.regex.pattern, rule.regex.groups, rule.flag) for rule in rules.getRuleList()]
+
+    def reSearch():
+        count = 0
+        for log in logList:
+            for reExpr, expLen, flag in reList:
+                if an.reMatch(reExpr, log, expLen):
+                    count += 1
+                    break
+        return count
+
+    def registry():
+        count = 0
+        for log in logList:
+            if rules.match(log) is not None:
+                count += 1
+        return count
+
+    def registryRaw():
+        count = 0
+        for raw in rawList:
+            if rules.match(raw, an.decodeLine) is not None:
+                count += 1
+        return count
+
+    print("%d行 %.1fMB" % (lines, os.path.getsize(path) / 1048576.0))
+    print("%-14s %-10s %-10s %-10s" % ("提取方式", "耗时秒", "万行/秒", "命中行数"))
+    for name, func in [("逐条re.search", reSearch), ("注册表", registry), ("注册表+字节", registryRaw)]:
+        time1 = time.time()
+        count = func()
+        time2 = time.time()
+        print("%-14s %-10.2f %-10.1f %-10d" % (name, time2 - time1, len(logList) / 10000.0 / (time2 - time1), count))
+
+def benchJobs(workDir, options):
+    """并行收集(-jobs)在1、2、N个进程下的耗时和加速比
+    大文件超过CHUNK_SIZE，切分成多块并行收集；小文件只有一块，收集只有一个进程，之后按UUID分片提取和分析的阶段仍然使用全部进程
+    """
+    bigPath = os.path.join(workDir, "big.log")
+    smallPath = os.path.join(workDir, "small.log")
+    genLog(bigPath, options.calls)
+    genLog(smallPath, max(options.calls // 10, 1), seed=2)
+    if os.path.getsize(bigPath) <= CHUNK_SIZE:
+        print("大文件只有%.1fMB，没有超过分块大小%dMB，请增大呼叫数(-n)" % (os.path.getsize(bigPath) / 1048576.0, CHUNK_SIZE // 1048576))
+
+    jobsList = sorted(set([1, 2, options.jobs]))
+    print("CPU核数：%d" % cpu_count())
+    print("%-8s %-10s %-8s %-10s %-10s %-10s" % ("文件", "文件MB", "进程数", "分析秒", "加速比", "会话数"))
+    for name, path in [("big", bigPath), ("small", smallPath)]:
+        base = None
+        for jobs in jobsList:
+            an = FsLogAnalyzer()
+            with Quiet():
+                an.load(path, False)
+                time1 = time.time()
+                an.run(an.STORE_MEMORY, jobs)
+                time2 = time.time()
+            base = base or (time2 - time1)
+            print("%-8s %-10.1f %-8d %-10.2f %-10.2f %-10d" % (name, os.path.getsize(path) / 1048576.0, jobs, time2 - time1, \
+                base / (time2 - time1), len(an.getSessUUIDList())))
+            an.clear()
+
+def benchClassify(workDir, options):
+    """按列分析(columnar)与逐个会话分析在大量会话下的耗时
+    模拟日志提取一次关键信息后，复制已有的会话(使用新的UUID)直到指定的会话数，两种方式分别重新分析全部会话，结论应当相同
+    按列分析依赖numpy，需要在安装了numpy的环境(一般为python3)中运行
+    """
+    path = os.path.join(workDir, "classify.log")
+    genLog(path, min(options.calls, options.sessions))
+    an = FsLogAnalyzer()
+    with Quiet():
+        an.load(path, False)
+        an.run(an.STORE_MEMORY)
+    ret, msg = an.setClassifyMode(an.CLASSIFY_COLUMNAR)
+    if not ret:
+        print(msg)
+        return
+
+    sessLogInfoDict = an.getSessLogInfoDict()
+    sessList = list(sessLogInfoDict.values())
+    flagList = Session.getFlagList()
+    for i in range(len(sessList), options.sessions):
+        src = sessList[i % len(sessList)]
+        sess = Session(src.log, src.startTime)
+        sess.callNumber = src.callNumber
+        sess.extendKeyInfo(src.getKeyInfoColumns(), flagList)
+        sessLogInfoDict[str(uuid.UUID(int=i))] = sess
+
+    print("%-10s %-10s %-10s %-10s" % ("分析方式", "会话数", "分析秒", "加速比"))
+    resultDict = {}
+    base = None
+    for mode in [an.CLASSIFY_SESSION, an.CLASSIFY_COLUMNAR]:
+        an.setClassifyMode(mode)
+        with Quiet():
+            time1 = time.time()
+            count = an.reanalyze()
+            time2 = time.time()
+        base = base or (time2 - time1)
+        resultDict[mode] = [(k, s.conclusion, s.note) for k, s in sorted(sessLogInfoDict.items())]
+        print("%-10s %-10d %-10.2f %-10.2f" % (mode, count, time2 - time1, base / (time2 - time1)))
+    if resultDict[an.CLASSIFY_SESSION] != resultDict[an.CLASSIFY_COLUMNAR]:
+        print("两种分析方式的结论不一致")
+    an.clear()
+
+def benchEsl(workDir, options):
+    """ESL接入的吞吐量和队列占用，事件由本地的模拟服务端(fakeesl.py)发送，只支持python3
+    不同的队列长度下，分析跟不上时读取协程等待，队列中的记录数不超过队列长度
+    """
+    if sys.version_info[0] == 2:
+        print("ESL接入需要python3")
+        return
+    import asyncio
+    from analyzer import esl
+    from benchesl import ingest
+
+    print("%-10s %-10s %-10s %-12s %-10s" % ("队列长度", "耗时秒", "事件数", "事件/秒", "最多排队"))
+    for queueSize in [100, 1000, esl.QUEUE_SIZE]:
+        an = FsLogAnalyzer()
+        loop = asyncio.new_event_loop()
+        with Quiet():
+            time1 = time.time()
+            stats = loop.run_until_complete(ingest(an, options.calls, queueSize))
+            time2 = time.time()
+        loop.close()
+        print("%-10d %-10.2f %-10d %-12.0f %-10d" % (queueSize, time2 - time1, stats["events"], \
+            stats["events"] / (time2 - time1), stats["maxQueued"]))
+
+BENCH_DICT = {
+    "classify": benchClassify,
+    "esl": benchEsl,
+    "extract": benchExtract,
+    "ingest": benchIngest,
+    "jobs": benchJobs,
+    "load": benchLoad,
+    "store": benchStore,
+}
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [options] " + "|".join(sorted(BENCH_DICT.keys())))
+    parser.add_option("-n", "--calls", dest="calls", type="int", default=20000, help="模拟日志的呼叫数")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=cpu_count(), help="并行测试的最大进程数，默认为CPU核数")
+    parser.add_option("-s", "--sessions", dest="sessions", type="int", default=500000, help="按列分析测试的会话数")
+    parser.add_option("-q", "--queries", dest="queries", type="int", default=500, help="查询的次数")
+    parser.add_option("--store", dest="store", default="", help="子进程使用的存放方式，内部使用")
+    parser.add_option("-d", "--dir", dest="dir", default="", help="工作目录，默认使用临时目录")
+    (options, args) = parser.parse_args()
+    if not args or args[0] not in BENCH_DICT:
+        parser.print_help()
+        sys.exit(1)
+
+    workDir = options.dir or tempfile.mkdtemp(prefix="floga_bench_")
+    try:
+        BENCH_DICT[args[0]](workDir, options)
+    finally:
+        options.dir or shutil.rmtree(workDir, True)
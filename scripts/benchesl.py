@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench.py的ESL接入测试中使用asyncio的部分，只支持python3，bench.py在python2下也需要能够编译
+import asyncio
+
+from analyzer import esl
+from fakeesl import FakeEslServer, genEvents
+
+async def ingest(an, calls, queueSize):
+    """从本地的模拟服务端接收事件并增量分析，直到服务端发送完成
+    参数列表:
+        an:FsLogAnalyzer
+        calls:模拟的呼叫数
+        queueSize:队列长度
+    返回值：
+        EslIngest.getStats()的统计
+    异常：
+        OSError 监听或连接失败
+    """
+    fake = FakeEslServer(genEvents(calls))
+    server = await fake.start("127.0.0.1", 0)
+    f = an.addFollowFile("esl://fake")
+    lineNo = [0]
+
+    def consume(records):
+        an.feedEvents(f, lineNo[0], records)
+        lineNo[0] += len(records)
+
+    client = esl.EslClient("127.0.0.1", server.sockets[0].getsockname()[1])
+    ing = esl.EslIngest(client, esl.EslEventMapper(), consume, queueSize)
+    try:
+        await ing.run()
+    finally:
+        server.close()
+    return ing.getStats()
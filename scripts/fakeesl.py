@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 模拟的FS Event Socket服务端，用于在没有FS的环境中测试ESL接入
+# 用法: python3 fakeesl.py [选项]，然后在Floga中执行 esl fs 127.0.0.1:8021
+import sys
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta
+from urllib.parse import quote
+from optparse import OptionParser
+
+def genCallEvents(rnd, now, kind):
+    """生成一路呼叫的ESL事件，呼叫类型与bench.py的模拟日志相同
+    参数列表:
+        rnd:random.Random
+        now:[当前时间]，生成时向后推进
+        kind:呼叫类型('ok180','ok183','okinv','busy','cancel','partial','inbound')
+    返回值：
+        [{名称:取值}]
+    异常：
+        无
+    """
+    sessUUID = str(uuid.UUID(int=rnd.getrandbits(128)))
+    number = str(6000 + rnd.randint(0, 2000))
+    direction = "inbound" if kind == "inbound" else "outbound"
+    events = []
+
+    def e(name, **headers):
+        now[0] += timedelta(microseconds=rnd.randint(50, 40000))
+        event = {
+            "Event-Name": name,
+            "Event-Date-Local": now[0].strftime("%Y-%m-%d %H:%M:%S"),
+            "Event-Date-Timestamp": str(int((now[0] - datetime(1970, 1, 1)).total_seconds()) * 1000000 + now[0].microsecond),
+            "Unique-ID": sessUUID,
+            "Channel-Name": "sofia/external/%s@10.0.7.152:5080" % number,
+            "Call-Direction": direction,
+            "Caller-Caller-ID-Number": number,
+        }
+        event.update(dict((k.replace("_", "-") if not k.startswith("variable_") else k, v) for k, v in headers.items()))
+        events.append(event)
+
+    def hangup(state, cause, disposition, status=""):
+        extra = {"variable_sip_term_status": status} if status else {}
+        e("CHANNEL_HANGUP", Channel_State=state, Hangup_Cause=cause, variable_sip_hangup_disposition=disposition, **extra)
+        e("CHANNEL_HANGUP_COMPLETE", Channel_State="CS_REPORTING", Hangup_Cause=cause, variable_sip_hangup_disposition=disposition, **extra)
+
+    e("CHANNEL_CREATE", Channel_State="CS_INIT", Caller_Network_Addr="10.0.7.1", \
+        variable_sip_network_ip="10.0.7.1", variable_sip_network_port="5060")
+    e("CHANNEL_STATE", Channel_State="CS_ROUTING")
+    if rnd.random() < 0.2:
+        e("CHANNEL_EXECUTE", Application="transfer", Application_Data="%s1 XML default" % number)
+    e("CHANNEL_STATE", Channel_State="CS_CONSUME_MEDIA")
+    if kind == "partial":
+        return events
+    if kind in ["ok180", "busy", "cancel"]:
+        e("CHANNEL_PROGRESS")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State="DOWN", Channel_Call_State="RINGING")
+    elif kind == "ok183":
+        e("CHANNEL_PROGRESS_MEDIA")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State="DOWN", Channel_Call_State="EARLY")
+
+    if kind in ["ok180", "ok183", "okinv", "inbound"]:
+        e("CHANNEL_ANSWER")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State={"ok180": "RINGING", "ok183": "EARLY"}.get(kind, "DOWN"), Channel_Call_State="ACTIVE")
+        e("CHANNEL_STATE", Channel_State="CS_EXECUTE")
+        hangup("CS_EXECUTE", "NORMAL_CLEARING", "send_bye" if rnd.random() < 0.5 else "recv_bye")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State="ACTIVE", Channel_Call_State="HANGUP")
+    elif kind == "busy":
+        hangup("CS_CONSUME_MEDIA", "USER_BUSY", "recv_refuse", "486")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State="RINGING", Channel_Call_State="HANGUP")
+    elif kind == "cancel":
+        hangup("CS_CONSUME_MEDIA", "ORIGINATOR_CANCEL", "send_cancel")
+        e("CHANNEL_CALLSTATE", Original_Channel_Call_State="RINGING", Channel_Call_State="HANGUP")
+    e("CHANNEL_DESTROY", Channel_State="CS_DESTROY")
+    return events
+
+def genEvents(calls, seed=1, concurrency=50):
+    """生成多路呼叫交错的ESL事件
+    参数列表:
+        calls:呼叫数
+        seed:随机种子
+        concurrency:同时进行的呼叫数
+    返回值：
+        事件的迭代器
+    异常：
+        无
+    """
+    rnd = random.Random(seed)
+    now = [datetime(2016, 3, 21, 17, 41, 14, 701532)]
+    active = []
+    started = 0
+    while started < calls or active:
+        while started < calls and len(active) < concurrency:
+            kind = rnd.choice(["ok180", "ok183", "okinv", "busy", "cancel", "partial", "inbound"])
+            active.append(genCallEvents(rnd, now, kind))
+            started += 1
+        events = rnd.choice(active)
+        yield events.pop(0)
+        if not events:
+            active.remove(events)
+
+def formatEvent(event):
+    body = "".join("%s: %s\n" % (k, quote(v, safe="")) for k, v in event.items()) + "\n"
+    body = body.encode('utf-8')
+    return b"Content-Length: %d\nContent-Type: text/event-plain\n\n" % len(body) + body
+
+class FakeEslServer(object):
+    """模拟的ESL服务端
+    认证和订阅成功后按照指定的速率发送事件，发送完成后发出断开通知并关闭连接。
+    发送前等待写缓冲区排空，客户端不读取时服务端也停止发送，可以观察接入端的背压
+    """
+
+    def __init__(self, events, password="ClueCon", rate=0):
+        """
+        参数列表:
+            events:事件的迭代器
+            password:ESL密码
+            rate:每秒发送的事件数，为0时不限速
+        """
+        self.__events = events
+        self.__password = password
+        self.__rate = rate
+        self.__sent = 0
+
+    def getSent(self):
+        return self.__sent
+
+    async def __reply(self, writer, text):
+        writer.write(("Content-Type: command/reply\nReply-Text: %s\n\n" % text).encode('utf-8'))
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        writer.write(b"Content-Type: auth/request\n\n")
+        await writer.drain()
+        try:
+            while True:
+                cmd = (await reader.readuntil(b"\n\n")).decode('utf-8').strip()
+                if cmd.startswith("auth "):
+                    if cmd[5:] != self.__password:
+                        await self.__reply(writer, "-ERR invalid")
+                        return
+                    await self.__reply(writer, "+OK accepted")
+                elif cmd.startswith("event "):
+                    await self.__reply(writer, "+OK event listener enabled plain")
+                    break
+                else:
+                    await self.__reply(writer, "-ERR command not found")
+
+            loop = asyncio.get_event_loop()
+            start = loop.time()
+            for event in self.__events:
+                writer.write(formatEvent(event))
+                self.__sent += 1
+                if self.__rate and self.__sent % 100 == 0:
+                    delay = start + self.__sent / float(self.__rate) - loop.time()
+                    delay > 0 and await asyncio.sleep(delay)
+                await writer.drain()
+            writer.write(b"Content-Type: text/disconnect-notice\nContent-Length: 0\n\n")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8021):
+        """开始监听
+        参数列表:
+            host:监听地址
+            port:监听端口，为0时由系统分配
+        返回值：
+            asyncio.Server
+        异常：
+            OSError 监听失败
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-n", "--calls", dest="calls", type="int", default=20000, help="模拟的呼叫数")
+    parser.add_option("-r", "--rate", dest="rate", type="int", default=0, help="每秒发送的事件数，0为不限速")
+    parser.add_option("-c", "--concurrency", dest="concurrency", type="int", default=50, help="同时进行的呼叫数")
+    parser.add_option("-p", "--port", dest="port", type="int", default=8021, help="监听端口")
+    parser.add_option("--password", dest="password", default="ClueCon", help="ESL密码")
+    (options, args) = parser.parse_args()
+
+    fake = FakeEslServer(genEvents(options.calls, concurrency=options.concurrency), options.password, options.rate)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(fake.start("127.0.0.1", options.port))
+    print("正在监听 127.0.0.1:%d (Ctrl+C停止)" % options.port)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.close()
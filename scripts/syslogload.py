@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# syslog负载生成：把FS日志按行封装为syslog消息发送，模拟多个节点，用于测试Floga的syslog接收
+# 用法: python syslogload.py [选项]
+import os
+import sys
+import time
+import zlib
+import socket
+import shutil
+import tempfile
+from datetime import datetime
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FORMAT_3164 = "3164"
+FORMAT_5424 = "5424"
+
+def wrapSyslog(host, line, fmt, now):
+    """把一行日志封装为syslog消息
+    参数列表:
+        host:主机名
+        line:日志行(不带换行)
+        fmt:FORMAT_3164或FORMAT_5424
+        now:datetime
+    返回值：
+        消息 bytes
+    异常：
+        无
+    """
+    # PRI为local0.debug
+    if fmt == FORMAT_5424:
+        s = "<135>1 %s %s freeswitch - - - %s" % (now.strftime("%Y-%m-%dT%H:%M:%S.%fZ"), host, line)
+    else:
+        s = "<135>%s %s freeswitch: %s" % (now.strftime("%b %d %H:%M:%S"), host, line)
+    return s.encode('utf-8') if not isinstance(s, bytes) else s
+
+def iterNodeLines(path, nodes):
+    """按行读取日志并分配节点，同一会话的行分给同一个节点，没有UUID的行跟随上一行
+    参数列表:
+        path:日志文件路径
+        nodes:节点数
+    返回值：
+        (主机名, 日志行)的迭代器
+    异常：
+        IOError 读取失败
+    """
+    host = "node1"
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = raw.rstrip(b"\r\n").decode('utf-8', 'replace')
+            if len(line) > 36 and line[36:37] == " " and line[8:9] == "-":
+                host = "node%d" % (zlib.crc32(line[:36].encode('utf-8')) % nodes + 1)
+            yield host, line
+
+def send(options, path):
+    target = (options.host, options.port)
+    if options.tcp:
+        sock = socket.create_connection(target)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    count = 0
+    size = 0
+    time1 = time.time()
+    now = datetime.utcnow()
+    pending = []
+    for host, line in iterNodeLines(path, options.nodes):
+        msg = wrapSyslog(host, line, options.format, now)
+        if options.tcp:
+            # RFC 6587：按长度分帧或按换行分帧
+            pending.append(b"%d " % len(msg) + msg if options.octet else msg + b"\n")
+            if len(pending) >= 100:
+                sock.sendall(b"".join(pending))
+                pending = []
+        else:
+            sock.sendto(msg, target)
+        count += 1
+        size += len(msg)
+        if options.rate and count % 100 == 0:
+            delay = time1 + count / float(options.rate) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        if options.limit and count >= options.limit:
+            break
+    if pending:
+        sock.sendall(b"".join(pending))
+    sock.close()
+    time2 = time.time()
+    print("%-10s %-10s %-10s %-10s" % ("消息数", "MB", "耗时秒", "消息/秒"))
+    print("%-10d %-10.1f %-10.2f %-10.0f" % (count, size / 1048576.0, time2 - time1, count / max(time2 - time1, 1e-6)))
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [options] [日志文件]")
+    parser.add_option("--host", dest="host", default="127.0.0.1", help="syslog接收地址")
+    parser.add_option("-p", "--port", dest="port", type="int", default=514, help="syslog接收端口")
+    parser.add_option("-t", "--tcp", dest="tcp", action="store_true", default=False, help="使用TCP，默认为UDP")
+    parser.add_option("-o", "--octet", dest="octet", action="store_true", default=False, help="TCP按长度分帧(RFC 6587 octet counting)")
+    parser.add_option("-f", "--format", dest="format", default=FORMAT_3164, help="syslog格式，3164或5424")
+    parser.add_option("-N", "--nodes", dest="nodes", type="int", default=3, help="模拟的节点数")
+    parser.add_option("-r", "--rate", dest="rate", type="int", default=0, help="每秒发送的消息数，0为不限速")
+    parser.add_option("-l", "--limit", dest="limit", type="int", default=0, help="最多发送的消息数，0为不限")
+    parser.add_option("-n", "--calls", dest="calls", type="int", default=20000, help="没有指定日志文件时，模拟日志的呼叫数")
+    (options, args) = parser.parse_args()
+    if options.format not in [FORMAT_3164, FORMAT_5424]:
+        parser.print_help()
+        sys.exit(1)
+
+    if args:
+        send(options, args[0])
+    else:
+        from bench import genLog
+        workDir = tempfile.mkdtemp(prefix="floga_syslog_")
+        try:
+            path = os.path.join(workDir, "freeswitch.log")
+            genLog(path, options.calls)
+            send(options, path)
+        finally:
+            shutil.rmtree(workDir, True)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# 被测试的模块按照floga目录下的方式导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'floga'))
+# 测试共用的helper模块与test_*.py在同一目录
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# 测试共用的模拟日志和屏蔽界面输出
+import os
+import sys
+import uuid
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import analyzer.analyzer
+import analyzer.analyzer_fs
+
+def genLines(calls, seed=1, noise=2):
+    """生成模拟的FS DEBUG日志，包含接通、忙、取消、未完成等不同结果的呼叫，以及没有UUID的续行
+    参数列表:
+        calls:呼叫数
+        seed:随机种子
+        noise:每条关键日志之后最多的无关日志行数
+    返回值：
+        [行](不含行尾)
+    异常：
+        无
+    """
+    rnd = random.Random(seed)
+    now = [datetime(2016, 3, 21, 17, 41, 14, 701532)]
+    lines = []
+
+    def ts():
+        now[0] += timedelta(microseconds=rnd.randint(50, 40000))
+        return now[0].strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    for c in range(calls):
+        sessUUID = str(uuid.UUID(int=rnd.getrandbits(128)))
+        number = str(6000 + c)
+        chan = "sofia/external/%s@10.0.7.152:5080" % number
+        kind = ["ok180", "ok183", "busy", "cancel", "partial"][c % 5]
+
+        def w(s):
+            lines.append("%s %s [DEBUG] switch_core_state_machine.c:473 %s" % (sessUUID, ts(), s))
+            for i in range(rnd.randint(0, noise)):
+                lines.append("%s %s [DEBUG] sofia.c:%d (%s) nothing interesting" % (sessUUID, ts(), rnd.randint(1, 9999), chan))
+                if rnd.random() < 0.3:
+                    lines.append("   Via: SIP/2.0/UDP 10.0.7.152:5080;branch=z9hG4bK%d" % rnd.randint(1, 1000000))
+
+        w("New Channel %s [%s]" % (chan, sessUUID))
+        w("(%s) State Change CS_NEW -> CS_INIT" % chan)
+        w("(%s) State Change CS_INIT -> CS_ROUTING" % chan)
+        if c % 4 == 1:
+            # 号码变换，会话的号码取变换后的号码
+            w("Dialplan: %s Action transfer(%s XML default)" % (chan, "8" + number))
+        w("(%s) State Change CS_ROUTING -> CS_CONSUME_MEDIA" % chan)
+        if kind == "partial":
+            continue
+        w("Channel %s entering state [calling][0]" % chan)
+        if kind == "ok183":
+            w("Channel %s entering state [proceeding][183]" % chan)
+            w("(%s) Callstate Change DOWN -> EARLY" % chan)
+        else:
+            w("Channel %s entering state [proceeding][180]" % chan)
+            w("(%s) Callstate Change DOWN -> RINGING" % chan)
+        if kind in ["ok180", "ok183"]:
+            w("Channel %s entering state [completing][200]" % chan)
+            w("Channel %s entering state [ready][200]" % chan)
+            w("(%s) Callstate Change %s -> ACTIVE" % (chan, "EARLY" if kind == "ok183" else "RINGING"))
+            w("Hangup %s [CS_EXECUTE] [NORMAL_CLEARING]" % chan)
+            w("(%s) Callstate Change ACTIVE -> HANGUP" % chan)
+        elif kind == "busy":
+            w("Channel %s entering state [terminated][486]" % chan)
+            w("Hangup %s [CS_CONSUME_MEDIA] [USER_BUSY]" % chan)
+            w("(%s) Callstate Change RINGING -> HANGUP" % chan)
+        else:
+            w("Sending CANCEL to %s" % chan)
+            w("Hangup %s [CS_CONSUME_MEDIA] [ORIGINATOR_CANCEL]" % chan)
+            w("(%s) Callstate Change RINGING -> HANGUP" % chan)
+    return lines
+
+def writeLog(path, lines, newline="\n"):
+    with open(path, 'wb') as f:
+        f.write("".join(x + newline for x in lines).encode('utf-8'))
+    return path
+
+def getResults(an):
+    """分析结果，用于比较不同加载方式或分析方式的结果
+    参数列表:
+        an:已经分析完成的FsLogAnalyzer
+    返回值：
+        {会话UUID:(号码, [关键信息], 结论, 备注, [(文件索引, 行数, 日志)])}
+    异常：
+        无
+    """
+    res = {}
+    for sessUUID in an.getSessUUIDList():
+        result = an.getResultDict(sessUUID)[1]
+        res[sessUUID] = (an.getCallNumber(sessUUID)[1], an.getkeyInfoList(sessUUID)[1], result["conclusion"], result["note"], \
+            list(an.getSessInfo(sessUUID, an.SESS_LOG_DK)[1].iterLines()))
+    return res
+
+class QuietTestCase(unittest.TestCase):
+    """屏蔽分析器界面输出(PRINT和进度条)的测试"""
+
+    def setUp(self):
+        self.printList = [(m, m.PRINT) for m in [analyzer.analyzer, analyzer.analyzer_fs]]
+        for m, p in self.printList:
+            m.PRINT = lambda s, end='\n', color='white': None
+
+    def tearDown(self):
+        for m, p in self.printList:
+            m.PRINT = p
+
+    def quiet(self, func, *args, **kwargs):
+        # 调用时屏蔽标准输出
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
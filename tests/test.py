@@ -1,4 +1,14 @@
+# -*- coding: utf-8 -*-
+# 运行tests目录下全部的test_*.py
 import os
+import sys
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_DIR, os.pardir, 'floga'))
 
 if __name__ == "__main__":
-	print("OK")
+	suite = unittest.defaultTestLoader.discover(TEST_DIR, pattern="test_*.py", top_level_dir=TEST_DIR)
+	result = unittest.TextTestRunner(verbosity=1).run(suite)
+	print("OK" if result.wasSuccessful() else "FAILED")
+	sys.exit(0 if result.wasSuccessful() else 1)
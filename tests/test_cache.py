@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import analyzer.analyzer_fs
+from analyzer.cache import AnalysisCache
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, getResults, QuietTestCase
+
+class AnalysisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.cacheDir = os.path.join(self.dir, "cache")
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), genLines(5))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def testKey(self):
+        cache = AnalysisCache(self.cacheDir)
+        key = cache.getKey(self.path, "replace|memory")
+        self.assertEqual(cache.getKey(self.path, "replace|memory"), key)
+        self.assertNotEqual(cache.getKey(self.path, "ignore|memory"), key)
+        self.assertEqual(cache.getKey(os.path.join(self.dir, "missing.log")), "")
+        # 内容变化后key不同
+        with open(self.path, 'ab') as f:
+            f.write(b"x\n")
+        self.assertNotEqual(cache.getKey(self.path, "replace|memory"), key)
+
+    def testSaveLoad(self):
+        cache = AnalysisCache(self.cacheDir)
+        key = cache.getKey(self.path)
+        self.assertEqual(cache.load(key), None)
+        self.assertTrue(cache.save(key, {"a": [1, 2]}))
+        self.assertEqual(cache.load(key), {"a": [1, 2]})
+        self.assertFalse(cache.save("", {}))
+        self.assertEqual(cache.load(""), None)
+        # 损坏的缓存视为未命中
+        with open(os.path.join(self.cacheDir, key + AnalysisCache.CACHE_POSTFIX), 'wb') as f:
+            f.write(b"broken")
+        self.assertEqual(cache.load(key), None)
+
+    def testEvict(self):
+        cache = AnalysisCache(self.cacheDir)
+        data = os.urandom(4096)
+        for i, key in enumerate(["a", "b", "c"]):
+            cache.save(key, data)
+            os.utime(os.path.join(self.cacheDir, key + AnalysisCache.CACHE_POSTFIX), (1000 + i, 1000 + i))
+        # 读取时更新使用时间，淘汰最久没有使用的
+        self.assertEqual(cache.load("a"), data)
+        size = os.path.getsize(os.path.join(self.cacheDir, "a" + AnalysisCache.CACHE_POSTFIX))
+        cache = AnalysisCache(self.cacheDir, size * 2 + size // 2)
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(sorted(os.listdir(self.cacheDir)), ["a.cache", "c.cache"])
+
+class CachedAnalysisTest(QuietTestCase):
+    """命中缓存时的分析结果与不使用缓存时一致，文件或加载选项变化后不命中"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.messageList = []
+        analyzer.analyzer_fs.PRINT = lambda s, end='\n', color='white': self.messageList.append(s)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.cacheDir = os.path.join(self.dir, "cache")
+        self.lines = genLines(50)
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), self.lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def analyze(self, ingest=FsLogAnalyzer.INGEST_MEMORY, errors="replace", cache=True):
+        an = FsLogAnalyzer()
+        an.setCache(AnalysisCache(self.cacheDir) if cache else None)
+        an.setDecodeErrors(errors)
+        self.messageList = []
+        self.quiet(an.load, self.path, False, ingest)
+        self.quiet(an.run, an.STORE_MEMORY)
+        res = getResults(an)
+        an.clear()
+        hits = [s for s in self.messageList if s.startswith("分析结果缓存")]
+        return res, hits[0] if hits else None
+
+    def testHit(self):
+        for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+            base, msg = self.analyze(ingest, cache=False)
+            self.assertEqual(msg, None)
+            self.assertEqual(self.analyze(ingest), (base, "分析结果缓存：命中0个文件，新保存1个文件"))
+            self.assertEqual(self.analyze(ingest), (base, "分析结果缓存：命中1个文件，新保存0个文件"))
+
+    def testInvalidate(self):
+        self.analyze()
+        # 解码出错时的处理方式不同，不使用同一份缓存
+        self.assertEqual(self.analyze(errors="ignore")[1], "分析结果缓存：命中0个文件，新保存1个文件")
+        # 文件变化后重新分析
+        writeLog(self.path, self.lines + genLines(5, seed=2))
+        res, msg = self.analyze()
+        self.assertEqual(msg, "分析结果缓存：命中0个文件，新保存1个文件")
+        self.assertEqual(len(res), 55)
+        self.assertEqual(res, self.analyze(cache=False)[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from analyzer import columnar
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.callflow import CallFlowClassifier, loadRuleFile, dumpRuleFile, yaml, \
+    RULE_INIT, RULE_FACTS, RULE_CODES, RULE_TRANSITIONS, RULE_WARNING_STATES, RULE_NORMAL_CAUSES
+from helper import genLines, writeLog, QuietTestCase
+
+class LoadRuleFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+        return path
+
+    def writeJson(self, data):
+        return self.write("rules.json", json.dumps(data))
+
+    def testRoundTrip(self):
+        # 内置规则导出后重新读取，再次导出的内容不变
+        path = os.path.join(self.dir, "builtin.json")
+        self.assertEqual(FsLogAnalyzer().dumpCallFlowRules(path), (True, ""))
+        rules = loadRuleFile(path)
+        self.assertEqual(sorted(rules.keys()), sorted([RULE_INIT, RULE_FACTS, RULE_CODES, RULE_TRANSITIONS, \
+            RULE_WARNING_STATES, RULE_NORMAL_CAUSES]))
+        path2 = os.path.join(self.dir, "again.json")
+        dumpRuleFile(path2, rules)
+        self.assertEqual(loadRuleFile(path2), rules)
+        CallFlowClassifier(rules[RULE_FACTS], rules[RULE_CODES], rules[RULE_TRANSITIONS], rules[RULE_INIT])
+
+    def testDefaults(self):
+        rules = loadRuleFile(self.writeJson({
+            "facts": [{"name": "answered", "flag": "chan proc"}],
+            "transitions": [{"from": "A", "to": "B"}, {"from": "B", "to": "C", "when": [["answered"]], "note": "x", \
+                "noteIf": ["answered", "+", "-"]}],
+        }))
+        # 只包含文件中有的部分
+        self.assertEqual(sorted(rules.keys()), [RULE_FACTS, RULE_TRANSITIONS])
+        self.assertEqual(rules[RULE_FACTS], [("answered", "chan proc", "", "", True)])
+        self.assertEqual(rules[RULE_TRANSITIONS], [("A", "B", [()], ""), ("B", "C", [("answered",)], ("x", "answered", "+", "-"))])
+
+    def testInvalid(self):
+        for text in ['{"init": ', '[1, 2]', '{"facts": [{"name": "a"}]}', '{"facts": [1]}', '{"codes": [{"name": "a", "flag": "b"}]}']:
+            self.assertRaises(ValueError, loadRuleFile, self.write("bad.json", text))
+        self.assertRaises(IOError, loadRuleFile, os.path.join(self.dir, "missing.json"))
+
+    def testYaml(self):
+        path = self.write("rules.yaml", "init: A\nwarningStates: [A]\n")
+        if yaml is None:
+            self.assertRaises(ValueError, loadRuleFile, path)
+        else:
+            self.assertEqual(loadRuleFile(path), {RULE_INIT: "A", RULE_WARNING_STATES: ["A"]})
+            self.assertRaises(ValueError, loadRuleFile, self.write("bad.yaml", "init: [A\n"))
+
+    def testUndefinedFact(self):
+        # 规则文件的格式正确，但迁移使用了未定义的事实，设置时失败并保留原来的规则
+        an = FsLogAnalyzer()
+        path = self.writeJson({"transitions": [{"from": "A", "to": "B", "when": [["nothing"]]}]})
+        ok, msg = an.setCallFlowRules(path)
+        self.assertFalse(ok)
+        self.assertTrue("nothing" in msg)
+        self.assertEqual(an.getCallFlowRulePath(), "")
+        self.assertRaises(ValueError, CallFlowClassifier, [], [("bad", "chan proc", ["4(X"])], [], "A")
+
+class ClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        factList = [("new", "core sm", "CS_NEW", "", True), ("ring", "chan proc", "", "180", True), \
+            ("answer", "chan proc", "completing", "200", True), ("hangup", "hangup", "", "", False)]
+        codeRuleList = [("failCode", "chan proc", ["4XX", "5XX"])]
+        transitionList = [("INIT", "CALLING", [("new",)], "[CALLING"), \
+            ("CALLING", "TALKING", [("ring", "answer"), ("answer", "hangup")], (" -> TALKING", "hangup", "(H)", "")), \
+            ("CALLING", "RINGING", [("ring",)], " -> RINGING"), \
+            ("TALKING", "END", [()], "]")]
+        self.classifier = CallFlowClassifier(factList, codeRuleList, transitionList, "INIT")
+
+    def testWalk(self):
+        walk = self.classifier.walk
+        self.assertEqual(walk(set()), ("INIT", ""))
+        self.assertEqual(walk(set(["ring"])), ("INIT", ""))
+        self.assertEqual(walk(set(["new", "ring"])), ("RINGING", "[CALLING -> RINGING"))
+        # 同一个状态按照表中的顺序检查，任意一个条件满足即迁移，空条件总是满足
+        self.assertEqual(walk(set(["new", "ring", "answer"])), ("END", "[CALLING -> TALKING]"))
+        self.assertEqual(walk(set(["new", "answer", "hangup"])), ("END", "[CALLING -> TALKING(H)]"))
+        self.assertEqual([x[0] for x in self.classifier.getTransitionDict()["CALLING"]], ["TALKING", "RINGING"])
+
+    def testFeed(self):
+        flow = self.classifier.newState()
+        self.assertFalse(flow.feed("other", ("x",)))
+        self.assertTrue(flow.feed("core sm", (" CS_NEW ", "CS_INIT")))
+        self.assertFalse(flow.feed("core sm", ("CS_NEW", "CS_INIT")))
+        self.assertEqual(flow.classify(), ("CALLING", "[CALLING"))
+        # 第二个结果去掉首尾空白后比较，状态码规则匹配原来的第二个结果
+        self.assertTrue(flow.feed("chan proc", ("proceeding", " 180 ")))
+        self.assertEqual(flow.classify(), ("RINGING", "[CALLING -> RINGING"))
+        self.assertTrue(flow.feed("chan proc", ("terminated", "486")))
+        self.assertTrue(flow.feed("chan proc", ("terminated", "503")))
+        self.assertTrue(flow.feed("chan proc", ("completing", "200")))
+        self.assertEqual(flow.classify(), ("END", "[CALLING -> TALKING]"))
+        self.assertEqual(flow.getCount(), 7)
+        self.assertEqual(flow.getFirst("chan proc"), ("proceeding", " 180 "))
+        self.assertEqual(flow.getFirst("hangup"), False)
+        # 不记入分析详情的事实不出现，状态码规则的结果按照模糊状态码的顺序
+        self.assertEqual(flow.getDetails(), {"new": True, "ring": True, "answer": True, \
+            "failCode": [("terminated", "486"), ("terminated", "503")]})
+
+class BuiltinRuleTest(QuietTestCase):
+    """内置规则按照会话过程得出的结论"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def testConclusion(self):
+        an = FsLogAnalyzer()
+        self.quiet(an.load, writeLog(os.path.join(self.dir, "fs.log"), genLines(20)), False)
+        self.quiet(an.run, an.STORE_MEMORY)
+        # 模拟日志中第c个呼叫的号码为6000+c(号码变换后前面加8)，结果按照c%5依次为接通、接通、忙、取消、未完成
+        expectList = [("OK", "TALKING"), ("OK", "TALKING"), ("ERROR", "USER_BUSY}(recv 486)]"), \
+            ("ERROR", "ORIGINATOR_CANCEL}]"), ("WARNING", "[NOT COMPLETE]")]
+        res = {}
+        for sessUUID, sess in an.getSessLogInfoDict().items():
+            conclusion, text = expectList[(int(sess.callNumber[-4:]) - 6000) % 5]
+            self.assertEqual(sess.conclusion, conclusion, sess.note)
+            self.assertTrue(text in sess.note, sess.note)
+            res[sessUUID] = (sess.conclusion, sess.note, sess.getDetails())
+        self.assertEqual(len(res), 20)
+        if columnar.isAvailable():
+            an.setClassifyMode(an.CLASSIFY_COLUMNAR)
+            self.quiet(an.reanalyze)
+            self.assertEqual(dict((k, (s.conclusion, s.note, s.getDetails())) for k, s in an.getSessLogInfoDict().items()), res)
+        an.clear()
+
+class CodeRuleTest(QuietTestCase):
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def testSingleResultFlag(self):
+        # 状态码规则用于只有一个提取结果的匹配标志时不匹配，两种分析方式的结果相同
+        path = os.path.join(self.dir, "rules.json")
+        with open(path, 'w') as f:
+            json.dump({"codes": [{"name": "cancelCode", "flag": "cancel", "codes": ["XXX"]}, \
+                {"name": "busyCode", "flag": "chan proc", "codes": ["486"]}]}, f)
+        an = FsLogAnalyzer()
+        self.assertEqual(an.setCallFlowRules(path), (True, ""))
+        self.quiet(an.load, writeLog(os.path.join(self.dir, "fs.log"), genLines(20)), False)
+        self.quiet(an.run, an.STORE_MEMORY)
+        res = dict((k, (s.conclusion, s.note, s.getDetails())) for k, s in an.getSessLogInfoDict().items())
+        self.assertEqual(set(len(x[2]["busyCode"]) for x in res.values()), set([0, 1]))
+        self.assertEqual(set(len(x[2]["cancelCode"]) for x in res.values()), set([0]))
+        if columnar.isAvailable():
+            an.setClassifyMode(an.CLASSIFY_COLUMNAR)
+            self.quiet(an.reanalyze)
+            self.assertEqual(dict((k, (s.conclusion, s.note, s.getDetails())) for k, s in an.getSessLogInfoDict().items()), res)
+        an.clear()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.logtime import LogTimeParser
+from helper import genLines, writeLog, QuietTestCase
+
+UUID_A = "4541eb63-e5b0-49f0-8d2c-31e06078013f"
+UUID_B = "cd613e30-d8f1-6adf-91b7-584a2265b1f5"
+CHAN = "sofia/external/6010@10.0.7.152:5080"
+
+LINE_LIST = [
+    "%s 2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:473 New Channel %s [%s]" % (UUID_A, CHAN, UUID_A),
+    "%s 2016-03-21 17:41:14.702000 [DEBUG] switch_core_state_machine.c:473 (%s) State Change CS_NEW -> CS_INIT" % (UUID_A, CHAN),
+    "   Via: SIP/2.0/UDP 10.0.7.152:5080;branch=z9hG4bK1",
+    "%s 2016-03-21 17:41:14.703000 [DEBUG] switch_core_state_machine.c:473 New Channel sofia/external/6020@10.0.7.152:5080 [%s]" % (UUID_B, UUID_B),
+    "%s 2016-03-21 17:41:14.704000 [DEBUG] mod_dialplan_xml.c:637 Dialplan: %s Action transfer(8010 XML default)" % (UUID_A, CHAN),
+    "%s 2016-03-21 17:41:14.705000 [INFO] mod_dialplan_xml.c:637 Processing <6010>->9010 in context default" % UUID_A,
+    "%s 2016-03-21 17:41:14.706000 [DEBUG] sofia.c:5842 Channel %s entering state [calling][0]" % (UUID_A, CHAN),
+    "%s 2016-03-21 17:41:14.707000 [NOTICE] switch_channel.c:3920 Hangup %s [CS_EXECUTE] [NORMAL_CLEARING]" % (UUID_A, CHAN),
+]
+
+class CollectTest(QuietTestCase):
+    """收集会话日志时同时提取关键信息和号码"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def analyze(self, path, ingest=FsLogAnalyzer.INGEST_MEMORY):
+        an = FsLogAnalyzer()
+        self.quiet(an.load, path, False, ingest)
+        self.quiet(an.run, an.STORE_MEMORY)
+        return an
+
+    def testCollect(self):
+        an = self.analyze(writeLog(os.path.join(self.dir, "fs.log"), LINE_LIST))
+        self.assertEqual(sorted(an.getSessUUIDList()), sorted([UUID_A, UUID_B]))
+        self.assertEqual([x[:2] for x in an.getSessInfo(UUID_A, an.SESS_LOG_DK)[1].iterLines()], [(0, 0), (0, 1), (0, 4), (0, 5), (0, 6), (0, 7)])
+        self.assertEqual(list(an.getSessInfo(UUID_B, an.SESS_LOG_DK)[1].iterLines()), [(0, 3, LINE_LIST[3][37:])])
+        # 没有UUID的行被忽略
+        self.assertEqual(sum(sum(x.values()) for x in an.getIgnoreCounts().values()), 1)
+        parser = LogTimeParser()
+        self.assertEqual(an.getkeyInfoList(UUID_A)[1], [
+            (0, 1, "core sm", ("CS_NEW", "CS_INIT"), parser.parse(LINE_LIST[1][37:])),
+            (0, 6, "chan proc", ("calling", "0"), parser.parse(LINE_LIST[6][37:])),
+            (0, 7, "hangup_reason", ("CS_EXECUTE", "NORMAL_CLEARING"), parser.parse(LINE_LIST[7][37:])),
+        ])
+        # 号码变换之后停止查找，之后的" in context"不再改变号码
+        self.assertEqual(an.getCallNumber(UUID_A)[1], "8010")
+        self.assertEqual(an.getCallNumber(UUID_B)[1], "6020")
+        self.assertEqual(an.getSessLogInfoDict()[UUID_A].startTime, parser.parse(LINE_LIST[0][37:]))
+        an.clear()
+
+    def testSinglePass(self):
+        # 一次遍历提取的关键信息与从会话日志中逐行重新提取的相同
+        for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_BYTES]:
+            an = self.analyze(writeLog(os.path.join(self.dir, "gen.log"), genLines(50)), ingest)
+            parser = LogTimeParser()
+            rules = an.getKeyInfoRules()
+            for sessUUID in an.getSessUUIDList():
+                keyInfoList = []
+                for f, line, log in an.getSessInfo(sessUUID, an.SESS_LOG_DK)[1].iterLines():
+                    res = rules.match(log)
+                    if res:
+                        keyInfoList.append((f, line, res[0], res[1], parser.parse(log)))
+                self.assertEqual(an.getkeyInfoList(sessUUID)[1], keyInfoList, ingest)
+            an.clear()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from analyzer import columnar
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, QuietTestCase
+
+@unittest.skipIf(not columnar.isAvailable(), "按列分析需要numpy")
+class ColumnarTest(QuietTestCase):
+    """按列分析与逐个会话分析的结论、备注和分析详情一致"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), genLines(200))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def classify(self, an, mode):
+        self.assertEqual(an.setClassifyMode(mode), (True, ""))
+        self.assertEqual(self.quiet(an.reanalyze), 200)
+        return dict((k, (s.conclusion, s.note, s.getDetails())) for k, s in an.getSessLogInfoDict().items())
+
+    def testEqualsSession(self):
+        an = FsLogAnalyzer()
+        self.quiet(an.load, self.path, False)
+        self.quiet(an.run, an.STORE_MEMORY)
+        session = self.classify(an, an.CLASSIFY_SESSION)
+        self.assertEqual(self.classify(an, an.CLASSIFY_COLUMNAR), session)
+        # 模拟日志包含不同结论的呼叫
+        self.assertEqual(set(x[0] for x in session.values()), set(["OK", "ERROR", "WARNING"]))
+        an.clear()
+
+    def testEmpty(self):
+        an = FsLogAnalyzer()
+        an.setClassifyMode(an.CLASSIFY_COLUMNAR)
+        self.quiet(an.load, writeLog(os.path.join(self.dir, "empty.log"), []), False)
+        self.quiet(an.run, an.STORE_MEMORY)
+        self.assertEqual(an.getSessLogInfoDict(), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import bz2
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from analyzer.compress import getCompression, openLogFile, normalizeNewline, lzma, zstandard, \
+    COMPRESS_NONE, COMPRESS_GZIP, COMPRESS_BZ2, COMPRESS_XZ, COMPRESS_ZSTD
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, getResults, QuietTestCase
+
+class CompressTest(QuietTestCase):
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), genLines(30))
+        with open(self.path, 'rb') as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def compress(self, name, opener, data=None):
+        # 扩展名与压缩格式无关，按照文件头识别
+        path = os.path.join(self.dir, name)
+        f = opener(path, 'wb')
+        f.write(self.data if data is None else data)
+        f.close()
+        return path
+
+    def getCompressedList(self):
+        pathList = [(self.compress("gz.log", gzip.open), COMPRESS_GZIP), (self.compress("bz2.log", bz2.BZ2File), COMPRESS_BZ2)]
+        if lzma is not None:
+            pathList.append((self.compress("xz.log", lzma.LZMAFile), COMPRESS_XZ))
+        if zstandard is not None:
+            path = os.path.join(self.dir, "zst.log")
+            with open(path, 'wb') as f:
+                f.write(zstandard.ZstdCompressor().compress(self.data))
+            pathList.append((path, COMPRESS_ZSTD))
+        return pathList
+
+    def testDetect(self):
+        self.assertEqual(getCompression(self.path), COMPRESS_NONE)
+        self.assertEqual(getCompression(writeLog(os.path.join(self.dir, "empty.gz"), [])), COMPRESS_NONE)
+        for path, compression in self.getCompressedList():
+            self.assertEqual(getCompression(path), compression)
+            with openLogFile(path, binary=True) as f:
+                self.assertEqual(f.read(), self.data, compression)
+            with openLogFile(path) as f:
+                self.assertEqual("".join(f.readlines()), self.data.decode('utf-8'), compression)
+
+    def testGzipMembers(self):
+        # 多个gzip成员拼接时连续解压
+        path = self.compress("members.gz", gzip.open, self.data[:1000])
+        with open(path, 'ab') as f:
+            with open(self.compress("tail.gz", gzip.open, self.data[1000:]), 'rb') as tail:
+                f.write(tail.read())
+        with openLogFile(path, binary=True) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def testNormalizeNewline(self):
+        self.assertEqual(normalizeNewline(b"a\r\n"), b"a\n")
+        self.assertEqual(normalizeNewline(u"a\r\n"), u"a\n")
+        self.assertEqual(normalizeNewline(b"a\rb\n"), b"a\rb\n")
+        self.assertEqual(normalizeNewline(b"a"), b"a")
+
+    def testAnalyze(self):
+        # 压缩文件的分析结果与未压缩的文件一致，无法映射的压缩文件按照流式处理
+        def analyze(path, ingest):
+            an = FsLogAnalyzer()
+            self.quiet(an.load, path, False, ingest)
+            self.quiet(an.run, an.STORE_SESSION)
+            res = (an.getIngest(0), getResults(an))
+            an.clear()
+            return res
+
+        plain = analyze(self.path, FsLogAnalyzer.INGEST_MEMORY)[1]
+        for path, compression in self.getCompressedList():
+            for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+                ret, res = analyze(path, ingest)
+                self.assertEqual(ret, FsLogAnalyzer.INGEST_STREAM if ingest == FsLogAnalyzer.INGEST_MMAP else ingest)
+                self.assertEqual(res, plain, (compression, ingest))
+
+if __name__ == "__main__":
+    unittest.main()
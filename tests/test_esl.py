@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import sys
+import unittest
+
+PY2 = sys.version_info[0] == 2
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+if PY2:
+    EslEventMapper = None # ESL接入基于asyncio，只支持python3
+else:
+    from analyzer.esl import EslEventMapper
+
+UUID = "4541eb63-e5b0-49f0-8d2c-31e06078013f"
+
+def event(name, **headers):
+    headers.update({"Event-Name": name, "Unique-ID": UUID, "Event-Date-Local": "2016-03-21 17:41:14", \
+        "Event-Date-Timestamp": "1458553274701532"})
+    return dict((k.replace("_", "-") if not k.startswith("variable_") else k, v) for k, v in headers.items())
+
+@unittest.skipIf(PY2, "ESL接入需要python3")
+class EslEventMapperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = EslEventMapper()
+
+    def testCreateInbound(self):
+        sessUUID, log, keyInfoList, hits = self.mapper.map(event("CHANNEL_CREATE", Channel_State="CS_INIT", \
+            Channel_Name="sofia/external/6010@10.0.7.152:5080", variable_sip_network_ip="10.0.7.152", variable_sip_network_port="5080"))
+        self.assertEqual(sessUUID, UUID)
+        self.assertTrue(log.startswith("2016-03-21 17:41:14.701532 [ESL] CHANNEL_CREATE"))
+        self.assertEqual(keyInfoList, [(FsLogAnalyzer.SIGN_FLAG_CS, ("CS_NEW", "CS_INIT")), \
+            (FsLogAnalyzer.SIGN_FLAG_R_INVITE, ("10.0.7.152:5080",))])
+        self.assertEqual(hits, [("6010", False)])
+        self.assertEqual(self.mapper.getSessCount(), 1)
+
+    def testStateUsesPreviousState(self):
+        self.mapper.map(event("CHANNEL_CREATE", Channel_State="CS_INIT", Call_Direction="outbound"))
+        keyInfoList = self.mapper.map(event("CHANNEL_STATE", Channel_State="CS_ROUTING"))[2]
+        self.assertEqual(keyInfoList, [(FsLogAnalyzer.SIGN_FLAG_CS, ("CS_INIT", "CS_ROUTING"))])
+        # 状态没有变化时不产生关键信息
+        self.assertEqual(self.mapper.map(event("CHANNEL_STATE", Channel_State="CS_ROUTING"))[2], [])
+
+    def testIgnoredEvents(self):
+        self.assertIsNone(self.mapper.map({"Event-Name": "CHANNEL_STATE"}))
+        self.assertIsNone(self.mapper.map(event("CHANNEL_EXECUTE", Application="answer")))
+
+    def testTransferStopsCallNumber(self):
+        sessUUID, log, keyInfoList, hits = self.mapper.map(event("CHANNEL_EXECUTE", Application="transfer", \
+            Application_Data="6020 XML default"))
+        self.assertEqual(keyInfoList, [])
+        self.assertEqual(hits, [("6020", True)])
+
+    def testHangupOnce(self):
+        self.mapper.map(event("CHANNEL_CREATE", Channel_State="CS_EXECUTE", Call_Direction="outbound"))
+        keyInfoList = self.mapper.map(event("CHANNEL_HANGUP", Call_Direction="outbound", Hangup_Cause="USER_BUSY", \
+            variable_sip_term_status="486", variable_sip_hangup_disposition="recv_bye"))[2]
+        self.assertEqual(keyInfoList, [(FsLogAnalyzer.SIGN_FLAG_CHAN, ("terminated", "486")), \
+            (FsLogAnalyzer.SIGN_FLAG_R_BYE, ("CS_EXECUTE", "USER_BUSY"))])
+        self.assertIsNone(self.mapper.map(event("CHANNEL_HANGUP_COMPLETE", Hangup_Cause="USER_BUSY")))
+
+    def testDestroyResetsSession(self):
+        self.mapper.map(event("CHANNEL_CREATE", Channel_State="CS_INIT"))
+        self.assertIsNone(self.mapper.map(event("CHANNEL_DESTROY")))
+        self.assertEqual(self.mapper.getSessCount(), 0)
+        keyInfoList = self.mapper.map(event("CHANNEL_CREATE", Channel_State="CS_INIT", Call_Direction="outbound"))[2]
+        self.assertEqual(keyInfoList[0], (FsLogAnalyzer.SIGN_FLAG_CS, ("CS_NEW", "CS_INIT")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from analyzer.follow import LogFollower
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, QuietTestCase
+
+UUID = "4541eb63-e5b0-49f0-8d2c-31e06078013f"
+
+class LogFollowerTest(QuietTestCase):
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = os.path.join(self.dir, "live.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def append(self, data):
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def testSplitAndDecode(self):
+        an = FsLogAnalyzer()
+        an.setDecodeErrors("ignore")
+        # \r\n行尾、行中单独的\r、无法解码的字节，以及不完整的最后一行
+        self.append(b"a\r\nb\rc\nd\xff\ne")
+        follower = LogFollower(self.path, False, an.decodeLine)
+        # python2下不解码
+        self.assertEqual(follower.poll(), [(True, 0, []), (False, 0, ["a\n", "b\rc\n", b"d\xff\n" if sys.version_info[0] == 2 else "d\n"])])
+        self.append(b"\r\nf\n")
+        self.assertEqual(follower.poll(), [(False, 3, ["e\n", "f\n"])])
+        self.assertEqual(follower.poll(), [])
+        follower.close()
+
+        # 从末尾开始跟踪时，行数与文件一致
+        follower = LogFollower(self.path, True, an.decodeLine)
+        self.assertEqual(follower.poll(), [(True, 5, [])])
+        self.append(b"g\n")
+        self.assertEqual(follower.poll(), [(False, 5, ["g\n"])])
+        follower.close()
+
+    def testRotateAndTruncate(self):
+        self.append(b"a\nb\n")
+        follower = LogFollower(self.path, False)
+        self.assertEqual(follower.poll()[1], (False, 0, ["a\n", "b\n"]))
+        # 截断后从头读取
+        with open(self.path, 'wb') as f:
+            f.write(b"c\n")
+        self.assertEqual(follower.poll(), [(True, 0, ["c\n"])])
+        # 轮转：旧文件改名，重新创建
+        self.append(b"d\n")
+        os.rename(self.path, self.path + ".1")
+        self.append(b"e\n")
+        self.assertEqual(follower.poll(), [(False, 1, ["d\n"]), (True, 0, ["e\n"])])
+        follower.close()
+
+    def testFeedCrlf(self):
+        # 增量分析\r\n行尾的日志，会话日志和关键信息中没有\r
+        self.append("".join(x + "\r\n" for x in genLines(5)).encode('utf-8'))
+        an = FsLogAnalyzer()
+        follower = LogFollower(self.path, False, an.decodeLine)
+        f = -1
+        sessUUIDList = []
+        for newFile, lineNo, lines in follower.poll():
+            if newFile:
+                f = an.addFollowFile(self.path)
+            sessUUIDList += an.feedLines(f, lineNo, lines)
+        follower.close()
+        self.assertEqual(len(sessUUIDList), 5)
+        for sessUUID in sessUUIDList:
+            self.assertFalse("\r" in repr(an.getkeyInfoList(sessUUID)[1]))
+            self.assertFalse([x for x in an.getSessInfo(sessUUID, an.SESS_LOG_DK)[1].iterLines() if "\r" in x[2]])
+        self.assertEqual(set(an.getResultDict(x)[1]["conclusion"] for x in sessUUIDList), set(["OK", "ERROR", "WARNING"]))
+        an.clear()
+
+if __name__ == "__main__":
+    unittest.main()
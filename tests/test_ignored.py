@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.ignored import IgnoredLines, classify, canRestore, \
+    IGNORE_COUNT, IGNORE_SAMPLE, IGNORE_ALL, CATEGORY_BLANK, CATEGORY_SIP, CATEGORY_LOG, CATEGORY_OTHER
+from helper import genLines, writeLog, QuietTestCase
+
+class IgnoredLinesTest(unittest.TestCase):
+
+    def testClassify(self):
+        for line, category in [("\n", CATEGORY_BLANK), (b"  \r\n", CATEGORY_BLANK), \
+            ("   Via: SIP/2.0/UDP 10.0.7.152:5080\n", CATEGORY_SIP), (b"recv 1024 bytes from udp\n", CATEGORY_SIP), \
+            ("send 512 bytes to udp\n", CATEGORY_SIP), ("2016-03-21 17:41:14.701532 [INFO] loading\n", CATEGORY_LOG), \
+            (b"2016-03-21 17:41:14.701532 [INFO] loading\n", CATEGORY_LOG), ("freeswitch@x> status\n", CATEGORY_OTHER)]:
+            self.assertEqual(classify(line), category, line)
+
+    def testCount(self):
+        ignored = IgnoredLines(IGNORE_COUNT)
+        for i in range(10):
+            ignored.add(i % 2, i, "   Via: %d\n" % i)
+        ignored.add(0, 10, "\n")
+        self.assertEqual(ignored.getCounts(), {0: {CATEGORY_SIP: 5, CATEGORY_BLANK: 1}, 1: {CATEGORY_SIP: 5}})
+        self.assertEqual(ignored.getLinesDict(), {})
+
+    def testSample(self):
+        # 抽样的行数有上限，抽样结果只与文件中的行有关
+        def sample(f):
+            ignored = IgnoredLines(IGNORE_SAMPLE, 10)
+            for i in range(1000):
+                ignored.add(f, i, b"other %d\n" % i, lambda s: s.decode('utf-8'))
+            return ignored
+        ignored = sample(0)
+        linesDict = ignored.getLinesDict()
+        self.assertEqual(ignored.getCounts(), {0: {CATEGORY_OTHER: 1000}})
+        self.assertEqual(len(linesDict[0]), 10)
+        for i, log in linesDict[0].items():
+            self.assertEqual(log, "other %d\n" % i)
+        # 不是只保留最前面的行
+        self.assertTrue(max(linesDict[0]) >= 10)
+        self.assertEqual(sample(0).getLinesDict(), linesDict)
+        self.assertNotEqual(sample(1).getLinesDict()[1], linesDict[0])
+
+    def testSampleAll(self):
+        # 行数不超过上限时抽样就是全部的行
+        ignored = IgnoredLines(IGNORE_SAMPLE, 10)
+        allIgnored = IgnoredLines(IGNORE_ALL)
+        for i in range(10):
+            ignored.add(0, i, "other %d\n" % i)
+            allIgnored.add(0, i, "other %d\n" % i)
+        self.assertEqual(ignored.getLinesDict(), allIgnored.getLinesDict())
+
+    def testFileData(self):
+        ignored = IgnoredLines(IGNORE_SAMPLE, 10)
+        for i in range(100):
+            ignored.add(0, i, "other %d\n" % i)
+        data = ignored.getFileData(0)
+        self.assertTrue(canRestore(data, IGNORE_SAMPLE))
+        self.assertTrue(canRestore(data, IGNORE_COUNT))
+        self.assertFalse(canRestore(data, IGNORE_ALL))
+        self.assertFalse(canRestore(None, IGNORE_COUNT))
+
+        restored = IgnoredLines(IGNORE_SAMPLE, 10)
+        restored.setFileData(0, data)
+        self.assertEqual(restored.getCounts(), ignored.getCounts())
+        self.assertEqual(restored.getLinesDict(), ignored.getLinesDict())
+        counted = IgnoredLines(IGNORE_COUNT)
+        counted.setFileData(0, data)
+        self.assertEqual(counted.getCounts(), ignored.getCounts())
+        self.assertEqual(counted.getLinesDict(), {})
+
+class AnalyzerIgnoredTest(QuietTestCase):
+    """不同加载方式下忽略的行的计数和抽样一致"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        lines = genLines(50)
+        lines[3:3] = ["", "2016-03-21 17:41:14.701532 [INFO] mod_sofia.c:1 loading", "freeswitch@x> status"]
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), lines)
+        self.sipCount = len([x for x in lines if x.startswith("   Via:")])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def analyze(self, mode, ingest):
+        an = FsLogAnalyzer()
+        an.setIgnoreMode(mode)
+        self.quiet(an.load, self.path, False, ingest)
+        self.quiet(an.run)
+        return an.getIgnoreCounts(), an.getIgnoreLinesDict()
+
+    def testModes(self):
+        counts, allLines = self.analyze(IGNORE_ALL, FsLogAnalyzer.INGEST_MEMORY)
+        self.assertEqual(counts, {0: {CATEGORY_BLANK: 1, CATEGORY_LOG: 1, CATEGORY_OTHER: 1, CATEGORY_SIP: self.sipCount}})
+        self.assertEqual(len(allLines[0]), self.sipCount + 3)
+        self.assertEqual(allLines[0][3], "\n")
+        self.assertEqual(allLines[0][5], "freeswitch@x> status\n")
+
+        counts, sampleLines = self.analyze(IGNORE_SAMPLE, FsLogAnalyzer.INGEST_MEMORY)
+        self.assertEqual(len(sampleLines[0]), IgnoredLines.SAMPLE_SIZE)
+        for i, log in sampleLines[0].items():
+            self.assertEqual(log, allLines[0][i])
+        self.assertEqual(self.analyze(IGNORE_COUNT, FsLogAnalyzer.INGEST_MEMORY), (counts, {}))
+
+        for ingest in [FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+            self.assertEqual(self.analyze(IGNORE_SAMPLE, ingest), (counts, sampleLines), ingest)
+            self.assertEqual(self.analyze(IGNORE_ALL, ingest), (counts, allLines), ingest)
+
+if __name__ == "__main__":
+    unittest.main()
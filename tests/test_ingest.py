@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, getResults, QuietTestCase
+
+class IngestTest(QuietTestCase):
+    """不同加载方式读取的日志行和分析结果与一次性读入内存一致"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.lines = genLines(50)
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), self.lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def load(self, path, ingest, errors="replace"):
+        an = FsLogAnalyzer()
+        an.setDecodeErrors(errors)
+        self.quiet(an.load, path, False, ingest)
+        return an
+
+    def analyze(self, path, ingest, errors="replace"):
+        an = self.load(path, ingest, errors)
+        self.quiet(an.run, an.STORE_MEMORY)
+        res = getResults(an)
+        an.clear()
+        return res
+
+    def testStream(self):
+        an = self.load(self.path, FsLogAnalyzer.INGEST_STREAM)
+        # 流式加载不保留原始行，迭代时从文件逐行读取
+        self.assertEqual(an.getIngest(0), FsLogAnalyzer.INGEST_STREAM)
+        self.assertFalse(an.isLoaded(0))
+        self.assertEqual([x[2] for x in an.iterLines()], [x + "\n" for x in self.lines])
+        self.assertEqual([x[:3] for x in an.iterLines(withOffset=True)], list(an.iterLines()))
+        an.clear()
+        self.assertEqual(self.analyze(self.path, FsLogAnalyzer.INGEST_STREAM), self.analyze(self.path, FsLogAnalyzer.INGEST_MEMORY))
+
+    def testMmap(self):
+        an = self.load(self.path, FsLogAnalyzer.INGEST_MMAP)
+        self.assertEqual(an.getIngest(0), FsLogAnalyzer.INGEST_MMAP)
+        self.assertTrue(an.isMapped(0))
+        # 偏移和长度与文件内容一致
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        count = 0
+        for f, i, line, offset, size in an.iterLines(withOffset=True):
+            self.assertEqual(data[offset:offset + size].decode('utf-8'), line)
+            self.assertEqual(an.readMapped(f, offset, size), line)
+            count += 1
+        self.assertEqual(count, len(self.lines))
+        # 会话只保存位置，查询时从映射的文件中读取
+        self.quiet(an.run, an.STORE_SESSION)
+        for sessUUID, sess in an.getSessLogInfoDict().items():
+            self.assertEqual(type(sess.log).__name__, "MmapSessLog")
+            for f, line, log in sess.log.iterLines():
+                self.assertEqual(self.lines[line], sessUUID + " " + log)
+                self.assertEqual(sess.log.getLine(f, line), log)
+        an.clear()
+        self.assertEqual(self.analyze(self.path, FsLogAnalyzer.INGEST_MMAP), self.analyze(self.path, FsLogAnalyzer.INGEST_MEMORY))
+
+    def testMmapEmpty(self):
+        # 空文件无法映射，按照内存方式加载
+        an = self.load(writeLog(os.path.join(self.dir, "empty.log"), []), FsLogAnalyzer.INGEST_MMAP)
+        self.assertEqual(an.getIngest(0), FsLogAnalyzer.INGEST_MEMORY)
+        self.assertEqual(list(an.iterLines()), [])
+        an.clear()
+
+    def testBytes(self):
+        an = self.load(self.path, FsLogAnalyzer.INGEST_BYTES)
+        self.assertEqual(an.getIngest(0), FsLogAnalyzer.INGEST_BYTES)
+        self.assertTrue(an.isMapped(0))
+        self.assertFalse(an.isLoaded(0))
+        # 未解码的字节行只在需要时解码
+        raw = [x[2] for x in an.iterLines(withOffset=True, raw=True)]
+        self.assertEqual(raw, [(x + "\n").encode('utf-8') for x in self.lines])
+        self.assertEqual([x[2] for x in an.iterLines()], [x + "\n" for x in self.lines])
+        an.clear()
+        self.assertEqual(self.analyze(self.path, FsLogAnalyzer.INGEST_BYTES), self.analyze(self.path, FsLogAnalyzer.INGEST_MEMORY))
+
+    def testCrlf(self):
+        # \r\n行尾的文件，各种加载方式的结果都与\n行尾的文件相同
+        crlfPath = writeLog(os.path.join(self.dir, "crlf.log"), self.lines, "\r\n")
+        base = self.analyze(self.path, FsLogAnalyzer.INGEST_MEMORY)
+        for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+            an = self.load(crlfPath, ingest)
+            self.assertEqual([x[2] for x in an.iterLines()], [x + "\n" for x in self.lines], ingest)
+            an.clear()
+            self.assertEqual(self.analyze(crlfPath, ingest), base, ingest)
+
+    def testInvalidUtf8(self):
+        # 含有非UTF-8字节的文件，字节方式可以加载，按照解码出错时的处理方式解码
+        path = os.path.join(self.dir, "bad.log")
+        with open(path, 'wb') as f:
+            f.write("".join(x + "\n" for x in self.lines).encode('utf-8').replace(b"10.0.7.152:5080 [", b"10.0.7.152:5080\xff [", 1))
+        sessUUID = self.lines[0].split()[0]
+        if sys.version_info[0] == 3:
+            an = FsLogAnalyzer()
+            successFileList, failedFileList = self.quiet(an.load, path, False, FsLogAnalyzer.INGEST_MEMORY)
+            self.assertEqual(successFileList, [])
+            self.assertTrue("-ingest bytes" in failedFileList[0][1])
+        for errors, text in [("replace", u"\ufffd"), ("ignore", u""), ("backslashreplace", u"\\xff")]:
+            res = self.analyze(path, FsLogAnalyzer.INGEST_BYTES, errors)
+            log = res[sessUUID][4][0][2]
+            if sys.version_info[0] == 3:
+                self.assertTrue((u"10.0.7.152:5080%s [" % text) in log, log)
+            # 其他会话不受影响
+            self.assertEqual(len(res), 50)
+            self.assertEqual(res[sessUUID][0], self.analyze(self.path, FsLogAnalyzer.INGEST_MEMORY)[sessUUID][0])
+
+    def testMissingFile(self):
+        an = FsLogAnalyzer()
+        successFileList, failedFileList = self.quiet(an.load, os.path.join(self.dir, "missing.log"), False, FsLogAnalyzer.INGEST_STREAM)
+        self.assertEqual(successFileList, [])
+        self.assertEqual(len(failedFileList), 1)
+        self.assertEqual(an.getFileCount(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import analyzer.analyzer
+import analyzer.analyzer_fs
+from analyzer.analyzer_fs import FsLogAnalyzer
+
+def genCrlfLog(path, calls):
+    # 模拟的FS DEBUG日志，行尾为\r\n，夹杂没有UUID的续行
+    rnd = random.Random(1)
+    now = datetime(2016, 3, 21, 17, 41, 14, 701532)
+    lines = []
+    for c in range(calls):
+        sessUUID = "%08x-a7c0-89c5-7e4d-%012x" % (c, rnd.getrandbits(48))
+        number = str(6000 + c)
+        chan = "sofia/external/%s@10.0.7.152:5080" % number
+        busy = c % 3 == 0
+        logList = [
+            "New Channel %s [%s]" % (chan, sessUUID),
+            "(%s) State Change CS_NEW -> CS_INIT" % chan,
+            "(%s) State Change CS_INIT -> CS_ROUTING" % chan,
+            "(%s) State Change CS_ROUTING -> CS_CONSUME_MEDIA" % chan,
+            "Channel %s entering state [calling][0]" % chan,
+            "Channel %s entering state [proceeding][180]" % chan,
+            "(%s) Callstate Change DOWN -> RINGING" % chan,
+        ]
+        if busy:
+            logList += ["Channel %s entering state [terminated][486]" % chan, "Hangup %s [CS_CONSUME_MEDIA] [USER_BUSY]" % chan]
+        else:
+            logList += ["Channel %s entering state [completing][200]" % chan, "Channel %s entering state [ready][200]" % chan, \
+                "(%s) Callstate Change RINGING -> ACTIVE" % chan, "Hangup %s [CS_EXECUTE] [NORMAL_CLEARING]" % chan]
+        logList.append("(%s) Callstate Change ACTIVE -> HANGUP" % chan)
+        for log in logList:
+            now += timedelta(microseconds=rnd.randint(50, 40000))
+            lines.append("%s %s [DEBUG] switch_core_state_machine.c:473 %s" % (sessUUID, now.strftime("%Y-%m-%d %H:%M:%S.%f"), log))
+            if rnd.random() < 0.2:
+                lines.append("   Via: SIP/2.0/UDP 10.0.7.152:5080;branch=z9hG4bK%d" % rnd.randint(1, 1000000))
+    with open(path, 'wb') as f:
+        f.write(("\r\n".join(lines) + "\r\n").encode('utf-8'))
+
+class JobsTest(unittest.TestCase):
+    """-jobs并行收集和分析的结果与串行一致(行尾为\\r\\n的日志)"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp(prefix="floga_test_")
+        cls.path = os.path.join(cls.dir, "crlf.log")
+        genCrlfLog(cls.path, 300)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, True)
+
+    def setUp(self):
+        # 屏蔽分析器的界面输出
+        self.printList = [(m, m.PRINT) for m in [analyzer.analyzer, analyzer.analyzer_fs]]
+        for m, p in self.printList:
+            m.PRINT = lambda s, end='\n', color='white': None
+
+    def tearDown(self):
+        for m, p in self.printList:
+            m.PRINT = p
+
+    def analyze(self, ingest, jobs):
+        an = FsLogAnalyzer()
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            an.load(self.path, False, ingest)
+            an.run(an.STORE_SESSION, jobs)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        res = {}
+        for sessUUID in an.getSessUUIDList():
+            result = an.getResultDict(sessUUID)[1]
+            res[sessUUID] = (an.getCallNumber(sessUUID)[1], [tuple(x[:4]) for x in an.getkeyInfoList(sessUUID)[1]], \
+                result["conclusion"], result["note"], list(an.getSessInfo(sessUUID, an.SESS_LOG_DK)[1].iterLines()))
+        an.clear()
+        return res
+
+    def testSerialEqualsJobs(self):
+        for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+            serial = self.analyze(ingest, 1)
+            self.assertEqual(len(serial), 300)
+            self.assertEqual(self.analyze(ingest, 2), serial, ingest)
+            # 提取的结果和会话日志中都没有\r
+            for callNumber, keyInfoList, conclusion, note, logList in serial.values():
+                self.assertFalse("\r" in repr(keyInfoList), ingest)
+                self.assertFalse([x for x in logList if "\r" in x[2]], ingest)
+            self.assertEqual(set(x[2] for x in serial.values()), set(["OK", "ERROR"]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from analyzer.logtime import LogTimeParser, toDatetime, fromDatetime
+from analyzer.analyzer_fs import FsLogAnalyzer
+
+class LogTimeParserTest(unittest.TestCase):
+
+    def testParse(self):
+        # 与strptime的结果一致，跨秒、跨天以及日期缓存清空后都正确
+        parser = LogTimeParser()
+        LogTimeParser.DATE_CACHE_SIZE, size = 8, LogTimeParser.DATE_CACHE_SIZE
+        try:
+            rnd = random.Random(1)
+            dt = datetime(2016, 2, 28, 23, 59, 58)
+            for i in range(3000):
+                dt += timedelta(microseconds=rnd.randint(0, 3000000) if i % 100 else rnd.randint(0, 86400 * 10 ** 6 * 3))
+                log = dt.strftime("%Y-%m-%d %H:%M:%S.%f") + " [DEBUG] sofia.c:1234 nothing interesting"
+                us = fromDatetime(datetime.strptime(log[:26], "%Y-%m-%d %H:%M:%S.%f"))
+                self.assertEqual(parser.parse(log), us, log)
+                self.assertEqual(parser.parse(log.encode('utf-8')), us, log)
+        finally:
+            LogTimeParser.DATE_CACHE_SIZE = size
+
+    def testInvalid(self):
+        parser = LogTimeParser()
+        for log in ["", "2016-03-21 17:41:14", "2016-03-21 17:41:14,701532 x", "2016-02-30 17:41:14.701532 x", \
+            "2016-03-21 24:41:14.701532 x", "2016-03-21T17:41:14.701532 x", "2016-03-21 17:41:14.70a532 x", \
+            "   Via: SIP/2.0/UDP 10.0.7.152:5080;branch=z9hG4bK1"]:
+            self.assertEqual(parser.parse(log), None, log)
+        # 无效的时间不影响之后的解析
+        self.assertEqual(toDatetime(parser.parse("2016-03-21 17:41:14.701532 x")), datetime(2016, 3, 21, 17, 41, 14, 701532))
+
+    def testConvert(self):
+        for dt in [datetime(1970, 1, 1), datetime(2016, 3, 21, 17, 41, 14, 701532), datetime(2038, 1, 19, 3, 14, 8, 1)]:
+            self.assertEqual(toDatetime(fromDatetime(dt)), dt)
+        self.assertEqual(fromDatetime(datetime(1970, 1, 2)), 86400 * 10 ** 6)
+
+    def testAnalyzer(self):
+        an = FsLogAnalyzer()
+        self.assertEqual(an.getLogTime("2016-03-21 17:41:14.701532 [DEBUG]"), datetime(2016, 3, 21, 17, 41, 14, 701532))
+        self.assertEqual(an.getLogTime(b"2016-03-21 17:41:14.701532 [DEBUG]"), datetime(2016, 3, 21, 17, 41, 14, 701532))
+        # 快速解析失败时按照原来的方式解析：微秒不足6位的时间省略了前面的0，无法解析的为1970-01-01
+        self.assertEqual(an.getLogTime("2016-03-21 17:41:14.1532"), datetime(2016, 3, 21, 17, 41, 14, 1532))
+        self.assertEqual(an.getLogTime("bad"), datetime(1970, 1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
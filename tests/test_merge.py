@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, QuietTestCase
+
+class MergeTest(QuietTestCase):
+    """交错合并方式：同一份日志拆分为时间重叠的两个文件，合并后的分析结果与单个文件一致"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        lines = genLines(300)
+        self.full = writeLog(os.path.join(self.dir, "full.log"), lines)
+        # 奇数行和偶数行分别放在两个文件中
+        writeLog(os.path.join(self.dir, "part0.log"), lines[0::2])
+        writeLog(os.path.join(self.dir, "part1.log"), lines[1::2])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def analyze(self, path, sortMode):
+        an = FsLogAnalyzer()
+        an.setSortMode(sortMode)
+        self.quiet(an.load, path, False)
+        self.quiet(an.run, an.STORE_MEMORY)
+        res = {}
+        for sessUUID in an.getSessUUIDList():
+            result = an.getResultDict(sessUUID)[1]
+            res[sessUUID] = (an.getCallNumber(sessUUID)[1], an.getkeyInfoList(sessUUID)[1], result["conclusion"], result["note"])
+        an.clear()
+        return res
+
+    def testMergeEqualsSingleFile(self):
+        full = self.analyze(self.full, FsLogAnalyzer.SORT_FILE)
+        merged = self.analyze(os.path.join(self.dir, "part*.log"), FsLogAnalyzer.SORT_MERGE)
+        self.assertEqual(sorted(merged.keys()), sorted(full.keys()))
+        transfer = spanning = 0
+        for sessUUID, (callNumber, keyInfoList, conclusion, note) in merged.items():
+            # 关键信息保持日志时间的顺序，不按照文件重新排列
+            timeList = [x[4] for x in keyInfoList]
+            self.assertEqual(timeList, sorted(timeList))
+            spanning += len(set(x[0] for x in keyInfoList)) == 2
+            self.assertEqual([x[2:] for x in keyInfoList], [x[2:] for x in full[sessUUID][1]])
+            # 号码变换在另一个文件中时仍然取变换后的号码
+            self.assertEqual((callNumber, conclusion, note), (full[sessUUID][0], full[sessUUID][2], full[sessUUID][3]))
+            transfer += callNumber.startswith("8")
+        self.assertEqual(transfer, 75)
+        self.assertTrue(spanning > 250, spanning)
+
+if __name__ == "__main__":
+    unittest.main()
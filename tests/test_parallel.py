@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from analyzer.parallel import splitChunks, splitSessLine, getShard
+
+UUID = "4541eb63-e5b0-49f0-8d2c-31e06078013f"
+
+class SplitChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = os.path.join(self.dir, "a.log")
+        with open(self.path, 'wb') as f:
+            for i in range(200):
+                f.write(("%s line %d %s\n" % (UUID, i, "x" * (i % 37))).encode('utf-8'))
+        with open(self.path, 'rb') as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def checkChunks(self, chunks, start, end):
+        # 首尾相接，覆盖整个范围，每块都以完整的行结束
+        self.assertEqual(chunks[0][0], start)
+        self.assertEqual(chunks[-1][1], end)
+        for (s1, e1), (s2, e2) in zip(chunks, chunks[1:]):
+            self.assertEqual(e1, s2)
+        for s, e in chunks:
+            self.assertTrue(s < e)
+            self.assertEqual(self.data[e - 1:e], b'\n')
+
+    def testWholeFile(self):
+        chunks = splitChunks(self.path, 1000)
+        self.assertTrue(len(chunks) > 5)
+        self.checkChunks(chunks, 0, len(self.data))
+        self.assertEqual(splitChunks(self.path), [(0, len(self.data))])
+
+    def testRange(self):
+        start = self.data.index(b'\n', 2000) + 1
+        end = self.data.index(b'\n', 6000) + 1
+        chunks = splitChunks(self.path, 1000, (start, end))
+        self.checkChunks(chunks, start, end)
+
+    def testCompressed(self):
+        gzPath = self.path + ".gz"
+        f = gzip.open(gzPath, 'wb')
+        f.write(self.data)
+        f.close()
+        self.assertEqual(splitChunks(gzPath, 1000), [(0, -1)])
+        self.assertEqual(splitChunks(gzPath, 1000, (10, 20)), [(10, 20)])
+
+class SplitSessLineTest(unittest.TestCase):
+
+    def testSplit(self):
+        line = UUID + " 2016-03-21 17:41:14.701532 [DEBUG] x\n"
+        self.assertEqual(splitSessLine(line), (36, UUID))
+        self.assertEqual(splitSessLine(line.encode('utf-8')), (36, UUID))
+        self.assertEqual(splitSessLine("2016-03-21 17:41:14.701532 [DEBUG] x\n")[0], -1)
+        self.assertEqual(splitSessLine("no-space-here")[0], -1)
+
+    def testShard(self):
+        shards = set(getShard("%s%d" % (UUID[:-2], i), 4) for i in range(40))
+        self.assertTrue(shards <= set(range(4)))
+        self.assertEqual(getShard(UUID, 4), getShard(UUID, 4))
+
+if __name__ == "__main__":
+    unittest.main()
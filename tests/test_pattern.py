@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from analyzer.pattern import PatternRegistry
+from analyzer.analyzer_fs import FsLogAnalyzer
+from helper import genLines, writeLog, QuietTestCase
+
+# (固定字符串, 正则表达式, 期望返回元祖长度, 需要去掉的位置, 匹配标志)
+RULE_LIST = [
+    ("State Change", r"State Change (.*) -> (.*)", 2, [], "core sm"),
+    ("entering state", r"entering state \[(.*)\]\[(.*)\]", 2, [], "chan proc"),
+    ("952 Hangup", r"952 Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], "recv_bye"),
+    ("Hangup", r"Hangup (.*) \[(.*)\] \[(.*)\]", 3, [0], "hangup_reason"),
+    ("Sending BYE to", r"Sending BYE to(.*)", 1, [0], "send_bye"),
+    ("Flipping", r"Flipping (.*)", 2, [], "never"),
+]
+
+LOG_LIST = [
+    "2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:473 (sofia/external/6010@10.0.7.152:5080) State Change CS_NEW -> CS_INIT",
+    "2016-03-21 17:41:14.701532 [DEBUG] sofia.c:5842 Channel sofia/external/6010@10.0.7.152:5080 entering state [proceeding][180]",
+    "2016-03-21 17:41:14.701532 [NOTICE] sofia.c:952 952 Hangup sofia/external/6010@10.0.7.152:5080 [CS_EXECUTE] [NORMAL_CLEARING]",
+    "2016-03-21 17:41:14.701532 [NOTICE] switch_channel.c:3920 Hangup sofia/external/6010@10.0.7.152:5080 [CS_EXECUTE] [USER_BUSY]",
+    "2016-03-21 17:41:14.701532 [DEBUG] sofia.c:1234 Sending BYE to sofia/external/6010@10.0.7.152:5080",
+    "2016-03-21 17:41:14.701532 [DEBUG] switch_cpp.cpp:1200 Flipping CID",
+    "2016-03-21 17:41:14.701532 [DEBUG] sofia.c:1234 (sofia/external/6010@10.0.7.152:5080) nothing interesting",
+    "2016-03-21 17:41:14.701532 [DEBUG] sofia.c:1234 State Change without arrow",
+]
+
+def refMatch(log):
+    # 逐条规则执行正则，第一个匹配的规则生效
+    for key, reExpr, expLen, dropPos, flag in RULE_LIST:
+        res = re.search(reExpr, log)
+        if res and len(res.groups()) >= expLen:
+            return flag, tuple(x for i, x in enumerate(res.groups()[:expLen]) if i not in dropPos)
+    return None
+
+class PatternRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = PatternRegistry(RULE_LIST)
+
+    def testMatch(self):
+        for log in LOG_LIST:
+            self.assertEqual(self.registry.match(log), refMatch(log), log)
+        # 先注册的规则优先，"952 Hangup"不会作为"Hangup"匹配
+        self.assertEqual(self.registry.match(LOG_LIST[2]), ("recv_bye", ("CS_EXECUTE", "NORMAL_CLEARING")))
+        # 分组个数不足期望长度的规则永远不匹配
+        self.assertEqual(self.registry.match(LOG_LIST[5]), None)
+
+    def testIterMatch(self):
+        self.assertEqual(list(self.registry.iterMatch(LOG_LIST[2])), [("recv_bye", ("CS_EXECUTE", "NORMAL_CLEARING")), \
+            ("hangup_reason", ("CS_EXECUTE", "NORMAL_CLEARING"))])
+        self.assertEqual(list(self.registry.iterMatch(LOG_LIST[6])), [])
+
+    def testBytes(self):
+        # 未解码的字节行与已解码的行结果相同
+        decode = lambda line: line.decode('utf-8')
+        for log in LOG_LIST:
+            self.assertEqual(self.registry.match(log.encode('utf-8'), decode), self.registry.match(log), log)
+
+class PrefilterTest(unittest.TestCase):
+    """预过滤：不含任何固定字符串的行不解码、不执行正则，统计各规则的命中次数"""
+
+    def testStats(self):
+        registry = PatternRegistry(RULE_LIST)
+        decodeList = []
+
+        def decode(line):
+            decodeList.append(line)
+            return line.decode('utf-8')
+
+        for log in LOG_LIST:
+            registry.match(log.encode('utf-8'), decode)
+        # 只有最后两行没有固定字符串，跳过的行不解码
+        self.assertEqual(len(decodeList), len(LOG_LIST) - 1)
+        lineCount, passCount, statList = registry.getStats()
+        self.assertEqual((lineCount, passCount), (len(LOG_LIST), len(LOG_LIST) - 1))
+        self.assertEqual([x[2:] for x in statList], [(2, 1), (1, 1), (1, 1), (1, 1), (1, 1), (1, 0)])
+
+        # 累加其他进程的统计
+        registry.addStats(registry.getStats())
+        self.assertEqual(registry.getStats()[:2], (len(LOG_LIST) * 2, (len(LOG_LIST) - 1) * 2))
+        registry.resetStats()
+        self.assertEqual(registry.getStats(), (0, 0, [(x[0], x[4], 0, 0) for x in RULE_LIST]))
+
+class AnalyzerStatsTest(QuietTestCase):
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), genLines(100))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def getStats(self, jobs):
+        an = FsLogAnalyzer()
+        self.quiet(an.load, self.path, False)
+        self.quiet(an.run, an.STORE_MEMORY, jobs)
+        res = (an.getKeyInfoRules().getStats(), an.getCallNumberRules().getStats())
+        an.clear()
+        return res
+
+    def testSerialEqualsJobs(self):
+        # 多进程提取时合并工作进程的统计，与串行相同
+        keyInfoStats, callNumberStats = self.getStats(1)
+        self.assertEqual(self.getStats(2), (keyInfoStats, callNumberStats))
+        lineCount, passCount, statList = keyInfoStats
+        self.assertTrue(0 < passCount < lineCount)
+        self.assertEqual(sum(x[3] for x in statList), passCount)
+
+if __name__ == "__main__":
+    unittest.main()
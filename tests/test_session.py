@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+from datetime import datetime
+
+from analyzer.session import Session, SessIndex, KeyInfoIndex
+from analyzer.sesslog import SessLog
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.logtime import fromDatetime
+
+def newSess(startTime, callNumber="", conclusion="OK"):
+    sess = Session(None, startTime)
+    sess.callNumber = callNumber
+    sess.conclusion = conclusion
+    return sess
+
+class SessionTest(unittest.TestCase):
+
+    def testKeyInfo(self):
+        sess = Session(SessLog(), 1458582074701532)
+        # 微秒数按照双精度保存，读取时恢复为整数
+        sess.addKeyInfo(0, 3, "core sm", ("CS_NEW", "CS_INIT"), 1458582074701532)
+        sess.addKeyInfo(1, 70000, "hangup_reason", ("CS_EXECUTE", "NORMAL_CLEARING"), 2 ** 53)
+        self.assertEqual(sess.getKeyInfoCount(), 2)
+        self.assertEqual(sess.getKeyInfo(1), (1, 70000, "hangup_reason", ("CS_EXECUTE", "NORMAL_CLEARING"), 2 ** 53))
+        self.assertEqual(sess.getKeyInfoList(), [(0, 3, "core sm", ("CS_NEW", "CS_INIT"), 1458582074701532), sess.getKeyInfo(1)])
+        self.assertRaises(IndexError, sess.getKeyInfo, 2)
+        # 只能使用固定的字段
+        self.assertRaises(AttributeError, setattr, sess, "other", 1)
+
+    def testExtendKeyInfo(self):
+        # 其他进程中提取的结果按照匹配标志重新编号后追加
+        src = Session(None)
+        src.addKeyInfo(0, 1, "core sm", ("A", "B"), 1)
+        src.addKeyInfo(0, 2, "chan proc", ("calling", "0"), 2)
+        f, l, flag, info, t = src.getKeyInfoColumns()
+        flagList = Session.getFlagList()
+        otherFlagList = list(reversed(flagList))
+        sess = Session(None)
+        sess.extendKeyInfo((f, l, type(flag)('B', [len(flagList) - 1 - x for x in flag]), info, t), otherFlagList)
+        self.assertEqual(sess.getKeyInfoList(), src.getKeyInfoList())
+
+    def testSortKeyInfo(self):
+        sess = Session(None)
+        sess.addKeyInfo(1, 1, "core sm", ("C", "D"), 3)
+        sess.addKeyInfo(0, 5, "core sm", ("B", "C"), 2)
+        sess.addKeyInfo(0, 2, "core sm", ("A", "B"), 1)
+        sess.sortKeyInfo()
+        self.assertEqual([x[:2] for x in sess.getKeyInfoList()], [(0, 2), (0, 5), (1, 1)])
+
+    def testDetails(self):
+        keys = ("answered", "busy")
+        a, b = Session(None), Session(None)
+        self.assertEqual(a.getDetails(), {})
+        a.setDetails(keys, [True, False])
+        b.setDetails(keys, [False, [("proceeding", "486")]])
+        self.assertEqual(a.getDetails(), {"answered": True, "busy": False})
+        self.assertEqual(b.getDetails(), {"answered": False, "busy": [("proceeding", "486")]})
+
+    def testSessInfo(self):
+        # 分析器按照原来会话字典的key返回会话的字段
+        an = FsLogAnalyzer()
+        startTime = datetime(2016, 3, 21, 17, 41, 14, 701532)
+        sess = Session(SessLog(), fromDatetime(startTime))
+        sess.callNumber = "6010"
+        sess.conclusion = "OK"
+        sess.note = "[CALLING]"
+        sess.addKeyInfo(0, 3, "core sm", ("CS_NEW", "CS_INIT"), fromDatetime(startTime))
+        an.getSessLogInfoDict()["a"] = sess
+        self.assertEqual(an.getCallNumber("a"), ("a", "6010"))
+        self.assertEqual(an.getSessInfo("a", an.SESS_START_TIME_DK), ("a", startTime))
+        self.assertEqual(an.getkeyInfoList("a")[1], sess.getKeyInfoList())
+        self.assertEqual(an.getResultDict("a")[1], {"conclusion": "OK", "details": {}, "note": "[CALLING]"})
+        self.assertEqual(an.getSessInfo("b", an.SESS_LOG_DK), ("b", None))
+        an.clear()
+
+def findKeyInfo(keyInfoList, flag, param1="", param2="", f=-1, l=-1):
+    # 逐条比较的参考实现
+    for i, x in enumerate(keyInfoList):
+        info = x[3]
+        if x[2] != flag:
+            continue
+        if param1 != "" and (len(info) < 1 or info[0].strip() != param1.strip()):
+            continue
+        if param2 != "" and (len(info) < 2 or info[1].strip() != param2.strip()):
+            continue
+        if (f == -1 or x[0] >= f) and (l == -1 or x[1] >= l):
+            return i
+    return -1
+
+class KeyInfoIndexTest(unittest.TestCase):
+
+    def testFind(self):
+        rnd = random.Random(1)
+        flagList = ["core sm", "chan proc", "hangup_reason", "state change"]
+        paramList = ["A", " A", "B ", "C", ""]
+        keyInfoList = []
+        for i in range(300):
+            info = tuple(rnd.choice(paramList) for j in range(rnd.randint(0, 3)))
+            keyInfoList.append((rnd.randint(0, 2), rnd.randint(0, 1000), rnd.choice(flagList), info, i))
+        index = KeyInfoIndex(keyInfoList)
+        self.assertIs(index.getKeyInfoList(), keyInfoList)
+        for i in range(2000):
+            args = (rnd.choice(flagList + ["other"]), rnd.choice(paramList), rnd.choice(paramList), \
+                rnd.choice([-1, 0, 1, 2, 3]), rnd.choice([-1, 0, 500, 999, 1001]))
+            self.assertEqual(index.find(*args), findKeyInfo(keyInfoList, *args), args)
+
+    def testShortInfo(self):
+        keyInfoList = [(0, 1, "f", (), 0), (0, 2, "f", (" A ",), 0), (0, 3, "f", ("A", "B"), 0)]
+        index = KeyInfoIndex(keyInfoList)
+        self.assertEqual(index.find("f"), 0)
+        self.assertEqual(index.find("f", "A"), 1)
+        self.assertEqual(index.find("f", "", "B"), 2)
+        self.assertEqual(index.find("f", "A ", " B"), 2)
+        self.assertEqual(index.find("f", "A", l=3), 2)
+        self.assertEqual(index.find("f", "A", f=1), -1)
+        self.assertEqual(index.find("g"), -1)
+
+class SessIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sessDict = {
+            "a": newSess(300, "6010", "OK"),
+            "b": newSess(100, "6020", "ERROR"),
+            "c": newSess(200, "6010", "WARNING"),
+            "d": newSess(None, "", "ERROR"),
+        }
+        self.index = SessIndex()
+        self.index.build(self.sessDict)
+
+    def testFind(self):
+        # 按照开始时间排序，没有开始时间的在最前面
+        self.assertEqual(self.index.find(), ["d", "b", "c", "a"])
+        self.assertEqual(self.index.find(callNumber="6010"), ["c", "a"])
+        self.assertEqual(self.index.find(callNumber="6030"), [])
+        self.assertEqual(self.index.find(conclusion="error"), ["d", "b"])
+        # 结论包含即可，多组合并后仍然有序
+        self.assertEqual(self.index.find(conclusion="R"), ["d", "b", "c"])
+        self.assertEqual(self.index.find(callNumber="6010", conclusion="ok"), ["a"])
+
+    def testUpdate(self):
+        self.sessDict["a"].conclusion = "ERROR"
+        self.index.update("a", self.sessDict["a"])
+        self.assertEqual(self.index.find(conclusion="ERROR"), ["d", "b", "a"])
+        self.assertEqual(self.index.find(conclusion="OK"), [])
+
+        self.sessDict["c"].startTime = 400
+        self.sessDict["c"].callNumber = "6020"
+        self.index.update("c", self.sessDict["c"])
+        self.assertEqual(self.index.find(), ["d", "b", "a", "c"])
+        self.assertEqual(self.index.find(callNumber="6010"), ["a"])
+        self.assertEqual(self.index.find(callNumber="6020"), ["b", "c"])
+
+        self.sessDict["e"] = newSess(150, "6010", "OK")
+        self.index.update("e", self.sessDict["e"])
+        self.assertEqual(self.index.find(callNumber="6010"), ["e", "a"])
+
+    def testUpdateMatchesBuild(self):
+        # 随机修改后逐个更新的结果与重新建立的索引一致
+        rnd = random.Random(1)
+        for i in range(200):
+            sessUUID = "s%d" % rnd.randint(0, 30)
+            sess = self.sessDict.setdefault(sessUUID, newSess(None))
+            sess.startTime = rnd.choice([None, rnd.randint(0, 50)])
+            sess.callNumber = rnd.choice(["", "6010", "6020"])
+            sess.conclusion = rnd.choice(["OK", "ERROR", "WARNING"])
+            self.index.update(sessUUID, sess)
+        index = SessIndex()
+        index.build(self.sessDict)
+        for callNumber in ["", "6010", "6020"]:
+            for conclusion in ["", "OK", "ERROR", "R"]:
+                self.assertEqual(self.index.find(callNumber, conclusion), index.find(callNumber, conclusion))
+
+if __name__ == "__main__":
+    unittest.main()
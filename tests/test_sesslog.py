@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import unittest
+from array import array
+
+from analyzer.sesslog import SessLog, MmapSessLog
+
+class SessLogTest(unittest.TestCase):
+
+    def setUp(self):
+        # 已加载的行包含会话UUID、空格和结尾的换行
+        self.lineList = [["uuid aaaa\n", "uuid bbbb\n", "uuid cccc\n"], ["uuid dddd\n", "uuid eeee\n"]]
+        self.reader = lambda f, line: self.lineList[f][line]
+
+    def testReader(self):
+        log = SessLog(self.reader, 5)
+        log.add(0, 0, None)
+        log.extend(0, array('L', [1, 2]))
+        log.extend(1, array('L', []))
+        log.add(1, 1, None)
+        self.assertEqual(list(log.iterLines()), [(0, 0, "aaaa"), (0, 1, "bbbb"), (0, 2, "cccc"), (1, 1, "eeee")])
+        self.assertEqual(list(log.iterLines(files=[1])), [(1, 1, "eeee")])
+        self.assertEqual(log.getLine(0, 2), "cccc")
+        self.assertEqual(log.getLine(1, 0), "")
+        self.assertEqual(log.keys(), [0, 1])
+        self.assertEqual(len(log), 4)
+
+    def testTexts(self):
+        # 保存内容的日志与从已加载的行中读取的日志可以混合
+        log = SessLog(self.reader, 5)
+        log.add(0, 1, None)
+        log.add(0, 5, "ffff")
+        log.extend(1, array('L', [0, 1]), ["gggg", None])
+        self.assertEqual(list(log.iterLines()), [(0, 1, "bbbb"), (0, 5, "ffff"), (1, 0, "gggg"), (1, 1, "eeee")])
+
+    def testUnsorted(self):
+        # 交错合并时加入的顺序不是文件顺序，迭代时按照文件索引和行数排序
+        log = SessLog(self.reader, 5)
+        log.add(1, 0, None)
+        log.add(0, 2, None)
+        log.extend(0, array('L', [0, 1]))
+        self.assertEqual([x[:2] for x in log.iterLines()], [(0, 0), (0, 1), (0, 2), (1, 0)])
+        self.assertEqual([x[:2] for x in log.iterLines(files=[0])], [(0, 0), (0, 1), (0, 2)])
+
+    def testDetach(self):
+        log = SessLog(self.reader, 5)
+        log.extend(0, array('L', [0, 2]))
+        log.detach()
+        # 释放已加载的行之后仍然可以读取
+        self.lineList = None
+        self.assertEqual(list(log.iterLines()), [(0, 0, "aaaa"), (0, 2, "cccc")])
+        self.assertEqual(log.getLine(0, 2), "cccc")
+
+class MmapSessLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {0: b"aaaa bbbb\ncccc dddd\n", 1: b"eeee ffff\n"}
+        self.reader = lambda f, offset, length: self.data[f][offset:offset + length].decode('utf-8')
+        self.rawReader = lambda f, offset, length: self.data[f][offset:offset + length]
+
+    def testRefs(self):
+        log = MmapSessLog(self.reader, self.rawReader)
+        log.add(0, 0, None, (5, 4))
+        log.extend(0, array('L', [1]), array('L', [15]), array('L', [4]))
+        log.add(1, 0, None, (5, 4))
+        self.assertEqual(list(log.iterLines()), [(0, 0, "bbbb"), (0, 1, "dddd"), (1, 0, "ffff")])
+        self.assertEqual(list(log.iterLines(raw=True)), [(0, 0, b"bbbb"), (0, 1, b"dddd"), (1, 0, b"ffff")])
+        self.assertEqual(log.getLine(0, 1), "dddd")
+        self.assertEqual(log.getLine(0, 2), "")
+        self.assertEqual(log.keys(), [0, 1])
+
+    def testTexts(self):
+        # 没有位置的日志(如压缩文件)保存内容，与有位置的日志按照文件索引和行数的顺序一起迭代
+        log = MmapSessLog(self.reader)
+        log.add(1, 0, None, (5, 4))
+        log.add(0, 3, "gggg")
+        self.assertEqual(list(log.iterLines()), [(0, 3, "gggg"), (1, 0, "ffff")])
+        self.assertEqual(log.getLine(0, 3), "gggg")
+        self.assertEqual(log.keys(), [0, 1])
+
+if __name__ == "__main__":
+    unittest.main()
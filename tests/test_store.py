@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from analyzer.analyzer_fs import FsLogAnalyzer
+from analyzer.sesslog import SessLog, MmapSessLog
+from helper import genLines, writeLog, QuietTestCase
+
+class StoreModeTest(QuietTestCase):
+    """会话存放方式：session/mix只保存位置，查询时从磁盘读取，结果与全部常驻内存一致"""
+
+    def setUp(self):
+        QuietTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        lines = genLines(100)
+        self.path = writeLog(os.path.join(self.dir, "fs.log"), lines)
+        self.crlfPath = writeLog(os.path.join(self.dir, "crlf.log"), lines, "\r\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+        QuietTestCase.tearDown(self)
+
+    def analyze(self, path, mode, ingest, hotCount=None):
+        an = FsLogAnalyzer()
+        if hotCount is not None:
+            an.MIX_HOT_COUNT = hotCount
+        self.quiet(an.load, path, False, ingest)
+        self.quiet(an.run, mode)
+        sessLogInfoDict = an.getSessLogInfoDict()
+        res = dict((k, list(s.log.iterLines())) for k, s in sessLogInfoDict.items())
+        kinds = dict((k, type(s.log)) for k, s in sessLogInfoDict.items())
+        return an, res, kinds
+
+    def testModes(self):
+        an, memory, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_MEMORY, FsLogAnalyzer.INGEST_MEMORY)
+        self.assertEqual(set(kinds.values()), set([SessLog]))
+        an.clear()
+        for ingest in [FsLogAnalyzer.INGEST_MEMORY, FsLogAnalyzer.INGEST_STREAM, FsLogAnalyzer.INGEST_MMAP, FsLogAnalyzer.INGEST_BYTES]:
+            # 只保存位置的会话日志在memory方式下读入内存
+            an, res, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_MEMORY, ingest)
+            self.assertEqual(res, memory, ingest)
+            self.assertEqual(set(kinds.values()), set([SessLog]), ingest)
+            an.clear()
+
+            an, res, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_SESSION, ingest)
+            self.assertEqual(res, memory, ingest)
+            self.assertEqual(set(kinds.values()), set([MmapSessLog]), ingest)
+            # 已加载的行已经释放，按行数从磁盘读取
+            sessUUID = sorted(res.keys())[0]
+            f, line, log = memory[sessUUID][-1]
+            self.assertEqual(an.getSessInfo(sessUUID, an.SESS_LOG_DK)[1].getLine(f, line), log, ingest)
+            an.clear()
+
+    def testMix(self):
+        an, memory, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_MEMORY, FsLogAnalyzer.INGEST_MEMORY)
+        an.clear()
+        an, res, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_MIX, FsLogAnalyzer.INGEST_MEMORY, 10)
+        self.assertEqual(res, memory)
+        sessLogInfoDict = an.getSessLogInfoDict()
+        recentList = sorted(sessLogInfoDict.keys(), key=lambda x:sessLogInfoDict[x].startTime, reverse=True)
+        # 异常的会话和最近的10个会话常驻内存
+        hotSet = set(recentList[:10]) | set(k for k, s in sessLogInfoDict.items() if s.conclusion != "OK")
+        self.assertTrue(len(hotSet) < len(res))
+        for sessUUID, kind in kinds.items():
+            self.assertEqual(kind, SessLog if sessUUID in hotSet else MmapSessLog, sessUUID)
+        an.clear()
+
+    def testCrlf(self):
+        # 含有\r的文件不建立行偏移索引，session方式下日志仍然常驻内存，内容与\n行尾的文件一致
+        an, memory, kinds = self.analyze(self.path, FsLogAnalyzer.STORE_MEMORY, FsLogAnalyzer.INGEST_MEMORY)
+        an.clear()
+        an, res, kinds = self.analyze(self.crlfPath, FsLogAnalyzer.STORE_SESSION, FsLogAnalyzer.INGEST_MEMORY)
+        self.assertEqual(res, memory)
+        an.clear()
+
+if __name__ == "__main__":
+    unittest.main()
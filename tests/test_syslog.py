@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import sys
+import unittest
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    parseSyslog = None # syslog接收基于asyncio，只支持python3
+else:
+    from analyzer.syslogrecv import parseSyslog
+
+LINE = "4541eb63-e5b0-49f0-8d2c-31e06078013f 2016-03-21 17:41:14.701532 [DEBUG] switch_core_state_machine.c:40 Standard INIT"
+
+@unittest.skipIf(PY2, "syslog接收需要python3")
+class ParseSyslogTest(unittest.TestCase):
+
+    def testRfc5424(self):
+        self.assertEqual(parseSyslog("<134>1 2016-03-21T17:41:14.701Z fs01 freeswitch 1234 - - " + LINE), ("fs01", LINE))
+
+    def testRfc5424StructuredData(self):
+        data = '<134>1 2016-03-21T17:41:14.701Z fs01 freeswitch 1234 ID47 [ex@32473 k="a\\]b"][x@1 y="z"] ' + LINE
+        self.assertEqual(parseSyslog(data), ("fs01", LINE))
+        # 没有主机名，消息带有BOM
+        self.assertEqual(parseSyslog(u"<134>1 - - - - - - \ufeff" + LINE), ("", LINE))
+
+    def testRfc3164(self):
+        self.assertEqual(parseSyslog("<134>Mar 21 17:41:14 fs01 freeswitch[1234]: " + LINE), ("fs01", LINE))
+        # 省略时间和主机名
+        self.assertEqual(parseSyslog("<134>freeswitch: " + LINE), ("", LINE))
+        # 消息中空格之后的": "不是标签
+        self.assertEqual(parseSyslog("<134>" + LINE + ": OK"), ("", LINE + ": OK"))
+
+    def testInvalid(self):
+        self.assertIsNone(parseSyslog(LINE))
+        self.assertIsNone(parseSyslog("<abc>1 x"))
+        self.assertIsNone(parseSyslog("<134>1 2016-03-21T17:41:14Z fs01"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+
+from analyzer.timerange import findTimeRange, parseTimeArg, countLines, iterRangeLines, getLineTime, toTimeKey
+
+UUID = "4541eb63-e5b0-49f0-8d2c-31e06078013f"
+FIRST = datetime(2016, 3, 21, 23, 50, 0)
+
+class FindTimeRangeTest(unittest.TestCase):
+
+    def setUp(self):
+        # 每0.25秒一条日志，跨过零点；没有时间的续行属于前一条日志
+        self.dir = tempfile.mkdtemp(prefix="floga_test_")
+        self.path = os.path.join(self.dir, "a.log")
+        lines = []
+        for i in range(6000):
+            if i % 7 == 3:
+                lines.append(b"Content-Length: 0\n")
+            else:
+                t = FIRST + timedelta(milliseconds=250 * i)
+                lines.append(("%s %s [DEBUG] line %d\n" % (UUID, t.strftime("%Y-%m-%d %H:%M:%S.%f"), i)).encode('utf-8'))
+        self.data = b"".join(lines)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+        self.gzPath = self.path + ".gz"
+        f = gzip.open(self.gzPath, 'wb')
+        f.write(self.data)
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def expected(self, begin, end, margin=0):
+        # 逐行查找的结果
+        beginKey = toTimeKey(begin - timedelta(seconds=margin)) if begin is not None else None
+        endKey = toTimeKey(end) if end is not None else None
+        start = stop = None
+        pos = 0
+        for line in self.data.splitlines(True):
+            t = getLineTime(line)
+            if t is not None:
+                if start is None and (beginKey is None or t >= beginKey):
+                    start = pos
+                if stop is None and endKey is not None and t > endKey:
+                    stop = pos
+            pos += len(line)
+        start = len(self.data) if start is None else start
+        return start, max(start, len(self.data) if stop is None else stop)
+
+    def testRanges(self):
+        for begin, end, margin in [
+            (datetime(2016, 3, 21, 23, 55), datetime(2016, 3, 21, 23, 58, 30), 0),
+            (datetime(2016, 3, 21, 23, 55), datetime(2016, 3, 22, 0, 5), 60),
+            (None, datetime(2016, 3, 21, 23, 51), 0),
+            (datetime(2016, 3, 22, 0, 10), None, 0),
+            (datetime(2016, 3, 21, 23, 0), datetime(2016, 3, 23), 0),
+            (datetime(2016, 3, 23), None, 0),
+        ]:
+            expected = self.expected(begin, end, margin)
+            self.assertEqual(findTimeRange(self.path, begin, end, margin), expected)
+            self.assertEqual(findTimeRange(self.gzPath, begin, end, margin), expected)
+
+    def testTimeOnly(self):
+        # 只有时间时日期取第一条日志的日期，结束时间早于开始时间说明跨过了零点
+        expected = self.expected(datetime(2016, 3, 21, 23, 55), datetime(2016, 3, 22, 0, 5))
+        self.assertEqual(findTimeRange(self.path, time(23, 55), time(0, 5)), expected)
+        self.assertEqual(findTimeRange(self.gzPath, time(23, 55), time(0, 5)), expected)
+
+    def testRangeLines(self):
+        start, end = findTimeRange(self.path, datetime(2016, 3, 21, 23, 55), datetime(2016, 3, 21, 23, 56))
+        lines = [line for pos, line in iterRangeLines(self.path, (start, end))]
+        self.assertEqual(b"".join(lines), self.data[start:end])
+        self.assertEqual(countLines(self.path, start), self.data[:start].count(b'\n'))
+        self.assertEqual(countLines(self.gzPath, start), self.data[:start].count(b'\n'))
+
+    def testNoTime(self):
+        path = os.path.join(self.dir, "b.log")
+        with open(path, 'wb') as f:
+            f.write(b"no time here\n" * 10)
+        self.assertIsNone(findTimeRange(path, time(1, 0), None))
+
+class ParseTimeArgTest(unittest.TestCase):
+
+    def testFormats(self):
+        self.assertEqual(parseTimeArg("2016-03-21_14:02:00"), datetime(2016, 3, 21, 14, 2))
+        self.assertEqual(parseTimeArg("2016-03-21T14:02:00.5"), datetime(2016, 3, 21, 14, 2, 0, 500000))
+        self.assertEqual(parseTimeArg("14:02"), time(14, 2))
+        self.assertIsNone(parseTimeArg("2016-03-21 14:02"))
+        self.assertIsNone(parseTimeArg("25:00"))
+
+if __name__ == "__main__":
+    unittest.main()